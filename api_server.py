@@ -0,0 +1,37 @@
+"""
+Servidor da API HTTP (JSON) para integrações (bots de chat, painéis de parede)
+
+Rotas (GET; parâmetro opcional ?janela=ID, padrão: janela mais recente):
+  /api/versao        Versão dos dados
+  /api/janelas       Janelas de mudança cadastradas
+  /api/estatisticas  Indicadores gerais e por CRQ
+  /api/atrasadas     Atividades atrasadas
+  /api/proximas      Próximas atividades planejadas (?limite=10)
+  /api/mensagem      Mensagem consolidada para WhatsApp
+
+Rotas POST (exigem API_TOKEN ou cliente local):
+  /api/transicoes    Lote de transições de status em uma única transação (JSON)
+  /api/validacao     Relatório de validação de uma planilha .xlsx enviada no corpo (nada é gravado)
+
+Uso:
+  python api_server.py [--host 127.0.0.1] [--port 8502]
+"""
+import argparse
+from config import API_HOST, API_PORT
+from modules.api import create_server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API HTTP da Janela de Mudança")
+    parser.add_argument("--host", default=API_HOST, help=f"Endereço de escuta (padrão: {API_HOST})")
+    parser.add_argument("--port", type=int, default=API_PORT, help=f"Porta (padrão: {API_PORT})")
+    args = parser.parse_args()
+
+    server = create_server(args.host, args.port)
+    print(f"API disponível em http://{args.host}:{args.port}/api/estatisticas")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nEncerrando API...")
+    finally:
+        server.server_close()
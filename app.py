@@ -4,21 +4,28 @@ Aplicação web interativa para gerenciamento de janelas de mudança de TI
 """
 import streamlit as st
 import pyperclip
+import io
 import json
 import pandas as pd
 from datetime import datetime
-from modules.database import DatabaseManager
-from modules.data_loader import load_excel_file, merge_control_data, validate_excel_structure
-from modules.dashboard import render_full_dashboard
+from modules.database import DatabaseManager, ConflictError
+from modules.data_loader import (
+    load_excel_file, validate_excel_structure, reload_session_data
+)
+from modules.dashboard import render_full_dashboard, render_live_mode, get_statistics_model
 from modules.data_editor import render_data_editor
 from modules.message_builder import build_whatsapp_message
-from modules.calculations import calculate_statistics
 from modules.crud_activities import render_crud_activities
 from modules.auth import (
     init_session_auth, is_authenticated, has_permission,
     can_edit_data, get_user_name, get_user_type, render_login_page, logout
 )
-from config import DATE_FORMAT, SEQUENCIAS
+from modules.crq_registry import get_crq_registry
+from modules.performance import render_performance_panel
+from modules.exporters import EXPORT_FORMATS, export_analytics, export_status_xlsx
+from modules.import_validation import validate_excel_data
+from modules.instrumentation import configure_logging, begin_rerun, end_rerun, log_exception
+from config import DATE_FORMAT
 
 
 # Configuração da página
@@ -29,6 +36,13 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Instrumentação: logs JSON e tempo por etapa de cada execução do script
+configure_logging()
+if "sessao_id" not in st.session_state:
+    import uuid
+    st.session_state.sessao_id = uuid.uuid4().hex[:8]
+begin_rerun(st.session_state.sessao_id)
+
 # Inicializar autenticação
 init_session_auth()
 
@@ -42,22 +56,15 @@ if "data_dict" not in st.session_state:
     st.session_state.current_file = None
     # Tentar carregar dados persistidos do banco apenas se não houver dados em memória
     try:
-        saved_excel_data = st.session_state.db_manager.load_excel_data()
-        if saved_excel_data:
-            # Mesclar com dados de controle
-            control_data = st.session_state.db_manager.get_all_activities_control()
-            from modules.data_loader import merge_control_data
-            st.session_state.data_dict = merge_control_data(saved_excel_data, control_data)
+        # Carregar e mesclar com dados de controle (registra a versão dos dados)
+        if reload_session_data(st.session_state.db_manager):
             st.session_state.current_file = "Dados persistidos do banco"
         else:
             # Se não houver dados no banco, inicializar vazio
-            st.session_state.data_dict = {}
             st.session_state.current_file = None
     except Exception as e:
         # Se houver erro ao carregar, mostrar erro mas continuar
-        import traceback
-        print(f"Erro ao carregar dados do banco na inicialização: {str(e)}")
-        print(traceback.format_exc())
+        log_exception("inicializacao.erro_carga")
         st.session_state.data_dict = {}
         st.session_state.current_file = None
 
@@ -65,11 +72,7 @@ if "data_dict" not in st.session_state:
 # (isso garante que mesmo se a sessão for reiniciada, os dados sejam carregados)
 if not st.session_state.data_dict and st.session_state.current_file is None:
     try:
-        saved_excel_data = st.session_state.db_manager.load_excel_data()
-        if saved_excel_data:
-            control_data = st.session_state.db_manager.get_all_activities_control()
-            from modules.data_loader import merge_control_data
-            st.session_state.data_dict = merge_control_data(saved_excel_data, control_data)
+        if reload_session_data(st.session_state.db_manager):
             st.session_state.current_file = "Dados persistidos do banco"
     except Exception as e:
         # Silenciar erro aqui para não mostrar na interface
@@ -87,15 +90,20 @@ if not is_authenticated():
     st.stop()
 
 
-def load_data_from_excel(uploaded_file, show_success_message=True):
-    """Carrega dados do Excel, salva no banco e depois recarrega do banco (fonte única de verdade)"""
+def load_data_from_excel(uploaded_file, show_success_message=True, incremental=False):
+    """
+    Carrega dados do Excel, salva no banco e depois recarrega do banco (fonte única de verdade)
+    
+    Com incremental=True, aplica apenas as diferenças em relação à janela atual
+    (ids e controles das atividades mantidas são preservados).
+    """
     try:
         with st.spinner("Carregando dados do Excel..."):
             # Limpar cache antes de carregar novo arquivo
             load_excel_file.clear()
             
             # Carregar dados do Excel (temporário, apenas para salvar no banco)
-            excel_data = load_excel_file(uploaded_file)
+            excel_data = load_excel_file(uploaded_file, get_crq_registry().fingerprint())
             
             if not excel_data:
                 st.error("Erro ao carregar arquivo Excel")
@@ -104,8 +112,22 @@ def load_data_from_excel(uploaded_file, show_success_message=True):
             # Contar total de registros antes de salvar
             total_rows = sum(len(data["dataframe"]) for data in excel_data.values())
             
+            # Validação em uma única passada: o relatório vai para a barra lateral (até a
+            # próxima importação) e as linhas normalizadas são as gravadas no banco
+            validacao = validate_excel_data(excel_data)
+            st.session_state.relatorio_importacao = validacao[1]
+            
             # Salvar dados do Excel no banco (FONTE ÚNICA DE VERDADE)
-            total_saved = st.session_state.db_manager.save_excel_data(excel_data, uploaded_file.name)
+            resumo_importacao = None
+            if incremental:
+                resumo_importacao = st.session_state.db_manager.sync_excel_data(
+                    excel_data, uploaded_file.name, validacao=validacao
+                )
+                total_saved = resumo_importacao["inseridas"] + resumo_importacao["atualizadas"] + resumo_importacao["inalteradas"]
+            else:
+                total_saved = st.session_state.db_manager.save_excel_data(
+                    excel_data, uploaded_file.name, validacao=validacao
+                )
             
             if total_saved == 0:
                 st.warning("⚠️ Nenhum registro foi salvo no banco. Verifique os dados do Excel.")
@@ -113,66 +135,73 @@ def load_data_from_excel(uploaded_file, show_success_message=True):
             
             # Verificar se todos os registros foram salvos
             if total_saved != total_rows:
-                st.warning(f"⚠️ Aviso: {total_rows} registros foram carregados, mas apenas {total_saved} foram salvos no banco. Alguns registros podem ter sido filtrados (Seq inválido, etc.)")
+                st.warning(f"⚠️ Aviso: {total_rows} registros foram carregados, mas apenas {total_saved} foram salvos no banco. Veja o relatório da importação.")
             
             # IMPORTANTE: Agora sempre recarregar do banco (não usar dados do Excel em memória)
             # Isso garante que todas as sessões vejam os mesmos dados
-            saved_excel_data = st.session_state.db_manager.load_excel_data()
+            # Mesclar dados do banco (não do Excel em memória) e salvar no session_state
+            merged_data = reload_session_data(st.session_state.db_manager)
             
-            if not saved_excel_data:
+            if not merged_data:
                 st.error("❌ Erro: Dados foram salvos mas não puderam ser recarregados do banco.")
                 return False
             
-            # Carregar dados de controle do banco
-            control_data = st.session_state.db_manager.get_all_activities_control()
-            
-            # Mesclar dados do banco (não do Excel em memória)
-            merged_data = merge_control_data(saved_excel_data, control_data)
-            
-            # Salvar no session_state
-            st.session_state.data_dict = merged_data
             st.session_state.current_file = uploaded_file.name
             
             # Inicializar dados de controle no banco se necessário
-            for sequencia, data in merged_data.items():
-                df = data["dataframe"]
-                for _, row in df.iterrows():
-                    seq = int(row["Seq"])
-                    excel_data_id = row.get("Excel_Data_ID", 0) if "Excel_Data_ID" in row else 0
-                    if pd.isna(excel_data_id):
-                        excel_data_id = 0
-                    else:
-                        excel_data_id = int(excel_data_id)
-                    
-                    # Buscar usando excel_data_id se disponível
-                    if excel_data_id and excel_data_id > 0:
-                        existing = st.session_state.db_manager.get_activity_control(seq, sequencia, excel_data_id)
-                    else:
-                        existing = st.session_state.db_manager.get_activity_control(seq, sequencia)
-                    
-                    if not existing:
-                        # Obter valor de Is_Milestone do dataframe (já detectado na importação)
-                        is_milestone = row.get("Is_Milestone", False) if "Is_Milestone" in row else False
-                        st.session_state.db_manager.save_activity_control(
-                            seq=seq,
-                            sequencia=sequencia,
-                            status="Planejado",
-                            is_milestone=is_milestone,
-                            excel_data_id=excel_data_id if excel_data_id > 0 else None
-                        )
+            # (a importação incremental já cria os controles das linhas novas na mesma transação)
+            if not incremental:
+                for sequencia, data in merged_data.items():
+                    df = data["dataframe"]
+                    for _, row in df.iterrows():
+                        seq = int(row["Seq"])
+                        excel_data_id = row.get("Excel_Data_ID", 0) if "Excel_Data_ID" in row else 0
+                        if pd.isna(excel_data_id):
+                            excel_data_id = 0
+                        else:
+                            excel_data_id = int(excel_data_id)
+                        
+                        # Buscar usando excel_data_id se disponível
+                        if excel_data_id and excel_data_id > 0:
+                            existing = st.session_state.db_manager.get_activity_control(seq, sequencia, excel_data_id)
+                        else:
+                            existing = st.session_state.db_manager.get_activity_control(seq, sequencia)
+                        
+                        if not existing:
+                            # Obter valor de Is_Milestone do dataframe (já detectado na importação)
+                            is_milestone = row.get("Is_Milestone", False) if "Is_Milestone" in row else False
+                            try:
+                                # versao_esperada=0: criar apenas se a linha ainda não existir
+                                st.session_state.db_manager.save_activity_control(
+                                    seq=seq,
+                                    sequencia=sequencia,
+                                    status="Planejado",
+                                    is_milestone=is_milestone,
+                                    excel_data_id=excel_data_id if excel_data_id > 0 else None,
+                                    versao_esperada=0
+                                )
+                            except ConflictError:
+                                # Criado por outra sessão depois da leitura acima: manter o dela
+                                pass
             
             # Limpar cache do Excel após salvar no banco (não precisamos mais dele)
             load_excel_file.clear()
             
             if show_success_message:
-                st.success(f"✅ Dados carregados e persistidos com sucesso! ({total_saved} registros, {len(merged_data)} CRQs)")
+                if resumo_importacao:
+                    st.success(
+                        f"✅ Planejamento atualizado! {resumo_importacao['inseridas']} inseridas, "
+                        f"{resumo_importacao['atualizadas']} atualizadas, {resumo_importacao['removidas']} removidas, "
+                        f"{resumo_importacao['inalteradas']} sem alteração"
+                    )
+                else:
+                    st.success(f"✅ Dados carregados e persistidos com sucesso! ({total_saved} registros, {len(merged_data)} CRQs)")
             st.rerun()
             return True
     
     except Exception as e:
+        log_exception("importacao.planilha.erro", arquivo=uploaded_file.name)
         st.error(f"Erro ao carregar dados: {str(e)}")
-        import traceback
-        st.code(traceback.format_exc())
         return False
 
 
@@ -207,9 +236,63 @@ with st.sidebar:
     if st.button("🚪 Sair", width='stretch'):
         logout()
         st.rerun()
-    
+
     st.divider()
-    
+
+    # Seleção da janela de mudança ativa (por sessão)
+    st.subheader("🗓️ Janela de Mudança")
+    db_manager = st.session_state.db_manager
+    janelas = db_manager.list_janelas()
+    janela_ids = [janela["id"] for janela in janelas]
+    janelas_por_id = {janela["id"]: janela for janela in janelas}
+
+    # A janela ativa pode ter sido removida em outra sessão
+    if db_manager.janela_id not in janelas_por_id and janela_ids:
+        db_manager.set_active_janela(janela_ids[0])
+        reload_session_data(db_manager)
+
+    janela_selecionada = st.selectbox(
+        "Janela ativa:",
+        janela_ids,
+        index=janela_ids.index(db_manager.janela_id) if db_manager.janela_id in janela_ids else 0,
+        format_func=lambda janela_id: f"{janelas_por_id[janela_id]['nome']} ({janelas_por_id[janela_id]['atividades']} atividades)"
+    )
+
+    if janela_selecionada != db_manager.janela_id:
+        db_manager.set_active_janela(janela_selecionada)
+        if reload_session_data(db_manager):
+            st.session_state.current_file = janelas_por_id[janela_selecionada]["arquivo"] or "Dados persistidos do banco"
+        else:
+            st.session_state.current_file = None
+        st.rerun()
+
+    if get_user_type() == "admin":
+        with st.expander("➕ Nova Janela"):
+            nome_janela = st.text_input("Nome da janela:", key="nova_janela_nome", placeholder="Ex: Janela 15/03")
+            descricao_janela = st.text_input("Descrição (opcional):", key="nova_janela_descricao")
+            if st.button("Criar Janela", key="btn_criar_janela", width='stretch'):
+                if nome_janela.strip():
+                    nova_janela_id = db_manager.create_janela(nome_janela, descricao_janela.strip() or None)
+                    db_manager.set_active_janela(nova_janela_id)
+                    reload_session_data(db_manager)
+                    st.session_state.current_file = None
+                    st.success(f"✅ Janela '{nome_janela.strip()}' criada! Carregue o Excel desta janela.")
+                    st.rerun()
+                else:
+                    st.warning("⚠️ Informe o nome da janela")
+
+        if len(janela_ids) > 1:
+            with st.expander("🗑️ Excluir Janela Ativa"):
+                st.caption(f"Remove a janela '{janelas_por_id[db_manager.janela_id]['nome']}' e todas as suas atividades.")
+                if st.button("Excluir Janela", key="btn_excluir_janela", type="primary", width='stretch'):
+                    excel_count, control_count = db_manager.delete_janela(db_manager.janela_id)
+                    reload_session_data(db_manager)
+                    st.session_state.current_file = "Dados persistidos do banco" if st.session_state.data_dict else None
+                    st.success(f"✅ Janela excluída ({excel_count} registros Excel, {control_count} controles)")
+                    st.rerun()
+
+    st.divider()
+
     # Menu de navegação baseado em permissões
     st.subheader("📊 Navegação")
     
@@ -225,6 +308,8 @@ with st.sidebar:
         pages_available.append("CRUD Atividades")
     if has_permission("configuracoes"):
         pages_available.append("Configurações")
+    if has_permission("desempenho"):
+        pages_available.append("Desempenho")
     
     if pages_available:
         page = st.radio(
@@ -258,13 +343,32 @@ with st.sidebar:
             # Verificar se é um arquivo novo
             is_new_file = st.session_state[file_uploaded_key] != uploaded_file.name
             
+            # Janela com dados: por padrão, aplicar só as diferenças (preserva status e observações)
+            importacao_incremental = st.checkbox(
+                "Atualizar apenas as diferenças",
+                value=bool(st.session_state.data_dict),
+                key="importacao_incremental",
+                help="Casa as linhas por CRQ + Seq + Atividade: as atividades mantidas preservam status, horários reais e observações."
+            )
+            
             if st.button("📥 Carregar Dados", width='stretch'):
                 if validate_excel_structure(uploaded_file):
-                    load_data_from_excel(uploaded_file)
+                    load_data_from_excel(uploaded_file, incremental=importacao_incremental)
                     st.session_state[file_uploaded_key] = uploaded_file.name
                 else:
                     st.error("Arquivo Excel inválido. Verifique a estrutura do arquivo.")
         
+        relatorio_importacao = st.session_state.get("relatorio_importacao")
+        if relatorio_importacao is not None and not relatorio_importacao.empty:
+            ignoradas = int((~relatorio_importacao["Gravada"].astype(bool)).sum())
+            with st.expander(f"⚠️ Relatório da importação ({len(relatorio_importacao)} problemas, {ignoradas} linhas ignoradas)"):
+                st.dataframe(
+                    relatorio_importacao.drop(columns=["Tipo"]),
+                    hide_index=True,
+                    width='stretch',
+                    column_config={"Gravada": st.column_config.CheckboxColumn("Gravada")}
+                )
+        
         if st.session_state.current_file:
             st.info(f"📄 Arquivo atual: {st.session_state.current_file}")
             
@@ -276,15 +380,11 @@ with st.sidebar:
                     load_excel_file.clear()
                     # Só recarregar se houver um arquivo selecionado E for diferente do atual
                     if uploaded_file is not None and uploaded_file.name != st.session_state.current_file:
-                        load_data_from_excel(uploaded_file)
+                        load_data_from_excel(uploaded_file, incremental=importacao_incremental)
                         st.session_state[file_uploaded_key] = uploaded_file.name
                     else:
                         # Se não houver arquivo novo, apenas recarregar do banco (sem salvar Excel novamente)
-                        saved_excel_data = st.session_state.db_manager.load_excel_data()
-                        if saved_excel_data:
-                            control_data = st.session_state.db_manager.get_all_activities_control()
-                            from modules.data_loader import merge_control_data
-                            st.session_state.data_dict = merge_control_data(saved_excel_data, control_data)
+                        if reload_session_data(st.session_state.db_manager):
                             st.success("✅ Dados atualizados do banco!")
                             st.rerun()
                         else:
@@ -293,11 +393,7 @@ with st.sidebar:
             with col2:
                 if st.button("🔄 Recarregar do Banco", width='stretch', help="Recarrega os dados do banco de dados"):
                     try:
-                        saved_excel_data = st.session_state.db_manager.load_excel_data()
-                        if saved_excel_data:
-                            control_data = st.session_state.db_manager.get_all_activities_control()
-                            from modules.data_loader import merge_control_data
-                            st.session_state.data_dict = merge_control_data(saved_excel_data, control_data)
+                        if reload_session_data(st.session_state.db_manager):
                             st.session_state.current_file = "Dados persistidos do banco"
                             st.success("✅ Dados recarregados do banco com sucesso!")
                             st.rerun()
@@ -323,7 +419,7 @@ with st.sidebar:
             st.caption("Remova registros específicos por seq e CRQ")
             
             # Selecionar CRQ
-            crq_opcoes = list(SEQUENCIAS.keys())
+            crq_opcoes = list(get_crq_registry().keys())
             crq_selecionado = st.selectbox(
                 "Selecione a CRQ:",
                 crq_opcoes,
@@ -361,17 +457,17 @@ with st.sidebar:
                             
                             # Contar registros antes
                             placeholders = ','.join(['?'] * len(seqs_para_remover))
-                            params = seqs_para_remover + [crq_selecionado]
+                            params = seqs_para_remover + [crq_selecionado, st.session_state.db_manager.janela_id]
                             
                             cursor.execute(f"""
                                 SELECT COUNT(*) FROM activity_control 
-                                WHERE seq IN ({placeholders}) AND sequencia = ?
+                                WHERE seq IN ({placeholders}) AND sequencia = ? AND janela_id = ?
                             """, params)
                             activity_antes = cursor.fetchone()[0]
                             
                             cursor.execute(f"""
                                 SELECT COUNT(*) FROM excel_data 
-                                WHERE seq IN ({placeholders}) AND sequencia = ?
+                                WHERE seq IN ({placeholders}) AND sequencia = ? AND janela_id = ?
                             """, params)
                             excel_antes = cursor.fetchone()[0]
                             
@@ -381,13 +477,13 @@ with st.sidebar:
                                 # Remover
                                 cursor.execute(f"""
                                     DELETE FROM activity_control 
-                                    WHERE seq IN ({placeholders}) AND sequencia = ?
+                                    WHERE seq IN ({placeholders}) AND sequencia = ? AND janela_id = ?
                                 """, params)
                                 activity_removidos = cursor.rowcount
                                 
                                 cursor.execute(f"""
                                     DELETE FROM excel_data 
-                                    WHERE seq IN ({placeholders}) AND sequencia = ?
+                                    WHERE seq IN ({placeholders}) AND sequencia = ? AND janela_id = ?
                                 """, params)
                                 excel_removidos = cursor.rowcount
                                 
@@ -403,24 +499,19 @@ with st.sidebar:
                                 """)
                                 
                                 # Recarregar dados do banco
-                                saved_excel_data = st.session_state.db_manager.load_excel_data()
-                                if saved_excel_data:
-                                    control_data = st.session_state.db_manager.get_all_activities_control()
-                                    merged_data = merge_control_data(saved_excel_data, control_data)
-                                    st.session_state.data_dict = merged_data
+                                reload_session_data(st.session_state.db_manager)
                                 
                                 st.rerun()
                             
                         except Exception as e:
+                            log_exception("dados.remover_seqs.erro")
                             st.error(f"❌ Erro ao remover registros: {str(e)}")
-                            import traceback
-                            st.code(traceback.format_exc())
                     else:
                         st.warning("⚠️ Nenhum seq válido encontrado")
                 else:
                     st.warning("⚠️ Digite pelo menos um seq para remover")
         
-        st.warning("**Atenção:** A ação abaixo irá apagar TODOS os dados do banco (atividades e controles) e permitir uma nova importação.")
+        st.warning("**Atenção:** A ação abaixo irá apagar TODOS os dados da janela ativa (atividades e controles) e permitir uma nova importação. As demais janelas são preservadas.")
         
         if st.button("🗑️ Limpar Todos os Dados e Reimportar", width='stretch', type="secondary"):
             with st.spinner("Limpando todos os dados..."):
@@ -439,7 +530,7 @@ with st.sidebar:
                         del st.session_state[key]
             
             if success:
-                st.success(f"✅ Todos os dados foram apagados do banco! ({excel_count} registros Excel, {control_count} controles deletados). Agora você pode importar um novo arquivo Excel.")
+                st.success(f"✅ Todos os dados da janela foram apagados do banco! ({excel_count} registros Excel, {control_count} controles deletados). Agora você pode importar um novo arquivo Excel.")
             else:
                 st.error("⚠️ Erro ao limpar alguns dados. Tente novamente.")
             st.rerun()
@@ -455,79 +546,149 @@ with st.sidebar:
             st.markdown("#### 📤 Exportar Dados")
             if st.button("💾 Exportar Todos os Dados", width='stretch', type="primary"):
                 try:
-                    export_data = st.session_state.db_manager.export_all_data()
-                    if export_data:
-                        export_json = json.dumps(export_data, indent=2, default=str, ensure_ascii=False)
-                        excel_count = export_data["metadata"]["excel_count"]
-                        control_count = export_data["metadata"]["control_count"]
-                        
-                        st.success(f"✅ Dados exportados com sucesso! ({excel_count} registros Excel, {control_count} controles)")
-                        
-                        # Criar nome do arquivo com data/hora
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        filename = f"backup_janela_mudanca_{timestamp}.json"
-                        
-                        st.download_button(
-                            label="📥 Baixar Arquivo de Backup",
-                            data=export_json,
-                            file_name=filename,
-                            mime="application/json",
-                            key="download_backup"
-                        )
-                    else:
-                        st.warning("⚠️ Nenhum dado encontrado para exportar.")
+                    # Backup em streaming: as linhas vão direto para um arquivo temporário
+                    # compactado, sem montar o histórico inteiro em memória
+                    import tempfile
+                    with tempfile.TemporaryFile() as arquivo_backup:
+                        excel_count, control_count = st.session_state.db_manager.export_backup_stream(arquivo_backup)
+                        if excel_count or control_count:
+                            arquivo_backup.seek(0)
+                            st.success(f"✅ Dados exportados com sucesso! ({excel_count} registros Excel, {control_count} controles)")
+                            
+                            # Criar nome do arquivo com data/hora
+                            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                            filename = f"backup_janela_mudanca_{timestamp}.ndjson.gz"
+                            
+                            st.download_button(
+                                label="📥 Baixar Arquivo de Backup",
+                                data=arquivo_backup.read(),
+                                file_name=filename,
+                                mime="application/gzip",
+                                key="download_backup"
+                            )
+                        else:
+                            st.warning("⚠️ Nenhum dado encontrado para exportar.")
                 except Exception as e:
+                    log_exception("backup.exportacao.erro")
                     st.error(f"❌ Erro ao exportar dados: {str(e)}")
-                    import traceback
-                    with st.expander("Detalhes do erro"):
-                        st.code(traceback.format_exc())
         
         with col_import:
             st.markdown("#### 📥 Importar Dados")
             uploaded_backup = st.file_uploader(
-                "Selecione o arquivo de backup (.json)",
-                type=["json"],
+                "Selecione o arquivo de backup (.ndjson.gz ou .json legado)",
+                type=["gz", "json"],
                 key="backup_uploader"
             )
             
             if uploaded_backup is not None:
                 if st.button("📥 Importar Dados do Backup", width='stretch', type="primary"):
                     try:
-                        # Ler arquivo JSON
-                        import_data = json.load(uploaded_backup)
-                        
-                        # Validar estrutura
-                        if "excel_data" not in import_data or "control_data" not in import_data:
-                            st.error("❌ Arquivo de backup inválido. Estrutura não reconhecida.")
-                        else:
+                        if uploaded_backup.name.endswith(".gz"):
+                            # Backup em streaming: lido e gravado em lotes, em uma única transação
                             with st.spinner("Importando dados..."):
-                                # Limpar cache
                                 load_excel_file.clear()
+                                excel_imported, control_imported = st.session_state.db_manager.import_backup_stream(uploaded_backup)
+                                
+                                if reload_session_data(st.session_state.db_manager):
+                                    st.session_state.current_file = "Dados importados do backup"
                                 
-                                # Importar dados
-                                excel_imported, control_imported, success = st.session_state.db_manager.import_all_data(import_data)
+                                st.success(f"✅ Dados importados com sucesso! ({excel_imported} registros Excel, {control_imported} controles)")
+                                st.info("🔄 A página será recarregada para exibir os dados importados.")
+                                st.rerun()
+                        else:
+                            # Backup legado (JSON único)
+                            import_data = json.load(uploaded_backup)
+                        
+                            # Validar estrutura
+                            if "excel_data" not in import_data or "control_data" not in import_data:
+                                st.error("❌ Arquivo de backup inválido. Estrutura não reconhecida.")
+                            else:
+                                with st.spinner("Importando dados..."):
+                                    # Limpar cache
+                                    load_excel_file.clear()
+                                
+                                    # Importar dados
+                                    excel_imported, control_imported, success = st.session_state.db_manager.import_all_data(import_data)
                                 
-                                if success:
-                                    # Recarregar dados do banco para o session_state
-                                    saved_excel_data = st.session_state.db_manager.load_excel_data()
-                                    if saved_excel_data:
-                                        control_data = st.session_state.db_manager.get_all_activities_control()
-                                        from modules.data_loader import merge_control_data
-                                        st.session_state.data_dict = merge_control_data(saved_excel_data, control_data)
-                                        st.session_state.current_file = "Dados importados do backup"
+                                    if success:
+                                        # Recarregar dados do banco para o session_state
+                                        if reload_session_data(st.session_state.db_manager):
+                                            st.session_state.current_file = "Dados importados do backup"
                                     
-                                    st.success(f"✅ Dados importados com sucesso! ({excel_imported} registros Excel, {control_imported} controles)")
-                                    st.info("🔄 A página será recarregada para exibir os dados importados.")
-                                    st.rerun()
-                                else:
-                                    st.error("❌ Erro ao importar alguns dados. Verifique o arquivo de backup.")
+                                        st.success(f"✅ Dados importados com sucesso! ({excel_imported} registros Excel, {control_imported} controles)")
+                                        st.info("🔄 A página será recarregada para exibir os dados importados.")
+                                        st.rerun()
+                                    else:
+                                        st.error("❌ Erro ao importar alguns dados. Verifique o arquivo de backup.")
                     except json.JSONDecodeError:
                         st.error("❌ Erro: Arquivo JSON inválido.")
+                    except ValueError as e:
+                        st.error(f"❌ Backup inválido: {str(e)}")
                     except Exception as e:
+                        log_exception("backup.importacao.erro")
                         st.error(f"❌ Erro ao importar dados: {str(e)}")
-                        import traceback
-                        with st.expander("Detalhes do erro"):
-                            st.code(traceback.format_exc())
+        
+        # Exportação colunar para notebooks/BI (Parquet ou Arrow IPC)
+        st.divider()
+        st.subheader("📊 Exportar para Análise")
+        formato_analise = st.radio("Formato:", list(EXPORT_FORMATS), horizontal=True, key="formato_analise")
+        incluir_historico = st.checkbox("Incluir todas as janelas (histórico)", key="exportar_historico")
+        if st.button("📦 Gerar Arquivo", width='stretch', key="btn_exportar_analise"):
+            try:
+                with st.spinner("Gerando arquivo..."):
+                    arquivo_analise = io.BytesIO()
+                    janelas_exportadas = None if incluir_historico else [st.session_state.db_manager.janela_id]
+                    total_exportado = export_analytics(st.session_state.db_manager, formato_analise, arquivo_analise, janelas_exportadas)
+                st.success(f"✅ {total_exportado} atividades exportadas")
+                st.download_button(
+                    label=f"📥 Baixar {formato_analise}",
+                    data=arquivo_analise.getvalue(),
+                    file_name=f"atividades_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{EXPORT_FORMATS[formato_analise]['extensao']}",
+                    mime=EXPORT_FORMATS[formato_analise]["mime"],
+                    key="download_analise"
+                )
+            except ImportError as e:
+                st.error(f"❌ {str(e)}")
+            except Exception as e:
+                st.error(f"❌ Erro ao exportar dados: {str(e)}")
+        
+        # Snapshots do banco inteiro (API de backup do SQLite): preservam ids e índices
+        st.divider()
+        st.subheader("🗄️ Snapshots do Banco")
+        st.caption("Cópia completa do banco (todas as janelas), feita por páginas sem bloquear as demais sessões. Restaurar substitui TODOS os dados pelos do snapshot.")
+        
+        if st.button("📸 Criar Snapshot", width='stretch', key="btn_criar_snapshot"):
+            try:
+                with st.spinner("Criando snapshot..."):
+                    snapshot = st.session_state.db_manager.create_snapshot()
+                st.success(f"✅ Snapshot criado: {snapshot['arquivo']} ({snapshot['tamanho'] / 1024 / 1024:.1f} MB)")
+            except Exception as e:
+                st.error(f"❌ Erro ao criar snapshot: {str(e)}")
+        
+        snapshots = st.session_state.db_manager.list_snapshots()
+        if snapshots:
+            snapshots_por_caminho = {snapshot["caminho"]: snapshot for snapshot in snapshots}
+            snapshot_selecionado = st.selectbox(
+                "Snapshot:",
+                list(snapshots_por_caminho),
+                format_func=lambda caminho: f"{snapshots_por_caminho[caminho]['data'].strftime('%d/%m/%Y %H:%M:%S')} ({snapshots_por_caminho[caminho]['tamanho'] / 1024 / 1024:.1f} MB)",
+                key="snapshot_selecionado"
+            )
+            confirmar_restauracao = st.checkbox("Confirmo que desejo substituir todos os dados", key="confirmar_restauracao")
+            if st.button("♻️ Restaurar Snapshot", width='stretch', type="primary", key="btn_restaurar_snapshot", disabled=not confirmar_restauracao):
+                try:
+                    with st.spinner("Restaurando snapshot..."):
+                        seguranca = st.session_state.db_manager.restore_snapshot(snapshot_selecionado)
+                        load_excel_file.clear()
+                        reload_session_data(st.session_state.db_manager)
+                    st.success(f"✅ Snapshot restaurado! O estado anterior foi salvo em {seguranca['arquivo']}.")
+                    st.rerun()
+                except ValueError as e:
+                    st.error(f"❌ {str(e)}")
+                except Exception as e:
+                    st.error(f"❌ Erro ao restaurar snapshot: {str(e)}")
+        else:
+            st.caption("Nenhum snapshot criado ainda.")
         
         # Exportar estado (mantido para compatibilidade)
         if st.session_state.data_dict:
@@ -550,6 +711,25 @@ with st.sidebar:
             st.info(f"📄 Arquivo atual: {st.session_state.current_file}")
             st.caption("💡 Apenas administradores podem carregar novos arquivos")
     
+    # Planilha com o status atual da janela (disponível para todos os perfis)
+    if st.session_state.data_dict:
+        st.divider()
+        if st.button("📗 Gerar Planilha de Status (Excel)", width='stretch', key="btn_exportar_xlsx"):
+            try:
+                with st.spinner("Gerando planilha..."):
+                    arquivo_xlsx = io.BytesIO()
+                    total_xlsx = export_status_xlsx(st.session_state.db_manager, arquivo_xlsx, [st.session_state.db_manager.janela_id])
+                st.download_button(
+                    label=f"📥 Baixar Planilha ({total_xlsx} atividades)",
+                    data=arquivo_xlsx.getvalue(),
+                    file_name=f"status_janela_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    width='stretch',
+                    key="download_xlsx"
+                )
+            except Exception as e:
+                st.error(f"❌ Erro ao gerar planilha: {str(e)}")
+    
     # Indicador de mudanças não salvas
     if st.session_state.has_unsaved_changes:
         st.warning("⚠️ Há alterações não salvas")
@@ -566,45 +746,33 @@ with st.sidebar:
 
 
 # IMPORTANTE: O banco de dados é a FONTE ÚNICA DE VERDADE
-# Sempre carregar do banco, não confiar no session_state ou cache
+# A versão dos dados (incrementada a cada escrita no banco) indica se outra sessão
+# alterou algo; só então recarregamos e mesclamos tudo novamente
 # Isso garante que todas as sessões vejam os mesmos dados
 try:
-    saved_excel_data = st.session_state.db_manager.load_excel_data()
-    if saved_excel_data:
-        # Sempre recarregar do banco (ignorar cache e session_state)
-        control_data = st.session_state.db_manager.get_all_activities_control()
-        from modules.data_loader import merge_control_data
-        merged_data = merge_control_data(saved_excel_data, control_data)
-        
-        # Verificar se os dados mudaram (comparar contagem de registros)
-        current_count = sum(len(data["dataframe"]) for data in st.session_state.data_dict.values()) if st.session_state.data_dict else 0
-        new_count = sum(len(data["dataframe"]) for data in merged_data.values())
-        
-        # Sempre atualizar se os dados mudaram OU se não há dados em memória
-        # Isso garante sincronização entre sessões
-        if current_count != new_count or not st.session_state.data_dict:
-            st.session_state.data_dict = merged_data
+    data_version = st.session_state.db_manager.get_data_version()
+    if data_version != st.session_state.get("data_version") or not st.session_state.data_dict:
+        merged_data = reload_session_data(st.session_state.db_manager)
+        if merged_data:
             if not st.session_state.current_file or st.session_state.current_file == "Dados persistidos do banco":
                 st.session_state.current_file = "Dados persistidos do banco"
-    elif not saved_excel_data:
-        # Se não há dados no banco, limpar session_state
-        # (pode ter sido limpo em outra sessão)
-        if st.session_state.data_dict:
-            st.session_state.data_dict = {}
+        else:
+            # Se não há dados no banco, limpar session_state
+            # (pode ter sido limpo em outra sessão)
             st.session_state.current_file = None
 except Exception as e:
     # Logar erro mas não mostrar na interface a cada renderização
-    import traceback
-    print(f"Erro ao verificar banco: {str(e)}")
-    print(traceback.format_exc())
+    log_exception("verificacao_versao.erro")
 
 # Conteúdo principal
 if page == "Dashboard":
     st.header("📊 Dashboard Executivo")
     
     if st.session_state.data_dict:
+        render_live_mode()
         render_full_dashboard(st.session_state.data_dict)
     else:
+        render_live_mode()
         st.warning("⚠️ Nenhum dado carregado. Por favor, carregue um arquivo Excel primeiro na sidebar.")
 
 elif page == "Dados":
@@ -682,7 +850,7 @@ elif page == "CRUD Atividades":
         
         # Estatísticas rápidas
         st.subheader("📈 Estatísticas Rápidas")
-        stats = calculate_statistics(st.session_state.data_dict)
+        stats = get_statistics_model(st.session_state.data_dict)
         geral = stats["geral"]
         
         col1, col2, col3, col4 = st.columns(4)
@@ -726,31 +894,78 @@ elif page == "Configurações":
     - **Atrasado**: Atividade concluída com atraso
     - **Adiantado**: Atividade concluída antes do prazo
     
+    """)
+    
+    registry = get_crq_registry()
+    abas_crqs = "\n".join(
+        f"    - **{sigla}** ({info['total']} atividades)" for sigla, info in registry.items()
+    )
+    st.markdown(f"""
     ### Estrutura do Arquivo Excel:
-    O arquivo Excel deve conter 4 abas com os seguintes nomes (ou contendo):
-    - **REDE** (72 atividades)
-    - **OPENSHIFT** (39 atividades)
-    - **NFS** (17 atividades)
-    - **SI** (25 atividades)
+    O arquivo Excel deve conter {len(registry)} abas com os seguintes nomes (ou contendo):
+{abas_crqs}
     
     Cada aba deve ter as seguintes colunas:
     - Seq, Atividade, Grupo, Localidade, Executor, Telefone, Inicio, Fim, Tempo
     (Nota: As colunas Localidade, Executor e Telefone são importadas mas não são exibidas por questões de segurança)
     """)
     
+    if get_user_type() == "admin":
+        st.divider()
+        st.subheader("🏷️ Cadastro de CRQs")
+        st.caption("A sigla identifica a aba do Excel (o nome da aba deve contê-la). Remover uma CRQ não apaga atividades já importadas.")
+        
+        crqs_df = pd.DataFrame(
+            [{"Sigla": sigla, "Nome": info["nome"], "Emoji": info["emoji"], "Total": info["total"]}
+             for sigla, info in registry.items()],
+            columns=["Sigla", "Nome", "Emoji", "Total"]
+        )
+        crqs_editados = st.data_editor(
+            crqs_df,
+            num_rows="dynamic",
+            hide_index=True,
+            width='stretch',
+            key="crqs_editor",
+            column_config={
+                "Total": st.column_config.NumberColumn("Total", min_value=0, step=1)
+            }
+        )
+        
+        if st.button("💾 Salvar CRQs", key="btn_salvar_crqs"):
+            db_manager = st.session_state.db_manager
+            siglas_salvas = set()
+            for ordem, row in enumerate(crqs_editados.to_dict("records")):
+                sigla = str(row.get("Sigla") or "").strip().upper()
+                if not sigla or sigla in siglas_salvas:
+                    continue
+                total = row.get("Total")
+                db_manager.save_crq(
+                    sigla,
+                    nome=str(row.get("Nome") or "").strip() or None,
+                    emoji=str(row.get("Emoji") or "").strip() or None,
+                    total=int(total) if pd.notna(total) else 0,
+                    ordem=ordem
+                )
+                siglas_salvas.add(sigla)
+            for sigla in registry.keys():
+                if sigla not in siglas_salvas:
+                    db_manager.delete_crq(sigla)
+            st.success(f"✅ Cadastro de CRQs salvo ({len(siglas_salvas)} CRQs)")
+            st.rerun()
+    
     st.divider()
     
     st.subheader("🔧 Informações Técnicas")
     st.markdown(f"""
     - **Banco de Dados**: SQLite local (`db/activity_control.db`)
     - **Formato de Data**: `{DATE_FORMAT}`
-    - **Total de Atividades**: 153
+    - **Total de Atividades**: {registry.total_geral}
     """)
     
     if st.session_state.data_dict:
         st.divider()
         st.subheader("📊 Status Atual")
-        stats = calculate_statistics(st.session_state.data_dict)
+        stats = get_statistics_model(st.session_state.data_dict)
         geral = stats["geral"]
         
         st.json({
@@ -760,3 +975,10 @@ elif page == "Configurações":
             "Planejadas": geral["planejadas"],
             "Atrasadas": geral["atrasadas"]
         })
+
+elif page == "Desempenho":
+    st.header("🚀 Desempenho")
+    render_performance_panel(st.session_state.db_manager)
+
+# Resumo da execução: duração total e tempo acumulado por etapa
+end_rerun(pagina=page)
@@ -0,0 +1,240 @@
+"""
+Gerador de janelas sintéticas: planilhas de planejamento e estados do banco em escala configurável
+"""
+import random
+from datetime import datetime, timedelta
+import pandas as pd
+from config import DATE_FORMAT
+from modules.calculations import convert_time_to_minutes
+
+
+# Escalas pré-definidas: atividades, CRQs e densidade de dependências
+# (fração das atividades com predecessoras)
+ESCALAS = {
+    "150": {"atividades": 150, "crqs": 4, "densidade_dependencias": 0.2},
+    "2k": {"atividades": 2000, "crqs": 8, "densidade_dependencias": 0.3},
+    "20k": {"atividades": 20000, "crqs": 20, "densidade_dependencias": 0.3},
+    "200k": {"atividades": 200000, "crqs": 50, "densidade_dependencias": 0.3},
+}
+
+# Colunas da planilha de planejamento, na ordem esperada por load_excel_file
+COLUNAS_PLANILHA = ["Seq", "Atividade", "Grupo", "Localidade", "Executor", "Telefone", "Inicio", "Fim", "Tempo"]
+
+# Formato das colunas Inicio/Fim na planilha gerada
+FORMATO_DATA_PLANILHA = "DD/MM/YYYY HH:MM:SS"
+
+# Fração das atividades sem Grupo (tratadas como milestones na mesclagem)
+FRACAO_MILESTONES = 0.03
+
+# Predecessoras são sorteadas entre as N atividades anteriores da mesma CRQ
+ALCANCE_DEPENDENCIAS = 20
+
+_VERBOS = ["Validar", "Parar", "Iniciar", "Migrar", "Atualizar", "Reiniciar", "Checar", "Aplicar", "Desabilitar", "Liberar"]
+_OBJETOS = ["firewall", "cluster", "balanceador", "volume NFS", "pod", "serviço", "rota", "switch", "banco", "certificado"]
+_GRUPOS = ["Redes", "Infra", "Storage", "Segurança", "Banco de Dados", "Aplicação", "Monitoração"]
+_LOCALIDADES = ["SP", "RJ", "BH", "POA", "Cloud"]
+_EXECUTORES = ["Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabi", "Heitor", "Iara", "João"]
+
+
+def crq_siglas(quantidade):
+    """
+    Siglas das CRQs sintéticas (CRQ001, CRQ002...): mesma largura, nenhuma contida em outra
+
+    Args:
+        quantidade: Número de CRQs
+
+    Returns:
+        list: Siglas
+    """
+    return [f"CRQ{i:03d}" for i in range(1, quantidade + 1)]
+
+
+def _distribute(total, partes, rng):
+    """Divide o total entre as partes com tamanhos variados (todas com ao menos 1)"""
+    pesos = [rng.uniform(0.5, 1.5) for _ in range(partes)]
+    soma = sum(pesos)
+    tamanhos = [max(1, int(total * peso / soma)) for peso in pesos]
+    tamanhos[-1] = max(1, total - sum(tamanhos[:-1]))
+    return tamanhos
+
+
+def generate_window(atividades, crqs, densidade_dependencias=0.3, progresso=0.5, seed=42, agora=None):
+    """
+    Gera uma janela sintética: planejamento por CRQ e o controle de execução correspondente
+
+    Cada CRQ é uma sequência de atividades de 5 a 120 minutos. Atividades com predecessoras
+    começam após o fim da mais tardia delas; as demais podem correr em paralelo com a anterior.
+    A janela é posicionada de modo que a fração `progresso` da duração já tenha passado:
+    atividades terminadas ficam Concluídas (algumas Atrasadas), as em curso Em Execução e as
+    futuras Planejadas.
+
+    Args:
+        atividades: Total de atividades (distribuídas entre as CRQs com tamanhos variados)
+        crqs: Número de CRQs (abas)
+        densidade_dependencias: Fração das atividades com predecessoras (0 a 1)
+        progresso: Fração da janela já executada (0 a 1)
+        seed: Semente do gerador (mesma semente, mesmos dados)
+        agora: Data/hora de referência (padrão: agora)
+
+    Returns:
+        tuple: (planilhas, controles)
+            planilhas: {sigla: DataFrame com COLUNAS_PLANILHA}
+            controles: {sigla: lista de dicts (seq, status, horários reais, atraso, predecessoras)}
+    """
+    rng = random.Random(seed)
+    agora = (agora or datetime.now()).replace(second=0, microsecond=0)
+
+    planilhas = {}
+    controles = {}
+    for sigla, tamanho in zip(crq_siglas(crqs), _distribute(atividades, crqs, rng)):
+        linhas = []
+        controle = []
+        fins = []
+        cursor = timedelta(0)
+
+        for indice in range(tamanho):
+            seq = indice + 1
+            duracao = timedelta(minutes=rng.randint(5, 120))
+
+            predecessoras = []
+            if indice > 0 and rng.random() < densidade_dependencias:
+                candidatos = range(max(1, seq - ALCANCE_DEPENDENCIAS), seq)
+                predecessoras = sorted(rng.sample(candidatos, min(len(candidatos), rng.randint(1, 3))))
+
+            if predecessoras:
+                inicio = max(fins[p - 1] for p in predecessoras)
+            elif indice > 0 and rng.random() < 0.3:
+                # Em paralelo com a atividade anterior
+                inicio = linhas[-1]["Inicio"]
+            else:
+                inicio = cursor
+            fim = inicio + duracao
+            cursor = max(cursor, fim)
+            fins.append(fim)
+
+            milestone = rng.random() < FRACAO_MILESTONES
+            linhas.append({
+                "Seq": seq,
+                "Atividade": (
+                    f"Marco {seq} - {sigla}" if milestone
+                    else f"{rng.choice(_VERBOS)} {rng.choice(_OBJETOS)} {seq}"
+                ),
+                "Grupo": "" if milestone else rng.choice(_GRUPOS),
+                "Localidade": rng.choice(_LOCALIDADES),
+                "Executor": rng.choice(_EXECUTORES),
+                "Telefone": f"119{rng.randint(10000000, 99999999)}",
+                "Inicio": inicio,
+                "Fim": fim,
+                "Tempo": duracao,
+                "_predecessoras": predecessoras,
+            })
+
+        # Posicionar a CRQ na linha do tempo (deslocamentos relativos -> datas)
+        inicio_crq = agora - cursor * progresso
+        for linha in linhas:
+            linha["Inicio"] = inicio_crq + linha["Inicio"]
+            linha["Fim"] = inicio_crq + linha["Fim"]
+            controle.append(_control_row(linha, agora, rng))
+            total_segundos = int(linha["Tempo"].total_seconds())
+            linha["Tempo"] = f"{total_segundos // 3600:02d}:{total_segundos % 3600 // 60:02d}:00"
+            del linha["_predecessoras"]
+
+        planilhas[sigla] = pd.DataFrame(linhas, columns=COLUNAS_PLANILHA)
+        controles[sigla] = controle
+
+    return planilhas, controles
+
+
+def _control_row(linha, agora, rng):
+    """Estado de execução coerente com o horário de referência"""
+    registro = {
+        "seq": linha["Seq"],
+        "status": "Planejado",
+        "horario_inicio_real": None,
+        "horario_fim_real": None,
+        "atraso_minutos": 0,
+        "is_milestone": linha["Grupo"] == "",
+        "predecessoras": ",".join(str(p) for p in linha["_predecessoras"]),
+    }
+    if linha["Inicio"] > agora:
+        return registro
+
+    inicio_real = linha["Inicio"] + timedelta(minutes=rng.randint(-10, 15))
+    registro["horario_inicio_real"] = inicio_real.strftime(DATE_FORMAT)
+    if linha["Fim"] > agora:
+        registro["status"] = "Em Execução"
+        return registro
+
+    atraso = rng.choice([0, 0, 0, 0, 0, 0, 0, 10, 30, 90])
+    fim_real = min(linha["Fim"] + timedelta(minutes=atraso), agora)
+    registro["status"] = "Atrasado" if atraso else "Concluído"
+    registro["horario_fim_real"] = fim_real.strftime(DATE_FORMAT)
+    registro["atraso_minutos"] = atraso
+    return registro
+
+
+def write_workbook(planilhas, destino):
+    """
+    Grava as planilhas em um .xlsx (uma aba por CRQ), em modo write-only do openpyxl
+
+    Args:
+        planilhas: {sigla: DataFrame com COLUNAS_PLANILHA}
+        destino: Caminho do arquivo
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+
+    wb = Workbook(write_only=True)
+    for sigla, df in planilhas.items():
+        ws = wb.create_sheet(title=sigla)
+        ws.append(COLUNAS_PLANILHA)
+
+        for linha in df.itertuples(index=False, name=None):
+            valores = list(linha)
+            for posicao in (6, 7):  # Inicio, Fim
+                celula = WriteOnlyCell(ws, value=valores[posicao])
+                celula.number_format = FORMATO_DATA_PLANILHA
+                valores[posicao] = celula
+            ws.append(valores)
+    wb.save(destino)
+
+
+def build_database(db_manager, planilhas, controles, file_name="sintetica.xlsx"):
+    """
+    Popula a janela ativa do banco: cadastro de CRQs, planejamento e controle de execução
+
+    Substitui o cadastro de CRQs do banco pelas CRQs sintéticas.
+
+    Args:
+        db_manager: Instância do DatabaseManager (janela ativa recebe os dados)
+        planilhas: {sigla: DataFrame} de generate_window
+        controles: {sigla: lista de dicts} de generate_window
+        file_name: Nome do arquivo registrado na janela
+
+    Returns:
+        int: Quantidade de registros de controle gravados
+    """
+    for sigla in list(db_manager.get_crq_registry().keys()):
+        if sigla not in planilhas:
+            db_manager.delete_crq(sigla)
+    for ordem, (sigla, df) in enumerate(planilhas.items()):
+        db_manager.save_crq(sigla, nome=sigla, emoji="🔷", total=len(df), ordem=ordem)
+
+    # Tempo em minutos, como load_excel_file entrega para a gravação
+    db_manager.save_excel_data({
+        sigla: {"dataframe": df.assign(Tempo=df["Tempo"].map(convert_time_to_minutes)), "sheet_name": sigla}
+        for sigla, df in planilhas.items()
+    }, file_name)
+
+    # Ids gravados (uma linha por Seq em cada CRQ sintética)
+    excel_data = db_manager.load_excel_data() or {}
+    registros = []
+    for sigla, controle in controles.items():
+        ids = dict(zip(
+            excel_data[sigla]["dataframe"]["Seq"].astype(int),
+            excel_data[sigla]["dataframe"]["Excel_Data_ID"].astype(int)
+        )) if sigla in excel_data else {}
+        for registro in controle:
+            registros.append({**registro, "sequencia": sigla, "excel_data_id": ids.get(registro["seq"], 0)})
+
+    return db_manager.save_activity_controls(registros)
@@ -0,0 +1,256 @@
+"""
+Suíte de benchmarks: mede as etapas críticas em janelas sintéticas e grava o resultado em JSON
+
+Uso (na raiz do projeto):
+    python -m benchmarks.run_benchmarks --escalas 150 2k
+    python -m benchmarks.run_benchmarks --escalas 20k --repeticoes 1
+    python -m benchmarks.run_benchmarks --escalas 150 2k --comparar benchmarks/results/<execucao_anterior>.json
+
+Cada execução grava benchmarks/results/<data>_<commit>.json (fora do git: os tempos dependem
+da máquina). Com --comparar, a mediana de cada etapa é comparada à de uma execução anterior
+na mesma máquina e variações acima da tolerância são apontadas como regressão (código de
+saída 1 com --falhar-regressao).
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+# Executável também como script (python benchmarks/run_benchmarks.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.generator import ESCALAS, generate_window, write_workbook, build_database
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+# Versão do formato do JSON de resultados
+FORMATO_RESULTADO = 1
+
+
+def _git_commit():
+    """Commit atual (curto) ou None fora de um repositório git"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(RESULTS_DIR)
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _measure(func, repeticoes, preparar=None):
+    """
+    Executa a função `repeticoes` vezes
+
+    Args:
+        func: Função sem argumentos a medir
+        repeticoes: Número de execuções
+        preparar: Função chamada antes de cada execução, fora da medição (ex: limpar cache)
+
+    Returns:
+        tuple: (resultado da última execução, {"min_ms", "mediana_ms", "max_ms"})
+    """
+    tempos = []
+    resultado = None
+    for _ in range(repeticoes):
+        if preparar is not None:
+            preparar()
+        inicio = time.perf_counter()
+        resultado = func()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return resultado, {
+        "min_ms": round(min(tempos), 2),
+        "mediana_ms": round(statistics.median(tempos), 2),
+        "max_ms": round(max(tempos), 2),
+    }
+
+
+def run_scale(nome, atividades, crqs, densidade_dependencias, repeticoes=3, seed=42, pasta=None):
+    """
+    Gera a janela sintética da escala e mede cada etapa
+
+    Args:
+        nome: Nome da escala (ex: "2k")
+        atividades: Total de atividades
+        crqs: Número de CRQs
+        densidade_dependencias: Fração das atividades com predecessoras
+        repeticoes: Execuções por etapa
+        seed: Semente do gerador
+        pasta: Pasta dos arquivos temporários (planilha e bancos)
+
+    Returns:
+        dict: Parâmetros da escala, tempo de preparação e {"etapas": {etapa: tempos}}
+    """
+    import streamlit as st
+    from modules.database import DatabaseManager
+    from modules.data_loader import load_excel_file, merge_control_data
+    from modules.calculations import calculate_statistics, compute_gantt_data, compute_burndown
+    from modules.message_builder import build_whatsapp_message
+
+    pasta = pasta or tempfile.mkdtemp(prefix="bench_")
+    planilha = os.path.join(pasta, f"janela_{nome}.xlsx")
+    banco = os.path.join(pasta, f"janela_{nome}.db")
+    banco_gravacao = os.path.join(pasta, f"janela_{nome}_gravacao.db")
+    for caminho in (banco, banco_gravacao):
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+    inicio = time.perf_counter()
+    planilhas, controles = generate_window(atividades, crqs, densidade_dependencias, seed=seed)
+    write_workbook(planilhas, planilha)
+    db_manager = DatabaseManager(banco)
+    build_database(db_manager, planilhas, controles, os.path.basename(planilha))
+    preparacao_s = round(time.perf_counter() - inicio, 2)
+
+    # load_excel_file identifica as abas pelo cadastro de CRQs da sessão
+    st.session_state["db_manager"] = db_manager
+    st.session_state["data_version"] = None
+    registry = db_manager.get_crq_registry()
+
+    etapas = {}
+    # load_excel_file usa st.cache_data: cada execução mede a leitura sem cache
+    dados_excel, etapas["excel.load_excel_file"] = _measure(
+        lambda: load_excel_file(planilha, registry.fingerprint()), repeticoes, preparar=load_excel_file.clear
+    )
+
+    # Gravação em um banco separado: o banco medido mantém os ids dos controles
+    db_gravacao = DatabaseManager(banco_gravacao)
+    _, etapas["db.save_excel_data"] = _measure(
+        lambda: db_gravacao.save_excel_data(dados_excel, os.path.basename(planilha)), repeticoes
+    )
+
+    excel_data, etapas["db.load_excel_data"] = _measure(db_manager.load_excel_data, repeticoes)
+    controle, etapas["db.get_all_activities_control"] = _measure(db_manager.get_all_activities_control, repeticoes)
+    dados, etapas["merge_control_data"] = _measure(lambda: merge_control_data(excel_data, controle), repeticoes)
+
+    agora = datetime.now()
+    _, etapas["calculate_statistics"] = _measure(lambda: calculate_statistics(dados), repeticoes)
+    _, etapas["compute_gantt_data"] = _measure(lambda: compute_gantt_data(dados), repeticoes)
+    _, etapas["compute_burndown"] = _measure(lambda: compute_burndown(dados, list(dados.keys()), agora), repeticoes)
+    _, etapas["build_whatsapp_message"] = _measure(lambda: build_whatsapp_message(dados, registry), repeticoes)
+
+    return {
+        "atividades": atividades,
+        "crqs": crqs,
+        "densidade_dependencias": densidade_dependencias,
+        "planilha_bytes": os.path.getsize(planilha),
+        "preparacao_s": preparacao_s,
+        "etapas": etapas,
+    }
+
+
+def compare_results(atual, referencia, tolerancia=0.2):
+    """
+    Compara as medianas de duas execuções (escalas e etapas presentes em ambas)
+
+    Args:
+        atual: Resultado desta execução
+        referencia: Resultado de referência (ex: JSON de um commit anterior)
+        tolerancia: Aumento relativo aceito (0.2 = 20%)
+
+    Returns:
+        list: Dicts {"escala", "etapa", "referencia_ms", "atual_ms", "razao", "regressao"}
+    """
+    comparacao = []
+    for escala, dados in atual["escalas"].items():
+        etapas_referencia = referencia.get("escalas", {}).get(escala, {}).get("etapas", {})
+        for etapa, tempos in dados["etapas"].items():
+            if etapa not in etapas_referencia:
+                continue
+            anterior = etapas_referencia[etapa]["mediana_ms"]
+            razao = tempos["mediana_ms"] / anterior if anterior > 0 else float("inf")
+            comparacao.append({
+                "escala": escala,
+                "etapa": etapa,
+                "referencia_ms": anterior,
+                "atual_ms": tempos["mediana_ms"],
+                "razao": round(razao, 2),
+                "regressao": razao > 1 + tolerancia,
+            })
+    return comparacao
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks das etapas críticas em janelas sintéticas")
+    parser.add_argument("--escalas", nargs="+", default=["150", "2k"], choices=list(ESCALAS),
+                        help="Escalas a medir (padrão: 150 2k)")
+    parser.add_argument("--crqs", type=int, help="Número de CRQs (substitui o da escala)")
+    parser.add_argument("--densidade", type=float,
+                        help="Fração das atividades com predecessoras (substitui a da escala)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="Execuções por etapa (padrão: 3)")
+    parser.add_argument("--seed", type=int, default=42, help="Semente do gerador")
+    parser.add_argument("--saida", default=RESULTS_DIR, help="Pasta dos resultados JSON")
+    parser.add_argument("--comparar", help="JSON de referência para detectar regressões")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="Aumento relativo aceito na comparação (padrão: 0.2)")
+    parser.add_argument("--falhar-regressao", action="store_true",
+                        help="Sai com código 1 se houver regressão")
+    args = parser.parse_args(argv)
+
+    # Sem logs de etapa lenta durante as medições (apenas erros)
+    from modules.instrumentation import configure_logging
+    configure_logging("ERROR")
+    import pandas as pd
+
+    resultado = {
+        "formato": FORMATO_RESULTADO,
+        "commit": _git_commit(),
+        "data": datetime.now().isoformat(timespec="seconds"),
+        "ambiente": {
+            "python": platform.python_version(),
+            "pandas": pd.__version__,
+            "sqlite": sqlite3.sqlite_version,
+            "plataforma": platform.platform(),
+        },
+        "repeticoes": args.repeticoes,
+        "seed": args.seed,
+        "escalas": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench_") as pasta:
+        for nome in args.escalas:
+            escala = ESCALAS[nome]
+            crqs = args.crqs or escala["crqs"]
+            densidade = escala["densidade_dependencias"] if args.densidade is None else args.densidade
+            print(f"Escala {nome}: {escala['atividades']} atividades, {crqs} CRQs, densidade {densidade}", flush=True)
+
+            resultado["escalas"][nome] = run_scale(
+                nome, escala["atividades"], crqs, densidade,
+                repeticoes=args.repeticoes, seed=args.seed, pasta=pasta
+            )
+            for etapa, tempos in resultado["escalas"][nome]["etapas"].items():
+                print(f"  {etapa:32s} {tempos['mediana_ms']:>12.2f} ms (min {tempos['min_ms']:.2f})", flush=True)
+
+    os.makedirs(args.saida, exist_ok=True)
+    arquivo = os.path.join(
+        args.saida, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{resultado['commit'] or 'sem-commit'}.json"
+    )
+    with open(arquivo, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado gravado em {arquivo}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        comparacao = compare_results(resultado, referencia, args.tolerancia)
+        print(f"\nComparação com {args.comparar} (commit {referencia.get('commit')}):")
+        for linha in comparacao:
+            marca = "REGRESSÃO" if linha["regressao"] else ""
+            print(f"  {linha['escala']:>5s} {linha['etapa']:32s} {linha['referencia_ms']:>10.2f} -> "
+                  f"{linha['atual_ms']:>10.2f} ms  x{linha['razao']:<5} {marca}")
+        if args.falhar_regressao and any(linha["regressao"] for linha in comparacao):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
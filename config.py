@@ -45,6 +45,43 @@ EXCEL_COLUMNS = {
 DATE_FORMAT = "%d/%m/%Y %H:%M:%S"
 DATE_FORMAT_DISPLAY = "DD/MM/AAAA HH:MM:SS"
 
+# Modo ao vivo do dashboard: intervalos de verificação (segundos) e padrão
+AUTO_REFRESH_INTERVALOS = [10, 30, 60, 300]
+AUTO_REFRESH_INTERVALO_PADRAO = 30
+# Idade máxima da versão dos dados compartilhada entre sessões (uma consulta ao banco
+# por período, independente de quantas telas estão abertas)
+AUTO_REFRESH_VERSAO_TTL = 5
+
+# API HTTP de leitura (api_server.py)
+API_HOST = "127.0.0.1"
+API_PORT = 8502
+# Idade máxima da versão dos dados usada pela API (segundos)
+API_VERSAO_TTL = 1
+# Token exigido nas rotas de escrita (cabeçalho "Authorization: Bearer <token>");
+# sem token configurado, a escrita só é aceita de clientes locais
+API_TOKEN = os.environ.get("API_TOKEN")
+# Máximo de transições por requisição
+API_MAX_TRANSICOES = 500
+# Tamanho máximo da planilha enviada para validação (bytes)
+API_MAX_UPLOAD_BYTES = 20 * 1024 * 1024
+
+# Backup em streaming (NDJSON compactado): linhas gravadas/lidas por lote
+BACKUP_LOTE = 1000
+
+# Snapshots do banco (API de backup do SQLite): pasta, quantos manter e páginas
+# copiadas por passo (entre os passos o banco fica livre para outras escritas)
+BACKUP_DIR = os.path.join(DB_DIR, "backups")
+BACKUP_SNAPSHOT_MANTER = 10
+BACKUP_SNAPSHOT_PAGINAS = 256
+
+# Instrumentação: nível dos logs (JSON no stderr), limite a partir do qual uma etapa
+# é registrada como lenta (WARNING) e faixas dos histogramas de latência (ms)
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO")
+PERF_LIMITE_LENTO_MS = 500
+PERF_HISTOGRAMA_LIMITES_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+# Medições recentes mantidas em memória para o painel de desempenho (buffer circular)
+PERF_BUFFER_TAMANHO = 20000
+
 # Cores para status
 STATUS_COLORS = {
     "Concluído": "#28a745",  # Verde
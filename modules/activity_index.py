@@ -0,0 +1,92 @@
+"""
+Módulo de índice de busca de atividades (por versão dos dados)
+"""
+import pandas as pd
+import streamlit as st
+
+
+def build_activity_index(data_dict):
+    """
+    Monta índice de localização das atividades e rótulos para seletores
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+
+    Returns:
+        dict: {
+            "positions": {(sequencia, excel_data_id): posição da linha no dataframe do CRQ},
+            "options": {sequencia: [rótulos "Seq X: Atividade", na ordem do dataframe]},
+            "keys": {sequencia: [(sequencia, excel_data_id), alinhado com "options"]}
+        }
+    """
+    index = {"positions": {}, "options": {}, "keys": {}}
+
+    for sequencia, data in data_dict.items():
+        df = data["dataframe"]
+
+        if "Excel_Data_ID" in df.columns:
+            ids = pd.to_numeric(df["Excel_Data_ID"], errors='coerce').fillna(0).astype(int).tolist()
+        else:
+            ids = [0] * len(df)
+
+        seqs = df["Seq"].astype("string").fillna("") if "Seq" in df.columns else pd.Series([""] * len(df))
+        atividades = df["Atividade"].astype("string").fillna("") if "Atividade" in df.columns else pd.Series([""] * len(df))
+
+        keys = [(sequencia, excel_data_id) for excel_data_id in ids]
+
+        index["options"][sequencia] = ("Seq " + seqs + ": " + atividades).tolist()
+        index["keys"][sequencia] = keys
+        index["positions"].update({key: pos for pos, key in enumerate(keys)})
+
+    return index
+
+
+def get_activity_index(data_dict):
+    """
+    Retorna o índice de atividades da sessão, reconstruindo apenas quando a versão dos dados muda
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ (st.session_state.data_dict)
+
+    Returns:
+        dict: Índice no formato de build_activity_index
+    """
+    data_version = st.session_state.get("data_version")
+    cached = st.session_state.get("activity_index")
+
+    # A versão identifica os dados carregados na sessão; o id do dicionário protege
+    # contra um data_dict substituído sem passar por reload_session_data
+    cache_key = (data_version, id(data_dict), len(data_dict))
+    if cached is not None and data_version is not None and cached[0] == cache_key:
+        return cached[1]
+
+    index = build_activity_index(data_dict)
+    st.session_state.activity_index = (cache_key, index)
+    return index
+
+
+def get_activity_row(data_dict, sequencia, excel_data_id):
+    """
+    Localiza uma atividade pelo índice (sem percorrer o dataframe)
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+        sequencia: CRQ da atividade
+        excel_data_id: ID da linha no excel_data
+
+    Returns:
+        tuple: (dataframe do CRQ, rótulo do índice da linha) ou (None, None) se não encontrada
+    """
+    if sequencia not in data_dict:
+        return None, None
+
+    index = get_activity_index(data_dict)
+    pos = index["positions"].get((sequencia, int(excel_data_id)))
+    if pos is None:
+        return None, None
+
+    df = data_dict[sequencia]["dataframe"]
+    if pos >= len(df):
+        return None, None
+
+    return df, df.index[pos]
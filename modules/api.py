@@ -0,0 +1,431 @@
+"""
+Módulo da API HTTP (JSON) para integrações: estatísticas, atividades atrasadas/próximas,
+mensagem, transições de status em lote e validação de planilhas
+
+Os dados são carregados uma vez por (janela, versão dos dados) e as respostas ficam em
+cache com ETag. Enquanto a versão não muda, as requisições não consultam o SQLite
+(a versão é relida no máximo uma vez a cada API_VERSAO_TTL segundos).
+"""
+import copy
+import io
+import json
+from datetime import datetime, timezone, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+from config import API_VERSAO_TTL, API_TOKEN, API_MAX_TRANSICOES, API_MAX_UPLOAD_BYTES
+from modules.cache import VersionedCache, get_shared_data_version, invalidate_shared_data_version
+from modules.data_loader import load_data_from_database, read_excel_workbook
+from modules.display import build_display_frames
+from modules.import_validation import validate_excel_data, build_validation_report
+from modules.message_builder import build_whatsapp_message
+from modules.database import ConflictError
+from modules.instrumentation import log_exception
+from modules.transitions import apply_status_transitions
+
+
+# Colunas das atividades retornadas pela API (datas já no DATE_FORMAT)
+API_ACTIVITY_COLUMNS = [
+    "CRQ", "Seq", "Atividade", "Grupo", "Status",
+    "Inicio", "Fim", "Horario_Inicio_Real", "Horario_Fim_Real",
+    "Atraso_Minutos", "Atraso"
+]
+
+# Dados carregados por (janela, versão) e respostas prontas por (rota, parâmetros, janela, versão)
+api_data_cache = VersionedCache("api_dados", max_entries=8)
+api_response_cache = VersionedCache("api_respostas", max_entries=256)
+
+
+class ApiError(Exception):
+    """Erro de requisição com status HTTP (ex: 400, 404)"""
+
+    def __init__(self, status, mensagem):
+        super().__init__(mensagem)
+        self.status = status
+        self.mensagem = mensagem
+
+
+def _json_default(valor):
+    """Serializa tipos do numpy/pandas (ex: int64) e datas"""
+    if hasattr(valor, "item"):
+        return valor.item()
+    return str(valor)
+
+
+def to_json_bytes(payload):
+    """Serializa o payload em JSON UTF-8"""
+    return json.dumps(payload, ensure_ascii=False, default=_json_default).encode("utf-8")
+
+
+def activities_to_records(df):
+    """
+    Converte uma projeção de exibição em lista de dicts (vazios viram None)
+
+    Args:
+        df: DataFrame da projeção de exibição (modules.display)
+
+    Returns:
+        list: Registros com as colunas de API_ACTIVITY_COLUMNS
+    """
+    colunas = [col for col in API_ACTIVITY_COLUMNS if col in df.columns]
+    registros = df[colunas].astype(object)
+    return registros.where(registros.notna(), None).to_dict("records")
+
+
+class ApiService:
+    """
+    Rotas da API sobre um DatabaseManager
+
+    Cada janela é consultada por uma cópia rasa do gerenciador (janela_id próprio),
+    sem reexecutar a inicialização do banco.
+    """
+
+    def __init__(self, db_manager):
+        self.db_manager = db_manager
+        self.rotas_get = {
+            "/api/versao": self.get_versao_payload,
+            "/api/janelas": self.get_janelas_payload,
+            "/api/estatisticas": self.get_estatisticas_payload,
+            "/api/atrasadas": self.get_atrasadas_payload,
+            "/api/proximas": self.get_proximas_payload,
+            "/api/mensagem": self.get_mensagem_payload
+        }
+        # Rotas cujo conteúdo depende do horário atual (cache e ETag por minuto)
+        self.rotas_por_minuto = {"/api/mensagem"}
+        self.rotas_post = {
+            "/api/transicoes": self.post_transicoes
+        }
+        # Rotas POST que recebem o arquivo bruto (não JSON)
+        self.rotas_upload = {
+            "/api/validacao": self.post_validacao
+        }
+
+    def get_versao(self):
+        """Versão dos dados (compartilhada; no máximo uma consulta por API_VERSAO_TTL)"""
+        return get_shared_data_version(self.db_manager, max_age=API_VERSAO_TTL)
+
+    def manager_for(self, janela_id):
+        """Gerenciador restrito à janela informada"""
+        if janela_id == self.db_manager.janela_id:
+            return self.db_manager
+        db_manager = copy.copy(self.db_manager)
+        db_manager.janela_id = janela_id
+        return db_manager
+
+    def resolve_janela(self, params, versao):
+        """
+        Janela da requisição (?janela=ID) ou a mais recente
+
+        Raises:
+            ApiError: Se o parâmetro não for um número
+        """
+        valor = params.get("janela")
+        if valor is None:
+            return api_data_cache.get_or_compute(
+                ("janela_recente", versao), self.db_manager.get_latest_janela_id
+            )
+        try:
+            return int(valor)
+        except ValueError:
+            raise ApiError(400, f"Parâmetro 'janela' inválido: {valor}")
+
+    def load_dados(self, janela_id, versao):
+        """
+        Dados da janela em cache por (janela, versão): data_dict, projeções e cadastro de CRQs
+
+        Returns:
+            dict: {"data_dict", "frames", "registry"}
+        """
+        def carregar():
+            db_manager = self.manager_for(janela_id)
+            data_dict, _ = load_data_from_database(db_manager)
+            return {
+                "data_dict": data_dict,
+                "frames": build_display_frames(data_dict) if data_dict else {},
+                "registry": db_manager.get_crq_registry(versao)
+            }
+
+        return api_data_cache.get_or_compute(("dados", janela_id, versao), carregar)
+
+    def get_versao_payload(self, janela_id, versao, params):
+        return {"janela_id": janela_id, "versao": versao}
+
+    def get_janelas_payload(self, janela_id, versao, params):
+        return {"janelas": self.db_manager.list_janelas()}
+
+    def get_estatisticas_payload(self, janela_id, versao, params):
+        # Agregação no banco: indicadores não exigem carregar e mesclar todas as linhas
+        estatisticas = api_data_cache.get_or_compute(
+            ("estatisticas", janela_id, versao), self.manager_for(janela_id).get_status_counts
+        )
+        return {"janela_id": janela_id, "versao": versao, "estatisticas": estatisticas}
+
+    def _atividades(self, janela_id, versao):
+        """Projeção combinada das atividades (sem milestones)"""
+        todas = self.load_dados(janela_id, versao)["frames"].get("TODAS")
+        if todas is None or len(todas) == 0:
+            return None
+        if "Is_Milestone" in todas.columns:
+            todas = todas[~todas["Is_Milestone"]]
+        return todas
+
+    def get_atrasadas_payload(self, janela_id, versao, params):
+        todas = self._atividades(janela_id, versao)
+        atividades = []
+        if todas is not None:
+            atrasadas = todas[(todas["Status"] == "Atrasado") | (todas["Atraso_Minutos"] > 0)]
+            atividades = activities_to_records(atrasadas)
+        return {"janela_id": janela_id, "versao": versao, "total": len(atividades), "atividades": atividades}
+
+    def get_proximas_payload(self, janela_id, versao, params):
+        try:
+            limite = int(params.get("limite", 10))
+        except ValueError:
+            raise ApiError(400, f"Parâmetro 'limite' inválido: {params.get('limite')}")
+
+        todas = self._atividades(janela_id, versao)
+        atividades = []
+        if todas is not None:
+            proximas = todas[todas["Status"] == "Planejado"]
+            if "Inicio_Ordem" in proximas.columns:
+                proximas = proximas.sort_values("Inicio_Ordem", kind="stable")
+            atividades = activities_to_records(proximas.head(max(limite, 0)))
+        return {"janela_id": janela_id, "versao": versao, "total": len(atividades), "atividades": atividades}
+
+    def get_mensagem_payload(self, janela_id, versao, params):
+        dados = self.load_dados(janela_id, versao)
+        mensagem = build_whatsapp_message(dados["data_dict"], registry=dados["registry"]) if dados["data_dict"] else ""
+        return {"janela_id": janela_id, "versao": versao, "mensagem": mensagem}
+
+    def post_transicoes(self, payload):
+        """
+        Aplica um lote de transições de status (uma única transação)
+
+        Corpo: {"janela": ID (opcional), "parcial": false, "transicoes": [
+            {"excel_data_id": 10} ou {"crq": "REDE", "seq": 5}, com "status" e, opcionalmente,
+            "horario_inicio_real", "horario_fim_real", "observacoes" e "versao_linha"]}
+        Responde 409 (nada gravado) se alguma versao_linha informada estiver desatualizada.
+
+        Returns:
+            tuple: (status HTTP, payload)
+        """
+        transicoes = payload.get("transicoes")
+        if not isinstance(transicoes, list) or not transicoes:
+            raise ApiError(400, "Informe 'transicoes' (lista não vazia)")
+        if len(transicoes) > API_MAX_TRANSICOES:
+            raise ApiError(413, f"Máximo de {API_MAX_TRANSICOES} transições por requisição")
+
+        janela_id = self.resolve_janela(payload, self.get_versao())
+        try:
+            resultado = apply_status_transitions(
+                self.manager_for(janela_id), transicoes, parcial=bool(payload.get("parcial", False))
+            )
+        except ConflictError as e:
+            # Nada foi gravado: o cliente deve reler as atividades e reenviar
+            return 409, {"aplicadas": 0, "erro": str(e), "conflitos": e.conflitos, "janela_id": janela_id}
+
+        # A escrita muda a versão: a próxima leitura não deve usar a versão memorizada
+        invalidate_shared_data_version(self.db_manager.db_path)
+        resultado["janela_id"] = janela_id
+        resultado["versao"] = self.get_versao()
+
+        status = 422 if resultado["erros"] and resultado["aplicadas"] == 0 else 200
+        return status, resultado
+
+    def post_validacao(self, conteudo):
+        """
+        Valida uma planilha (.xlsx) sem gravar nada: mesmo relatório da importação
+
+        Corpo: o arquivo Excel (bytes). As abas são reconhecidas pelo cadastro de CRQs.
+
+        Returns:
+            tuple: (status HTTP, payload de build_validation_report)
+
+        Raises:
+            ApiError: Arquivo vazio, ilegível ou sem abas reconhecidas
+        """
+        if not conteudo:
+            raise ApiError(400, "Envie o arquivo Excel no corpo da requisição")
+        try:
+            data_dict = read_excel_workbook(io.BytesIO(conteudo), self.db_manager.get_crq_registry())
+        except Exception as e:
+            raise ApiError(400, f"Arquivo Excel inválido: {e}")
+        if not data_dict:
+            raise ApiError(422, "Nenhuma aba reconhecida pelo cadastro de CRQs")
+
+        linhas, relatorio = validate_excel_data(data_dict)
+        resultado = build_validation_report(linhas, relatorio)
+        resultado["crqs"] = list(data_dict.keys())
+        return 200, resultado
+
+    def handle_upload(self, path, conteudo):
+        """
+        Responde uma requisição POST com arquivo no corpo
+
+        Args:
+            path: Caminho da URL (ex: "/api/validacao")
+            conteudo: Corpo da requisição (bytes)
+
+        Returns:
+            tuple: (status HTTP, corpo em bytes, cabeçalhos)
+
+        Raises:
+            ApiError: Rota inexistente ou arquivo inválido
+        """
+        rota = self.rotas_upload.get(path.rstrip("/"))
+        if rota is None:
+            raise ApiError(404, f"Rota não encontrada: {path}")
+
+        status, resultado = rota(conteudo)
+        return status, to_json_bytes(resultado), {"Content-Type": "application/json; charset=utf-8"}
+
+    def handle_post(self, path, payload):
+        """
+        Responde uma requisição POST
+
+        Args:
+            path: Caminho da URL (ex: "/api/transicoes")
+            payload: Corpo JSON já decodificado
+
+        Returns:
+            tuple: (status HTTP, corpo em bytes, cabeçalhos)
+
+        Raises:
+            ApiError: Rota inexistente ou corpo inválido
+        """
+        rota = self.rotas_post.get(path.rstrip("/"))
+        if rota is None:
+            raise ApiError(404, f"Rota não encontrada: {path}")
+        if not isinstance(payload, dict):
+            raise ApiError(400, "O corpo deve ser um objeto JSON")
+
+        status, resultado = rota(payload)
+        return status, to_json_bytes(resultado), {"Content-Type": "application/json; charset=utf-8"}
+
+    def handle_get(self, path, params, if_none_match=None):
+        """
+        Responde uma requisição GET
+
+        Args:
+            path: Caminho da URL (ex: "/api/estatisticas")
+            params: Parâmetros da query string ({nome: valor})
+            if_none_match: Cabeçalho If-None-Match recebido (ETag do cliente)
+
+        Returns:
+            tuple: (status HTTP, corpo em bytes, cabeçalhos)
+
+        Raises:
+            ApiError: Rota inexistente ou parâmetros inválidos
+        """
+        rota = self.rotas_get.get(path.rstrip("/"))
+        if rota is None:
+            raise ApiError(404, f"Rota não encontrada: {path}")
+
+        versao = self.get_versao()
+        janela_id = self.resolve_janela(params, versao)
+
+        chave = [path.rstrip("/"), tuple(sorted(params.items())), janela_id, versao]
+        if path.rstrip("/") in self.rotas_por_minuto:
+            chave.append(datetime.now(timezone(timedelta(hours=-3))).strftime("%Y%m%d%H%M"))
+        etag = f'"{"-".join(str(parte) for parte in chave[2:])}"'
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache", "X-Data-Version": str(versao)}
+        if if_none_match == etag:
+            return 304, b"", headers
+
+        corpo = api_response_cache.get_or_compute(
+            tuple(chave), lambda: to_json_bytes(rota(janela_id, versao, params))
+        )
+        headers["Content-Type"] = "application/json; charset=utf-8"
+        return 200, corpo, headers
+
+
+class ApiRequestHandler(BaseHTTPRequestHandler):
+    """Handler HTTP da API (o serviço é definido por create_server)"""
+
+    service = None
+
+    def send_payload(self, status, corpo, headers):
+        self.send_response(status)
+        for nome, valor in headers.items():
+            self.send_header(nome, valor)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.end_headers()
+        if corpo:
+            self.wfile.write(corpo)
+
+    def send_error_payload(self, status, mensagem):
+        corpo = to_json_bytes({"erro": mensagem})
+        self.send_payload(status, corpo, {"Content-Type": "application/json; charset=utf-8"})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {nome: valores[-1] for nome, valores in parse_qs(url.query).items()}
+        try:
+            status, corpo, headers = self.service.handle_get(url.path, params, self.headers.get("If-None-Match"))
+        except ApiError as e:
+            self.send_error_payload(e.status, e.mensagem)
+            return
+        except Exception:
+            log_exception("api.erro", path=self.path)
+            self.send_error_payload(500, "Erro interno")
+            return
+        self.send_payload(status, corpo, headers)
+
+    def is_write_authorized(self):
+        """Escrita exige o API_TOKEN configurado ou, sem token, um cliente local"""
+        if API_TOKEN:
+            return self.headers.get("Authorization", "") == f"Bearer {API_TOKEN}"
+        return self.client_address[0] in ("127.0.0.1", "::1")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if not self.is_write_authorized():
+            self.send_error_payload(401, "Não autorizado")
+            return
+        try:
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            if url.path.rstrip("/") in self.service.rotas_upload:
+                # Planilha no corpo: sem decodificação JSON
+                if tamanho > API_MAX_UPLOAD_BYTES:
+                    raise ApiError(413, f"Arquivo maior que {API_MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+                status, corpo, headers = self.service.handle_upload(url.path, self.rfile.read(tamanho))
+            else:
+                try:
+                    payload = json.loads(self.rfile.read(tamanho) or b"null")
+                except ValueError:
+                    raise ApiError(400, "JSON inválido")
+                status, corpo, headers = self.service.handle_post(url.path, payload)
+        except ApiError as e:
+            self.send_error_payload(e.status, e.mensagem)
+            return
+        except Exception:
+            log_exception("api.erro", path=self.path)
+            self.send_error_payload(500, "Erro interno")
+            return
+        self.send_payload(status, corpo, headers)
+
+    def log_message(self, format, *args):
+        # Sem log por requisição (a API atende centenas de requisições por segundo)
+        pass
+
+
+def create_server(host, port, db_manager=None):
+    """
+    Cria o servidor HTTP da API (uma thread por requisição)
+
+    Args:
+        host: Endereço de escuta
+        port: Porta
+        db_manager: Gerenciador de banco (padrão: DatabaseManager())
+
+    Returns:
+        ThreadingHTTPServer: Servidor pronto para serve_forever()
+    """
+    if db_manager is None:
+        from modules.database import DatabaseManager
+        db_manager = DatabaseManager()
+
+    handler = type("BoundApiRequestHandler", (ApiRequestHandler,), {"service": ApiService(db_manager)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
@@ -16,7 +16,7 @@ USUARIOS = {
         "senha": "admin123",
         "nome": "Administrador",
         "tipo": "administrador",
-        "permissoes": ["dashboard", "dados", "mensagem", "configuracoes"]
+        "permissoes": ["dashboard", "dados", "mensagem", "configuracoes", "desempenho"]
     },
     "lider": {
         "senha": "lider123",
@@ -88,7 +88,7 @@ def has_permission(page):
     Verifica se usuário tem permissão para acessar uma página
     
     Args:
-        page: Nome da página (dashboard, dados, mensagem, configuracoes)
+        page: Nome da página (dashboard, dados, mensagem, configuracoes, desempenho)
         
     Returns:
         bool: True se tem permissão, False caso contrário
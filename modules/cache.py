@@ -0,0 +1,155 @@
+"""
+Módulo de cache em memória por versão dos dados (compartilhado entre sessões)
+"""
+import threading
+import time
+from collections import OrderedDict
+import streamlit as st
+
+
+# Caches registrados por nome (permite inspecionar acertos/erros de todos)
+CACHES = {}
+
+# Última versão dos dados lida por banco: {db_path: (instante da leitura, versão)}
+_versoes_compartilhadas = {}
+_versoes_lock = threading.Lock()
+
+
+class VersionedCache:
+    """
+    Cache LRU em memória do processo, compartilhado entre as sessões do Streamlit
+
+    As chaves devem identificar os dados de origem (ex: janela + versão dos dados),
+    de modo que uma escrita no banco invalide as entradas automaticamente. Os valores
+    retornados são compartilhados: quem os recebe não deve modificá-los.
+    """
+
+    def __init__(self, nome, max_entries=32):
+        self.nome = nome
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        CACHES[nome] = self
+
+    def get_or_compute(self, key, compute):
+        """
+        Retorna o valor em cache para a chave ou calcula e armazena
+
+        Args:
+            key: Chave hashable (None desativa o cache e sempre calcula)
+            compute: Função sem argumentos que calcula o valor
+
+        Returns:
+            Valor em cache ou recém-calculado
+        """
+        if key is None:
+            return compute()
+
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = compute()
+
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+        return value
+
+    def clear(self):
+        """Remove todas as entradas (mantém as estatísticas)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Acertos, erros, taxa de acerto e número de entradas
+        """
+        total = self.hits + self.misses
+        return {
+            "nome": self.nome,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total * 100) if total > 0 else 0.0,
+            "entradas": len(self._entries)
+        }
+
+
+def session_data_key():
+    """
+    Identifica os dados carregados na sessão atual (janela ativa + versão dos dados)
+
+    Returns:
+        tuple: (janela_id, data_version) ou None se a versão ainda não é conhecida
+    """
+    data_version = st.session_state.get("data_version")
+    if data_version is None:
+        return None
+    db_manager = st.session_state.get("db_manager")
+    return (getattr(db_manager, "janela_id", None), data_version)
+
+
+def get_shared_data_version(db_manager, max_age=5):
+    """
+    Versão dos dados compartilhada entre sessões (no máximo uma consulta por max_age)
+
+    Usada pelo modo ao vivo: muitas telas verificando mudanças custam uma única
+    leitura da tabela data_version por período.
+
+    Args:
+        db_manager: Gerenciador de banco
+        max_age: Idade máxima (segundos) da versão lida antes de consultar o banco
+
+    Returns:
+        int: Versão dos dados
+    """
+    agora = time.monotonic()
+    with _versoes_lock:
+        lida = _versoes_compartilhadas.get(db_manager.db_path)
+        if lida is not None and agora - lida[0] < max_age:
+            return lida[1]
+
+    versao = db_manager.get_data_version()
+
+    with _versoes_lock:
+        _versoes_compartilhadas[db_manager.db_path] = (agora, versao)
+    return versao
+
+
+def publish_shared_data_version(db_path, versao):
+    """
+    Atualiza a versão compartilhada com uma versão recém-lida do banco (ex: após uma escrita)
+
+    Evita que o modo ao vivo compare a versão da sessão com uma leitura mais antiga
+    ainda dentro do max_age. Nunca regride uma versão já conhecida.
+
+    Args:
+        db_path: Caminho do banco
+        versao: Versão dos dados lida do banco
+    """
+    if versao is None:
+        return
+    with _versoes_lock:
+        lida = _versoes_compartilhadas.get(db_path)
+        if lida is None or versao >= lida[1]:
+            _versoes_compartilhadas[db_path] = (time.monotonic(), versao)
+
+
+def invalidate_shared_data_version(db_path):
+    """
+    Descarta a versão compartilhada de um banco (a próxima leitura consulta o banco)
+
+    Args:
+        db_path: Caminho do banco
+    """
+    with _versoes_lock:
+        _versoes_compartilhadas.pop(db_path, None)
@@ -3,7 +3,8 @@ Módulo para cálculos e lógica de negócio
 """
 import pandas as pd
 from datetime import datetime, timedelta
-from config import DATE_FORMAT, STATUS_OPCOES, SEQUENCIAS, TOTAL_GERAL
+from config import DATE_FORMAT, STATUS_OPCOES
+from modules.instrumentation import timed
 
 
 def convert_time_to_minutes(time_str):
@@ -134,6 +135,7 @@ def update_status_by_delay(status, delay_minutes):
     return status
 
 
+@timed("calculate_statistics")
 def calculate_statistics(data_dict):
     """
     Calcula estatísticas gerais e por CRQ
@@ -209,7 +211,87 @@ def calculate_statistics(data_dict):
         stats["geral"]["adiantadas"] += seq_stats["adiantadas"]
         stats["geral"]["milestones"] += milestones_count
     
-    # Calcular percentuais
+    _apply_percentages(stats)
+    
+    return stats
+
+
+@timed("calculate_statistics_from_counts")
+def calculate_statistics_from_counts(status_counts):
+    """
+    Monta as estatísticas a partir de contagens já agregadas por CRQ e status
+    (ex: GROUP BY sequencia, status no banco)
+    
+    Args:
+        status_counts: Iterável de tuplas
+            (sequencia, status, atividades, milestones, atrasadas_por_tempo)
+        
+    Returns:
+        dict: Estatísticas no mesmo formato de calculate_statistics
+    """
+    stats = {
+        "geral": {
+            "total": 0,
+            "concluidas": 0,
+            "em_execucao": 0,
+            "planejadas": 0,
+            "atrasadas": 0,
+            "adiantadas": 0,
+            "milestones": 0
+        },
+        "por_sequencia": {}
+    }
+    
+    for sequencia, status, atividades, milestones, atrasadas_por_tempo in status_counts:
+        atividades = int(atividades or 0)
+        milestones = int(milestones or 0)
+        atrasadas_por_tempo = int(atrasadas_por_tempo or 0)
+        
+        seq_stats = stats["por_sequencia"].setdefault(sequencia, {
+            "total": 0,
+            "concluidas": 0,
+            "em_execucao": 0,
+            "planejadas": 0,
+            "atrasadas": 0,
+            "adiantadas": 0,
+            "milestones": 0
+        })
+        
+        seq_stats["total"] += atividades
+        seq_stats["milestones"] += milestones
+        
+        # Mesmas regras de calculate_statistics (Adiantado conta como Em Execução)
+        if status == "Concluído":
+            seq_stats["concluidas"] += atividades
+        elif status == "Em Execução":
+            seq_stats["em_execucao"] += atividades
+        elif status == "Adiantado":
+            seq_stats["em_execucao"] += atividades
+            seq_stats["adiantadas"] += atividades
+        elif status == "Planejado":
+            seq_stats["planejadas"] += atividades
+        elif status == "Atrasado":
+            seq_stats["atrasadas"] += atividades
+        
+        # Atividades com atraso > 0 contam como atrasadas mesmo sem status "Atrasado"
+        seq_stats["atrasadas"] += atrasadas_por_tempo
+    
+    for seq_stats in stats["por_sequencia"].values():
+        for key in ["total", "concluidas", "em_execucao", "planejadas", "atrasadas", "adiantadas", "milestones"]:
+            stats["geral"][key] += seq_stats[key]
+    
+    _apply_percentages(stats)
+    
+    return stats
+
+
+def _apply_percentages(stats):
+    """
+    Calcula percentuais do geral e de cada CRQ (in-place)
+    
+    Args:
+        stats: Estatísticas com contagens já preenchidas
+    """
     for key in ["geral"] + list(stats["por_sequencia"].keys()):
         if key == "geral":
             total = stats["geral"]["total"]
@@ -228,8 +310,6 @@ def calculate_statistics(data_dict):
                 seq_stats["pct_em_execucao"] = (seq_stats["em_execucao"] / total) * 100
                 seq_stats["pct_planejadas"] = (seq_stats["planejadas"] / total) * 100
                 seq_stats["pct_atrasadas"] = (seq_stats["atrasadas"] / total) * 100
-    
-    return stats
 
 
 def get_activities_by_status(data_dict, status, sequencia=None, exclude_milestones=True):
@@ -410,6 +490,208 @@ def parse_datetime_string(dt_string):
         return None
 
 
+def parse_datetime_series(serie):
+    """
+    Versão vetorizada de parse_datetime_string para uma coluna inteira
+
+    Args:
+        serie: pd.Series com datetimes e/ou strings no DATE_FORMAT
+
+    Returns:
+        pd.Series: datetime64 sem timezone (NaT para valores vazios ou inválidos)
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        resultado = serie
+    else:
+        resultado = pd.to_datetime(serie, format=DATE_FORMAT, errors='coerce')
+
+    if getattr(resultado.dt, "tz", None) is not None:
+        resultado = resultado.dt.tz_localize(None)
+    return resultado
+
+
+def compute_execution_status(data_dict, agora):
+    """
+    Calcula o status de execução das atividades (sem milestones) em relação a agora
+
+    - "atrasadas": já passou do início planejado e ainda não estão em execução/concluídas
+    - "em_execucao": em execução (ou adiantadas), com Is_Adiantada quando o início
+      real foi antes do planejado
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+        agora: Data/hora atual (datetime sem timezone)
+
+    Returns:
+        dict: {"atrasadas": {crq: DataFrame}, "em_execucao": {crq: DataFrame}}
+            atrasadas: Seq, Atividade, Inicio_Planejado, Status
+            em_execucao: Seq, Atividade, Inicio_Planejado, Inicio_Real, Is_Adiantada
+    """
+    frames = []
+    for sequencia, data in data_dict.items():
+        df = data["dataframe"]
+        if len(df) == 0:
+            continue
+
+        if "Is_Milestone" in df.columns:
+            df = df[df["Is_Milestone"].fillna(False) != True]
+
+        vazio = pd.Series([None] * len(df), index=df.index, dtype=object)
+        frames.append(pd.DataFrame({
+            "CRQ": sequencia,
+            "Seq": df["Seq"] if "Seq" in df.columns else vazio,
+            "Atividade": df.get("Atividade", vazio).astype("string").fillna("").str.strip(),
+            "Status": df.get("Status", vazio).astype("string").fillna("").str.strip(),
+            "Inicio_Planejado": parse_datetime_series(df.get("Inicio", vazio)),
+            "Inicio_Real": parse_datetime_series(df.get("Horario_Inicio_Real", vazio))
+        }))
+
+    if not frames:
+        return {"atrasadas": {}, "em_execucao": {}}
+
+    todas = pd.concat(frames, ignore_index=True)
+
+    # Apenas atividades cujo início planejado já passou
+    iniciou = todas["Inicio_Planejado"].notna() & (todas["Inicio_Planejado"] <= pd.Timestamp(agora))
+    status = todas["Status"]
+
+    atrasadas = todas[iniciou & ~status.isin(["Em Execução", "Concluído", "Atrasado", "Adiantado"])]
+    atrasadas = atrasadas[["CRQ", "Seq", "Atividade", "Inicio_Planejado", "Status"]]
+
+    em_execucao = todas[iniciou & status.isin(["Em Execução", "Adiantado"])].copy()
+    # Comparação com NaT é sempre False (sem início real não é adiantada)
+    em_execucao["Is_Adiantada"] = em_execucao["Inicio_Real"] < em_execucao["Inicio_Planejado"]
+    em_execucao = em_execucao[["CRQ", "Seq", "Atividade", "Inicio_Planejado", "Inicio_Real", "Is_Adiantada"]]
+
+    return {
+        "atrasadas": dict(tuple(atrasadas.groupby("CRQ", sort=False))),
+        "em_execucao": dict(tuple(em_execucao.groupby("CRQ", sort=False)))
+    }
+
+
+def _to_datetime_or_none(valor):
+    """Converte Timestamp para datetime (NaT vira None)"""
+    return None if pd.isna(valor) else valor.to_pydatetime()
+
+
+def compute_burndown(data_dict, crqs, agora):
+    """
+    Calcula os dados do Burndown (apenas atividades Concluídas reduzem o restante)
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+        crqs: Lista de CRQs considerados
+        agora: Data/hora do ponto final (atual)
+
+    Returns:
+        dict: {"total": int, "timestamps": list, "restantes": list, "concluidas": list}
+            (listas vazias quando não há atividades)
+    """
+    total_atividades = 0
+    conclusoes = []
+
+    for crq in crqs:
+        if crq not in data_dict:
+            continue
+
+        df = data_dict[crq]["dataframe"]
+        # Excluir milestones das contagens
+        if "Is_Milestone" in df.columns:
+            df = df[df["Is_Milestone"].fillna(False) == False]
+
+        total_atividades += len(df)
+        if "Status" in df.columns and "Horario_Fim_Real" in df.columns:
+            concluidas_df = df[df["Status"] == "Concluído"]
+            conclusoes.append(parse_datetime_series(concluidas_df["Horario_Fim_Real"]).dropna())
+
+    if total_atividades == 0:
+        return {"total": 0, "timestamps": [], "restantes": [], "concluidas": []}
+
+    datas = [d.to_pydatetime() for d in pd.concat(conclusoes).sort_values()] if conclusoes else []
+
+    if not datas:
+        # Sem atividades concluídas: apenas o total
+        return {"total": total_atividades, "timestamps": [agora], "restantes": [total_atividades], "concluidas": [0]}
+
+    # Ponto inicial (todas pendentes), um ponto por conclusão e o ponto atual
+    acumuladas = list(range(1, len(datas) + 1))
+    concluidas = [0] + acumuladas + [len(datas)]
+    return {
+        "total": total_atividades,
+        "timestamps": [datas[0]] + datas + [agora],
+        "restantes": [total_atividades - n for n in concluidas],
+        "concluidas": concluidas
+    }
+
+
+def compute_gantt_data(data_dict):
+    """
+    Calcula uma barra por CRQ para o gráfico de Gantt (sem milestones)
+
+    - Planejado: menor Inicio / maior Fim
+    - Real: menor início real / maior fim real (atividades Concluídas/Atrasadas sem
+      execução em andamento também contam o fim planejado)
+    - Execução: período das atividades Em Execução/Adiantadas (fim planejado quando
+      não há fim real)
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+
+    Returns:
+        list: Dicts com CRQ, Inicio_Planejado, Fim_Planejado, Inicio_Real, Fim_Real,
+            Inicio_Execucao, Fim_Execucao, Tem_Adiantadas, Fim_Adiantada (datetime ou None)
+    """
+    gantt_data = []
+
+    for sequencia, data in data_dict.items():
+        df = data["dataframe"]
+        if len(df) == 0:
+            continue
+
+        if "Is_Milestone" in df.columns:
+            df = df[df["Is_Milestone"].fillna(False) != True]
+
+        vazio = pd.Series([None] * len(df), index=df.index, dtype=object)
+        inicio_planejado = parse_datetime_series(df.get("Inicio", vazio))
+        fim_planejado = parse_datetime_series(df.get("Fim", vazio))
+        inicio_real = parse_datetime_series(df.get("Horario_Inicio_Real", vazio))
+        fim_real = parse_datetime_series(df.get("Horario_Fim_Real", vazio))
+        status = df.get("Status", vazio).astype("string").fillna("").str.strip()
+
+        is_em_execucao = status.isin(["Em Execução", "Adiantado"])
+        is_adiantada = (status == "Adiantado") & fim_real.notna()
+
+        # Execução: início real (ou planejado) até o fim real (ou planejado)
+        inicio_execucao = inicio_real.fillna(inicio_planejado)
+        fim_execucao = fim_real.fillna(fim_planejado)
+        em_execucao = is_em_execucao & inicio_execucao.notna()
+
+        # Concluídas/atrasadas (e adiantadas sem datas) também contam o fim planejado
+        usa_fim_planejado = status.isin(["Concluído", "Atrasado", "Adiantado"]) & ~em_execucao
+        fim_real_max = max(
+            (v for v in [fim_real.max(), fim_planejado[usa_fim_planejado].max()] if pd.notna(v)),
+            default=pd.NaT
+        )
+
+        registro = {
+            "CRQ": sequencia,
+            "Inicio_Planejado": _to_datetime_or_none(inicio_planejado.min()),
+            "Fim_Planejado": _to_datetime_or_none(fim_planejado.max()),
+            "Inicio_Real": _to_datetime_or_none(inicio_real.min()),
+            "Fim_Real": _to_datetime_or_none(fim_real_max),
+            "Inicio_Execucao": _to_datetime_or_none(inicio_execucao[em_execucao].min()),
+            "Fim_Execucao": _to_datetime_or_none(fim_execucao[em_execucao].max()),
+            "Tem_Adiantadas": bool(is_adiantada.any()),
+            "Fim_Adiantada": _to_datetime_or_none(fim_real[is_adiantada].max())
+        }
+
+        # Apenas CRQs com pelo menos uma data
+        if any(registro[chave] for chave in ["Inicio_Planejado", "Fim_Planejado", "Inicio_Real", "Fim_Real"]):
+            gantt_data.append(registro)
+
+    return gantt_data
+
+
 def get_milestones(data_dict, sequencia=None):
     """
     Retorna milestones (marcos do projeto)
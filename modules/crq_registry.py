@@ -0,0 +1,134 @@
+"""
+Módulo de cadastro de CRQs (nome, emoji e total esperado)
+"""
+import re
+import streamlit as st
+from config import SEQUENCIAS
+
+
+class CRQRegistry:
+    """Cadastro de CRQs com identificação de abas do Excel por expressão pré-compilada"""
+
+    def __init__(self, crqs):
+        """
+        Args:
+            crqs: Dicionário ordenado {sigla: {"nome": ..., "emoji": ..., "total": ...}}
+        """
+        self.crqs = {
+            str(sigla).upper(): {
+                "nome": info.get("nome") or str(sigla).upper(),
+                "emoji": info.get("emoji") or "📊",
+                "total": int(info.get("total") or 0)
+            }
+            for sigla, info in crqs.items()
+        }
+        self.total_geral = sum(info["total"] for info in self.crqs.values())
+
+        # Expressão pré-compilada para descartar de uma vez abas sem nenhuma sigla
+        siglas = list(self.crqs.keys())
+        self._matcher = re.compile("|".join(re.escape(sigla) for sigla in siglas)) if siglas else None
+
+    def fingerprint(self):
+        """
+        Siglas na ordem do cadastro: identifica o cadastro em chaves de cache
+
+        Returns:
+            tuple: Siglas
+        """
+        return tuple(self.crqs)
+
+    def match(self, sheet_name):
+        """
+        Identifica a CRQ pelo nome da aba do Excel (a sigla contida no nome)
+
+        Se mais de uma sigla aparece no nome, vale a primeira na ordem do cadastro
+        (mesma precedência da antiga varredura de SEQUENCIAS), e não a posição no nome.
+
+        Args:
+            sheet_name: Nome da aba
+
+        Returns:
+            str: Sigla da CRQ ou None se a aba não for reconhecida
+        """
+        if self._matcher is None:
+            return None
+        nome = str(sheet_name).upper()
+        if not self._matcher.search(nome):
+            return None
+        return next(sigla for sigla in self.crqs if sigla in nome)
+
+    def get(self, sigla, default=None):
+        """Retorna as informações da CRQ ({"nome", "emoji", "total"}) ou default"""
+        return self.crqs.get(sigla, default)
+
+    def keys(self):
+        return self.crqs.keys()
+
+    def items(self):
+        return self.crqs.items()
+
+    def __contains__(self, sigla):
+        return sigla in self.crqs
+
+    def __iter__(self):
+        return iter(self.crqs)
+
+    def __len__(self):
+        return len(self.crqs)
+
+    def group_by_crq(self, itens, key="CRQ"):
+        """
+        Agrupa uma lista de dicts por CRQ em uma única passada
+
+        Args:
+            itens: Lista de dicts com a sigla da CRQ em `key`
+            key: Chave com a sigla da CRQ
+
+        Returns:
+            dict: {sigla: [itens]} na ordem do cadastro (CRQs fora do cadastro ao final)
+        """
+        grupos = {}
+        for item in itens:
+            grupos.setdefault(item.get(key), []).append(item)
+
+        return {sigla: grupos[sigla] for sigla in self.sort_crqs(grupos.keys())}
+
+    def sort_crqs(self, siglas):
+        """
+        Ordena siglas de CRQ pela ordem do cadastro (CRQs fora do cadastro ao final)
+
+        Args:
+            siglas: Iterável de siglas
+
+        Returns:
+            list: Siglas ordenadas
+        """
+        siglas = list(siglas)
+        presentes = set(siglas)
+        cadastradas = [sigla for sigla in self.crqs if sigla in presentes]
+        return cadastradas + [sigla for sigla in siglas if sigla not in self.crqs]
+
+
+def default_registry():
+    """Cadastro padrão (config.SEQUENCIAS), usado para popular o banco e sem banco disponível"""
+    return CRQRegistry(SEQUENCIAS)
+
+
+def get_crq_registry(db_manager=None):
+    """
+    Retorna o cadastro de CRQs do banco (em cache por versão dos dados)
+
+    Args:
+        db_manager: Gerenciador de banco (opcional; padrão: st.session_state.db_manager)
+
+    Returns:
+        CRQRegistry: Cadastro de CRQs
+    """
+    if db_manager is None:
+        db_manager = st.session_state.get("db_manager")
+        if db_manager is None:
+            return default_registry()
+        # A versão já foi lida nesta execução; evita uma consulta extra ao banco
+        return db_manager.get_crq_registry(st.session_state.get("data_version"))
+
+    return db_manager.get_crq_registry()
@@ -4,8 +4,14 @@ Módulo CRUD para gerenciamento completo de atividades
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from config import DATE_FORMAT, SEQUENCIAS, STATUS_OPCOES
-from modules.calculations import calculate_delay, parse_datetime_string, validate_datetime_string
+from config import DATE_FORMAT, STATUS_OPCOES
+from modules.crq_registry import get_crq_registry
+from modules.calculations import parse_datetime_string, validate_datetime_string
+from modules.transitions import resolve_transition, TransitionError
+from modules.activity_index import get_activity_index, get_activity_row
+from modules.data_loader import reload_session_data
+from modules.database import ConflictError
+from modules.instrumentation import log_exception
 
 
 def render_crud_activities(data_dict, db_manager):
@@ -49,7 +55,7 @@ def render_list_activities(data_dict, db_manager):
     with col1:
         crq_filtro = st.selectbox(
             "Filtrar por CRQ:",
-            ["Todos"] + list(SEQUENCIAS.keys()),
+            ["Todos"] + list(get_crq_registry().keys()),
             key="list_crq_filter"
         )
     
@@ -62,52 +68,62 @@ def render_list_activities(data_dict, db_manager):
     
     with col3:
         buscar_texto = st.text_input(
-            "Buscar (Atividade, Executor, etc):",
+            "Buscar (Atividade, Executor, Observações, etc):",
             key="list_search"
         )
     
-    # Coletar todas as atividades
-    all_activities = []
-    for sequencia, data in data_dict.items():
-        if crq_filtro != "Todos" and sequencia != crq_filtro:
-            continue
-        
-        df = data["dataframe"]
-        for idx, row in df.iterrows():
-            atividade_info = {
-                "CRQ": sequencia,
-                "Seq": row.get("Seq", ""),
-                "Atividade": row.get("Atividade", ""),
-                "Status": row.get("Status", ""),
-                "Executor": row.get("Executor", ""),
-                "Grupo": row.get("Grupo", ""),
-                "Inicio": row.get("Inicio", ""),
-                "Fim": row.get("Fim", ""),
-                "Horario_Inicio_Real": row.get("Horario_Inicio_Real", ""),
-                "Horario_Fim_Real": row.get("Horario_Fim_Real", ""),
-                "Observacoes": row.get("Observacoes", ""),
-                "Excel_Data_ID": row.get("Excel_Data_ID", 0)
-            }
-            
-            # Aplicar filtros
-            if status_filtro != "Todos" and atividade_info["Status"] != status_filtro:
-                continue
-            
-            if buscar_texto:
-                texto_busca = buscar_texto.lower()
-                if (texto_busca not in str(atividade_info["Atividade"]).lower() and
-                    texto_busca not in str(atividade_info["Executor"]).lower() and
-                    texto_busca not in str(atividade_info["Grupo"]).lower()):
-                    continue
-            
-            all_activities.append(atividade_info)
+    col_ordem, col_tamanho = st.columns(2)
+    
+    with col_ordem:
+        ordem_opcoes = {
+            "CRQ / Seq": "sequencia",
+            "Seq": "seq",
+            "Atividade": "atividade",
+            "Status": "status",
+            "Início Planejado": "inicio",
+            "Fim Planejado": "fim"
+        }
+        ordem_label = st.selectbox(
+            "Ordenar por:",
+            list(ordem_opcoes.keys()),
+            key="list_order_by"
+        )
+    
+    with col_tamanho:
+        tamanho_pagina = st.selectbox(
+            "Atividades por página:",
+            [25, 50, 100, 200],
+            index=1,
+            key="list_page_size"
+        )
+    
+    # Voltar para a primeira página quando os filtros mudam
+    filtros_atuais = (crq_filtro, status_filtro, buscar_texto, ordem_label, tamanho_pagina)
+    if st.session_state.get("list_last_filters") != filtros_atuais:
+        st.session_state["list_last_filters"] = filtros_atuais
+        st.session_state["list_page"] = 1
+    
+    pagina = st.session_state.get("list_page", 1)
     
-    if not all_activities:
+    # Filtros, ordenação e paginação são aplicados no banco (busca textual via FTS5)
+    df_display, total = db_manager.query_activities(
+        sequencia=None if crq_filtro == "Todos" else crq_filtro,
+        status=None if status_filtro == "Todos" else status_filtro,
+        texto=buscar_texto,
+        order_by=ordem_opcoes[ordem_label],
+        limit=tamanho_pagina,
+        offset=(pagina - 1) * tamanho_pagina
+    )
+    
+    if total == 0:
         st.info("Nenhuma atividade encontrada com os filtros aplicados.")
         return
     
-    # Criar DataFrame para exibição
-    df_display = pd.DataFrame(all_activities)
+    total_paginas = max(1, (total + tamanho_pagina - 1) // tamanho_pagina)
+    if pagina > total_paginas:
+        # Dados diminuíram desde a última visita: voltar para a última página existente
+        st.session_state["list_page"] = total_paginas
+        st.rerun()
     
     # Selecionar colunas para exibição
     display_cols = ["CRQ", "Seq", "Atividade", "Status", "Executor", "Grupo", 
@@ -117,8 +133,29 @@ def render_list_activities(data_dict, db_manager):
     available_cols = [col for col in display_cols if col in df_display.columns]
     df_display = df_display[available_cols]
     
-    st.write(f"**Total de atividades encontradas: {len(df_display)}**")
+    st.write(f"**Total de atividades encontradas: {total}** (página {pagina} de {total_paginas})")
     st.dataframe(df_display, use_container_width=True, hide_index=True)
+    
+    def mudar_pagina(delta):
+        st.session_state["list_page"] = st.session_state.get("list_page", 1) + delta
+    
+    col_anterior, col_pagina, col_proxima = st.columns([1, 2, 1])
+    
+    with col_anterior:
+        st.button("⬅️ Anterior", disabled=pagina <= 1, key="list_prev_page",
+                  on_click=mudar_pagina, args=(-1,))
+    
+    with col_pagina:
+        st.number_input(
+            "Página:",
+            min_value=1,
+            max_value=total_paginas,
+            key="list_page"
+        )
+    
+    with col_proxima:
+        st.button("Próxima ➡️", disabled=pagina >= total_paginas, key="list_next_page",
+                  on_click=mudar_pagina, args=(1,))
 
 
 def render_create_activity(data_dict, db_manager):
@@ -131,7 +168,7 @@ def render_create_activity(data_dict, db_manager):
         with col1:
             crq_selecionado = st.selectbox(
                 "CRQ:",
-                list(SEQUENCIAS.keys()),
+                list(get_crq_registry().keys()),
                 key="create_crq"
             )
             
@@ -212,21 +249,23 @@ def render_create_activity(data_dict, db_manager):
                 st.error(f"❌ Data de fim inválida. Use o formato {DATE_FORMAT}")
                 return
             
-            if horario_inicio_real and not validate_datetime_string(horario_inicio_real):
-                st.error(f"❌ Horário início real inválido. Use o formato {DATE_FORMAT}")
-                return
-            
-            if horario_fim_real and not validate_datetime_string(horario_fim_real):
-                st.error(f"❌ Horário fim real inválido. Use o formato {DATE_FORMAT}")
+            # Horários reais e atraso pelo motor de transições (edição administrativa:
+            # sem máquina de estados nem preenchimento automático)
+            try:
+                resultado = resolve_transition(
+                    old_status=status,
+                    new_status=status,
+                    old_inicio_real=None,
+                    old_fim_real=None,
+                    fim_planejado=fim,
+                    new_inicio_real=horario_inicio_real or "",
+                    new_fim_real=horario_fim_real or "",
+                    regras_status=False
+                )
+            except TransitionError as e:
+                st.error(f"❌ {str(e)}")
                 return
-            
-            # Calcular atraso se houver fim real e fim planejado
-            atraso_minutos = 0
-            if horario_fim_real and fim:
-                fim_planejado_dt = parse_datetime_string(fim)
-                fim_real_dt = parse_datetime_string(horario_fim_real)
-                if fim_planejado_dt and fim_real_dt:
-                    atraso_minutos = calculate_delay(fim_planejado_dt, fim_real_dt)
+            atraso_minutos = resultado["atraso_minutos"]
             
             try:
                 # Inserir no excel_data
@@ -247,10 +286,11 @@ def render_create_activity(data_dict, db_manager):
                 
                 cursor.execute("""
                     INSERT INTO excel_data
-                    (sequencia, seq, atividade, grupo, localidade, executor, 
+                    (janela_id, sequencia, seq, atividade, grupo, localidade, executor, 
                      telefone, inicio, fim, tempo)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                 """, (
+                    db_manager.janela_id,
                     crq_selecionado,
                     int(seq),
                     atividade.strip(),
@@ -272,30 +312,86 @@ def render_create_activity(data_dict, db_manager):
                     seq=int(seq),
                     sequencia=crq_selecionado,
                     status=status,
-                    horario_inicio_real=horario_inicio_real.strip() if horario_inicio_real else None,
-                    horario_fim_real=horario_fim_real.strip() if horario_fim_real else None,
+                    horario_inicio_real=resultado["horario_inicio_real"],
+                    horario_fim_real=resultado["horario_fim_real"],
                     atraso_minutos=atraso_minutos,
                     observacoes=observacoes.strip() if observacoes else None,
                     is_milestone=is_milestone,
-                    excel_data_id=excel_data_id
+                    excel_data_id=excel_data_id,
+                    versao_esperada=0
                 )
                 
                 st.success(f"✅ Atividade criada com sucesso! (Seq: {seq}, CRQ: {crq_selecionado})")
                 
                 # Recarregar dados
-                saved_excel_data = db_manager.load_excel_data()
-                if saved_excel_data:
-                    control_data = db_manager.get_all_activities_control()
-                    from modules.data_loader import merge_control_data
-                    merged_data = merge_control_data(saved_excel_data, control_data)
-                    st.session_state.data_dict = merged_data
+                reload_session_data(db_manager)
                 
                 st.rerun()
                 
+            except ConflictError:
+                reload_session_data(db_manager)
+                st.error("⚠️ O controle desta atividade foi criado por outra sessão ao mesmo tempo. "
+                         "Os dados foram recarregados: confira os valores atuais.")
             except Exception as e:
+                log_exception("crud.criar.erro", sequencia=crq_selecionado)
                 st.error(f"❌ Erro ao criar atividade: {str(e)}")
-                import traceback
-                st.code(traceback.format_exc())
+
+
+def render_activity_selector(data_dict, db_manager, crq_selecionado, key_prefix, label):
+    """
+    Renderiza busca + seletor de atividade de um CRQ usando o índice de atividades
+    
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+        db_manager: Instância do DatabaseManager
+        crq_selecionado: CRQ selecionado
+        key_prefix: Prefixo das keys dos widgets (ex: "edit", "delete")
+        label: Rótulo do seletor
+        
+    Returns:
+        tuple: (seq, excel_data_id, linha da atividade) ou None se nada foi selecionado
+    """
+    index = get_activity_index(data_dict)
+    opcoes = index["options"].get(crq_selecionado, [])
+    chaves = index["keys"].get(crq_selecionado, [])
+    
+    # Busca textual (FTS5) para reduzir a lista de opções
+    busca = st.text_input(
+        "🔎 Buscar atividade (nome, executor, observações...):",
+        key=f"{key_prefix}_busca"
+    )
+    
+    if busca.strip():
+        encontrados = db_manager.search_activities(busca, sequencia=crq_selecionado, limit=200)
+        posicoes = [
+            index["positions"][(crq_selecionado, int(excel_data_id))]
+            for excel_data_id in encontrados["Excel_Data_ID"]
+            if (crq_selecionado, int(excel_data_id)) in index["positions"]
+        ]
+    else:
+        posicoes = list(range(len(opcoes)))
+    
+    if not posicoes:
+        st.warning("Nenhuma atividade encontrada nesta CRQ." if not busca.strip()
+                   else "Nenhuma atividade encontrada para a busca informada.")
+        return None
+    
+    # Opções são posições no dataframe do CRQ (rótulos pré-calculados no índice)
+    posicao = st.selectbox(
+        label,
+        posicoes,
+        format_func=lambda pos: opcoes[pos],
+        key=f"{key_prefix}_atividade_select"
+    )
+    
+    _, excel_data_id = chaves[posicao]
+    df, original_idx = get_activity_row(data_dict, crq_selecionado, excel_data_id)
+    if df is None:
+        st.error("Atividade não encontrada.")
+        return None
+    
+    atividade_row = df.loc[original_idx]
+    return int(atividade_row.get("Seq", 0)), excel_data_id, atividade_row
 
 
 def render_edit_activity(data_dict, db_manager):
@@ -312,44 +408,27 @@ def render_edit_activity(data_dict, db_manager):
     with col1:
         crq_selecionado = st.selectbox(
             "Selecione a CRQ:",
-            list(SEQUENCIAS.keys()),
+            list(get_crq_registry().keys()),
             key="edit_crq"
         )
     
     with col2:
         if crq_selecionado in data_dict:
-            df = data_dict[crq_selecionado]["dataframe"]
-            atividades_opcoes = []
-            for idx, row in df.iterrows():
-                seq = row.get("Seq", "")
-                atividade = row.get("Atividade", "")
-                atividades_opcoes.append(f"Seq {seq}: {atividade}")
-            
-            if not atividades_opcoes:
-                st.warning("Nenhuma atividade encontrada nesta CRQ.")
-                return
-            
-            atividade_selecionada = st.selectbox(
-                "Selecione a atividade:",
-                atividades_opcoes,
-                key="edit_atividade_select"
+            selecao = render_activity_selector(
+                data_dict, db_manager, crq_selecionado, "edit", "Selecione a atividade:"
             )
-            
-            # Extrair seq da seleção
-            seq_selecionado = int(atividade_selecionada.split(":")[0].replace("Seq", "").strip())
-            
-            # Buscar dados da atividade
-            atividade_row = None
-            excel_data_id = 0
-            for idx, row in df.iterrows():
-                if int(row.get("Seq", 0)) == seq_selecionado:
-                    atividade_row = row
-                    excel_data_id = row.get("Excel_Data_ID", 0)
-                    break
-            
-            if atividade_row is None:
-                st.error("Atividade não encontrada.")
+            if selecao is None:
                 return
+            seq_selecionado, excel_data_id, atividade_row = selecao
+            
+            # Versão da linha quando o formulário foi aberto: a cada rerun os dados da sessão
+            # são recarregados, então a versão fica guardada até salvar ou trocar de atividade
+            versao_carregada = st.session_state.get("edit_versao_linha")
+            if versao_carregada is None or versao_carregada[0] != excel_data_id:
+                versao_linha = atividade_row.get("Versao_Linha")
+                versao_linha = None if versao_linha is None or pd.isna(versao_linha) else int(versao_linha)
+                st.session_state["edit_versao_linha"] = (excel_data_id, versao_linha)
+            versao_linha = st.session_state["edit_versao_linha"][1]
             
             # Formulário de edição
             with st.form("form_edit_activity"):
@@ -434,23 +513,40 @@ def render_edit_activity(data_dict, db_manager):
                         st.error(f"❌ Data de fim inválida. Use o formato {DATE_FORMAT}")
                         return
                     
-                    if horario_inicio_real and not validate_datetime_string(horario_inicio_real):
-                        st.error(f"❌ Horário início real inválido. Use o formato {DATE_FORMAT}")
-                        return
-                    
-                    if horario_fim_real and not validate_datetime_string(horario_fim_real):
-                        st.error(f"❌ Horário fim real inválido. Use o formato {DATE_FORMAT}")
+                    # Horários reais e atraso pelo motor de transições (edição administrativa:
+                    # qualquer status pode ser definido, sem preenchimento automático)
+                    try:
+                        resultado = resolve_transition(
+                            old_status=atividade_row.get("Status", "Planejado"),
+                            new_status=status,
+                            old_inicio_real=None,
+                            old_fim_real=None,
+                            fim_planejado=fim,
+                            new_inicio_real=horario_inicio_real or "",
+                            new_fim_real=horario_fim_real or "",
+                            regras_status=False
+                        )
+                    except TransitionError as e:
+                        st.error(f"❌ {str(e)}")
                         return
-                    
-                    # Calcular atraso
-                    atraso_minutos = 0
-                    if horario_fim_real and fim:
-                        fim_planejado_dt = parse_datetime_string(fim)
-                        fim_real_dt = parse_datetime_string(horario_fim_real)
-                        if fim_planejado_dt and fim_real_dt:
-                            atraso_minutos = calculate_delay(fim_planejado_dt, fim_real_dt)
+                    atraso_minutos = resultado["atraso_minutos"]
                     
                     try:
+                        # Atualizar controle primeiro (se outra sessão salvou depois da abertura
+                        # do formulário, ConflictError e nada é gravado)
+                        db_manager.save_activity_control(
+                            seq=int(seq_selecionado),
+                            sequencia=crq_selecionado,
+                            status=status,
+                            horario_inicio_real=resultado["horario_inicio_real"],
+                            horario_fim_real=resultado["horario_fim_real"],
+                            atraso_minutos=atraso_minutos,
+                            observacoes=observacoes.strip() if observacoes else None,
+                            is_milestone=is_milestone,
+                            excel_data_id=excel_data_id if excel_data_id > 0 else None,
+                            versao_esperada=versao_linha
+                        )
+                        
                         # Atualizar excel_data
                         conn = db_manager.get_connection()
                         cursor = conn.cursor()
@@ -482,35 +578,23 @@ def render_edit_activity(data_dict, db_manager):
                         conn.commit()
                         conn.close()
                         
-                        # Atualizar controle
-                        db_manager.save_activity_control(
-                            seq=int(seq_selecionado),
-                            sequencia=crq_selecionado,
-                            status=status,
-                            horario_inicio_real=horario_inicio_real.strip() if horario_inicio_real else None,
-                            horario_fim_real=horario_fim_real.strip() if horario_fim_real else None,
-                            atraso_minutos=atraso_minutos,
-                            observacoes=observacoes.strip() if observacoes else None,
-                            is_milestone=is_milestone,
-                            excel_data_id=excel_data_id if excel_data_id > 0 else None
-                        )
-                        
                         st.success("✅ Atividade atualizada com sucesso!")
+                        st.session_state.pop("edit_versao_linha", None)
                         
                         # Recarregar dados
-                        saved_excel_data = db_manager.load_excel_data()
-                        if saved_excel_data:
-                            control_data = db_manager.get_all_activities_control()
-                            from modules.data_loader import merge_control_data
-                            merged_data = merge_control_data(saved_excel_data, control_data)
-                            st.session_state.data_dict = merged_data
+                        reload_session_data(db_manager)
                         
                         st.rerun()
                         
+                    except ConflictError:
+                        # Recarregar e passar a considerar a versão atual da linha
+                        st.session_state.pop("edit_versao_linha", None)
+                        reload_session_data(db_manager)
+                        st.error("⚠️ Esta atividade foi alterada por outra sessão enquanto você editava. "
+                                 "Os dados foram recarregados: confira os valores atuais e salve novamente.")
                     except Exception as e:
+                        log_exception("crud.editar.erro", sequencia=crq_selecionado, excel_data_id=excel_data_id)
                         st.error(f"❌ Erro ao atualizar atividade: {str(e)}")
-                        import traceback
-                        st.code(traceback.format_exc())
 
 
 def render_delete_activity(data_dict, db_manager):
@@ -527,40 +611,18 @@ def render_delete_activity(data_dict, db_manager):
     with col1:
         crq_selecionado = st.selectbox(
             "Selecione a CRQ:",
-            list(SEQUENCIAS.keys()),
+            list(get_crq_registry().keys()),
             key="delete_crq"
         )
     
     with col2:
         if crq_selecionado in data_dict:
-            df = data_dict[crq_selecionado]["dataframe"]
-            atividades_opcoes = []
-            for idx, row in df.iterrows():
-                seq = row.get("Seq", "")
-                atividade = row.get("Atividade", "")
-                atividades_opcoes.append(f"Seq {seq}: {atividade}")
-            
-            if not atividades_opcoes:
-                st.warning("Nenhuma atividade encontrada nesta CRQ.")
-                return
-            
-            atividade_selecionada = st.selectbox(
-                "Selecione a atividade para excluir:",
-                atividades_opcoes,
-                key="delete_atividade_select"
+            selecao = render_activity_selector(
+                data_dict, db_manager, crq_selecionado, "delete", "Selecione a atividade para excluir:"
             )
-            
-            # Extrair seq
-            seq_selecionado = int(atividade_selecionada.split(":")[0].replace("Seq", "").strip())
-            
-            # Buscar dados
-            atividade_row = None
-            excel_data_id = 0
-            for idx, row in df.iterrows():
-                if int(row.get("Seq", 0)) == seq_selecionado:
-                    atividade_row = row
-                    excel_data_id = row.get("Excel_Data_ID", 0)
-                    break
+            if selecao is None:
+                return
+            seq_selecionado, excel_data_id, atividade_row = selecao
             
             if atividade_row is not None:
                 st.info(f"""
@@ -596,16 +658,10 @@ def render_delete_activity(data_dict, db_manager):
                         st.success(f"✅ Atividade excluída com sucesso! ({control_removidos} controle, {excel_removidos} excel)")
                         
                         # Recarregar dados
-                        saved_excel_data = db_manager.load_excel_data()
-                        if saved_excel_data:
-                            control_data = db_manager.get_all_activities_control()
-                            from modules.data_loader import merge_control_data
-                            merged_data = merge_control_data(saved_excel_data, control_data)
-                            st.session_state.data_dict = merged_data
+                        reload_session_data(db_manager)
                         
                         st.rerun()
                         
                     except Exception as e:
+                        log_exception("crud.excluir.erro", sequencia=crq_selecionado, excel_data_id=excel_data_id)
                         st.error(f"❌ Erro ao excluir atividade: {str(e)}")
-                        import traceback
-                        st.code(traceback.format_exc())
@@ -8,11 +8,28 @@ import streamlit as st
 from modules.calculations import (
     calculate_statistics, get_activities_by_status,
     get_delayed_activities, get_next_activities,
-    get_milestones
+    get_milestones, compute_execution_status,
+    compute_burndown, compute_gantt_data
 )
 from modules.ui import render_status_card, render_sequence_status_card
+from modules.crq_registry import get_crq_registry
+from modules.cache import VersionedCache, session_data_key, get_shared_data_version
+from modules.display import get_display_frames
+from modules.instrumentation import timed, log_exception
 
 
+# Modelos dos painéis por (janela, versão dos dados[, filtro, minuto]), compartilhados entre sessões
+execution_status_cache = VersionedCache("execution_status")
+burndown_cache = VersionedCache("burndown")
+gantt_cache = VersionedCache("gantt")
+statistics_cache = VersionedCache("estatisticas")
+
+# Fragmentos re-executam apenas o próprio painel nas interações com seus widgets
+# (Streamlit < 1.37 não tem st.fragment: o painel roda junto com a página)
+fragment = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None) or (lambda func: func)
+
+
+@timed("dashboard.render_main_indicators")
 def render_main_indicators(stats):
     """
     Renderiza indicadores principais (cards)
@@ -64,6 +81,7 @@ def render_main_indicators(stats):
     st.divider()
 
 
+@timed("dashboard.render_burndown_chart")
 def render_burndown_chart(data_dict, crq_filtro=None):
     """
     Renderiza gráfico Burndown com tempo no eixo horizontal
@@ -74,10 +92,7 @@ def render_burndown_chart(data_dict, crq_filtro=None):
         data_dict: Dicionário com dataframes
         crq_filtro: CRQ específico para filtrar (None para todas)
     """
-    import pandas as pd
     from datetime import datetime
-    from config import SEQUENCIAS, DATE_FORMAT
-    from modules.calculations import parse_datetime_string
     
     # Filtro por CRQ
     col1, col2 = st.columns([1, 3])
@@ -100,86 +115,15 @@ def render_burndown_chart(data_dict, crq_filtro=None):
             st.warning(f"CRQ '{crq_selecionado}' não encontrado")
             return
     
-    # Coletar todas as atividades e calcular totais
-    all_activities = []
-    total_atividades = 0
-    
-    for crq in crqs_para_processar:
-        if crq not in data_dict:
-            continue
-        
-        df = data_dict[crq]["dataframe"].copy()
-        
-        # Excluir milestones das contagens
-        if "Is_Milestone" in df.columns:
-            df = df[df["Is_Milestone"].fillna(False) == False]
-        
-        total_atividades += len(df)
-        
-        # Coletar atividades concluídas com data de fim real
-        for _, row in df.iterrows():
-            status = row.get("Status", "Planejado")
-            if status == "Concluído":
-                horario_fim_real = row.get("Horario_Fim_Real")
-                if horario_fim_real and pd.notna(horario_fim_real) and str(horario_fim_real).strip():
-                    try:
-                        # Tentar parsear a data
-                        if isinstance(horario_fim_real, str):
-                            dt = parse_datetime_string(horario_fim_real)
-                        elif hasattr(horario_fim_real, 'to_pydatetime'):
-                            dt = horario_fim_real.to_pydatetime()
-                        elif isinstance(horario_fim_real, datetime):
-                            dt = horario_fim_real
-                        else:
-                            continue
-                        
-                        if dt:
-                            all_activities.append({
-                                'data': dt,
-                                'crq': crq
-                            })
-                    except:
-                        continue
-    
-    if total_atividades == 0:
+    burndown = get_burndown_model(data_dict, crqs_para_processar, datetime.now())
+    if burndown["total"] == 0:
         st.info("Não há atividades para exibir")
         return
     
-    # Ordenar atividades por data
-    all_activities.sort(key=lambda x: x['data'])
-    
-    # Calcular burndown ao longo do tempo
-    if not all_activities:
-        # Se não há atividades concluídas, mostrar apenas o total
-        timestamps = [datetime.now()]
-        restantes = [total_atividades]
-        concluidas = [0]
-    else:
-        # Criar pontos temporais: início (total) + cada conclusão
-        timestamps = []
-        restantes = []
-        concluidas = []
-        
-        # Ponto inicial: todas as atividades ainda pendentes
-        if all_activities:
-            # Usar a primeira data de conclusão ou data atual como início
-            primeira_data = all_activities[0]['data']
-            timestamps.append(primeira_data)
-            restantes.append(total_atividades)
-            concluidas.append(0)
-        
-        # Adicionar pontos para cada atividade concluída
-        concluidas_count = 0
-        for activity in all_activities:
-            concluidas_count += 1
-            timestamps.append(activity['data'])
-            restantes.append(total_atividades - concluidas_count)
-            concluidas.append(concluidas_count)
-        
-        # Adicionar ponto final (atual)
-        timestamps.append(datetime.now())
-        restantes.append(total_atividades - concluidas_count)
-        concluidas.append(concluidas_count)
+    total_atividades = burndown["total"]
+    timestamps = burndown["timestamps"]
+    restantes = burndown["restantes"]
+    concluidas = burndown["concluidas"]
     
     # Criar gráfico Burndown
     fig = go.Figure()
@@ -222,7 +166,7 @@ def render_burndown_chart(data_dict, crq_filtro=None):
     # Configurar layout
     titulo = f'📉 Gráfico Burndown - Trabalho Restante ao Longo do Tempo'
     if crq_selecionado != "Todas":
-        crq_info = SEQUENCIAS.get(crq_selecionado, {})
+        crq_info = get_crq_registry().get(crq_selecionado, {})
         nome_crq = crq_info.get("nome", crq_selecionado)
         titulo += f' ({nome_crq})'
     
@@ -267,6 +211,7 @@ def render_burndown_chart(data_dict, crq_filtro=None):
            "- O trabalho restante = Total - Concluídas")
 
 
+@timed("dashboard.render_gantt_chart")
 def render_gantt_chart(data_dict):
     """
     Renderiza gráfico de Gantt mostrando CRQs no eixo vertical e horários no horizontal
@@ -275,8 +220,6 @@ def render_gantt_chart(data_dict):
     Args:
         data_dict: Dicionário com dataframes por CRQ
     """
-    from modules.calculations import parse_datetime_string
-    from config import SEQUENCIAS
     from datetime import datetime, timezone, timedelta
     
     st.subheader("📊 Gráfico de Gantt - CRQs vs Horários")
@@ -286,150 +229,8 @@ def render_gantt_chart(data_dict):
     agora = datetime.now(gmt_minus_3)
     agora_naive = agora.replace(tzinfo=None) if agora.tzinfo else agora
     
-    # Coletar dados de todas as atividades por CRQ
-    gantt_data = []
-    
-    for sequencia, data in data_dict.items():
-        df = data["dataframe"]
-        
-        # Filtrar apenas atividades (não milestones)
-        if "Is_Milestone" in df.columns:
-            df_activities = df[df["Is_Milestone"].fillna(False) != True].copy()
-        else:
-            df_activities = df.copy()
-        
-        # Calcular início e fim planejados e reais para o CRQ (uma barra por CRQ)
-        # Início planejado: menor data de início entre todas as atividades
-        # Fim planejado: maior data de fim entre todas as atividades
-        # Início real: menor data de início real entre todas as atividades
-        # Fim real: maior data de fim real entre todas as atividades
-        # Também coletar informações sobre atividades em execução e adiantadas
-        inicio_planejado_min = None
-        fim_planejado_max = None
-        inicio_real_min = None
-        fim_real_max = None
-        
-        # Para atividades em execução: calcular período de execução
-        inicio_execucao_min = None
-        fim_execucao_max = None  # Será agora ou fim_real, o que vier primeiro
-        
-        # Para atividades adiantadas: verificar se há parte após a linha do tempo
-        tem_adiantadas = False
-        fim_adiantada_max = None
-        
-        for idx, row in df_activities.iterrows():
-            # Datas planejadas
-            inicio_planejado = row.get("Inicio")
-            fim_planejado = row.get("Fim")
-            
-            if pd.notna(inicio_planejado):
-                if isinstance(inicio_planejado, (datetime, pd.Timestamp)):
-                    inicio_dt = inicio_planejado.to_pydatetime() if isinstance(inicio_planejado, pd.Timestamp) else inicio_planejado
-                else:
-                    inicio_dt = parse_datetime_string(str(inicio_planejado))
-                if inicio_dt:
-                    # Remover timezone se existir
-                    if inicio_dt.tzinfo is not None:
-                        inicio_dt = inicio_dt.replace(tzinfo=None)
-                    if inicio_planejado_min is None or inicio_dt < inicio_planejado_min:
-                        inicio_planejado_min = inicio_dt
-            
-            if pd.notna(fim_planejado):
-                if isinstance(fim_planejado, (datetime, pd.Timestamp)):
-                    fim_dt = fim_planejado.to_pydatetime() if isinstance(fim_planejado, pd.Timestamp) else fim_planejado
-                else:
-                    fim_dt = parse_datetime_string(str(fim_planejado))
-                if fim_dt:
-                    # Remover timezone se existir
-                    if fim_dt.tzinfo is not None:
-                        fim_dt = fim_dt.replace(tzinfo=None)
-                    if fim_planejado_max is None or fim_dt > fim_planejado_max:
-                        fim_planejado_max = fim_dt
-            
-            # Datas reais
-            inicio_real = row.get("Horario_Inicio_Real")
-            fim_real = row.get("Horario_Fim_Real")
-            status = str(row.get("Status", "")).strip()
-            
-            # Para atividades concluídas ou adiantadas, sempre considerar o fim_real
-            # mesmo que seja anterior à hora atual (mostra que foi cumprida)
-            is_concluida_ou_adiantada = status in ["Concluído", "Atrasado", "Adiantado"]
-            is_em_execucao = status == "Em Execução" or status == "Adiantado"
-            is_adiantada = status == "Adiantado"
-            
-            if pd.notna(inicio_real):
-                if isinstance(inicio_real, (datetime, pd.Timestamp)):
-                    inicio_dt = inicio_real.to_pydatetime() if isinstance(inicio_real, pd.Timestamp) else inicio_real
-                elif isinstance(inicio_real, str):
-                    inicio_dt = parse_datetime_string(inicio_real)
-                else:
-                    inicio_dt = None
-                if inicio_dt:
-                    # Remover timezone se existir
-                    if inicio_dt.tzinfo is not None:
-                        inicio_dt = inicio_dt.replace(tzinfo=None)
-                    if inicio_real_min is None or inicio_dt < inicio_real_min:
-                        inicio_real_min = inicio_dt
-            
-            if pd.notna(fim_real):
-                if isinstance(fim_real, (datetime, pd.Timestamp)):
-                    fim_dt = fim_real.to_pydatetime() if isinstance(fim_real, pd.Timestamp) else fim_real
-                elif isinstance(fim_real, str):
-                    fim_dt = parse_datetime_string(fim_real)
-                else:
-                    fim_dt = None
-                if fim_dt:
-                    # Remover timezone se existir
-                    if fim_dt.tzinfo is not None:
-                        fim_dt = fim_dt.replace(tzinfo=None)
-                    # Sempre considerar o fim_real, especialmente para atividades concluídas/adiantadas
-                    # mesmo que seja anterior à hora atual (mostra que foi cumprida)
-                    if fim_real_max is None or fim_dt > fim_real_max:
-                        fim_real_max = fim_dt
-                    
-                    # Se é adiantada, marcar para barra tracejada
-                    if is_adiantada:
-                        tem_adiantadas = True
-                        if fim_adiantada_max is None or fim_dt > fim_adiantada_max:
-                            fim_adiantada_max = fim_dt
-            
-            # Coletar informações sobre atividades em execução
-            if is_em_execucao and inicio_dt:  # inicio_dt foi calculado acima
-                if inicio_execucao_min is None or inicio_dt < inicio_execucao_min:
-                    inicio_execucao_min = inicio_dt
-                
-                # Fim de execução: se tem fim_real, usar ele; senão, será agora (será calculado depois)
-                if fim_dt:  # fim_dt foi calculado acima se existe
-                    if fim_execucao_max is None or fim_dt > fim_execucao_max:
-                        fim_execucao_max = fim_dt
-            elif is_concluida_ou_adiantada:
-                # Se está concluída/adiantada mas não tem fim_real, usar o fim planejado como referência
-                # para garantir que a barra seja mostrada
-                if pd.notna(fim_planejado):
-                    if isinstance(fim_planejado, (datetime, pd.Timestamp)):
-                        fim_dt = fim_planejado.to_pydatetime() if isinstance(fim_planejado, pd.Timestamp) else fim_planejado
-                    else:
-                        fim_dt = parse_datetime_string(str(fim_planejado))
-                    if fim_dt:
-                        if fim_dt.tzinfo is not None:
-                            fim_dt = fim_dt.replace(tzinfo=None)
-                        if fim_real_max is None or fim_dt > fim_real_max:
-                            fim_real_max = fim_dt
-        
-        # Adicionar dados do CRQ se tiver pelo menos uma data
-        # Uma única entrada por CRQ com o range completo (início mínimo ao fim máximo)
-        if inicio_planejado_min or fim_planejado_max or inicio_real_min or fim_real_max:
-            gantt_data.append({
-                "CRQ": sequencia,
-                "Inicio_Planejado": inicio_planejado_min,
-                "Fim_Planejado": fim_planejado_max,
-                "Inicio_Real": inicio_real_min,
-                "Fim_Real": fim_real_max,
-                "Inicio_Execucao": inicio_execucao_min,
-                "Fim_Execucao": fim_execucao_max,  # Será ajustado para agora se necessário
-                "Tem_Adiantadas": tem_adiantadas,
-                "Fim_Adiantada": fim_adiantada_max
-            })
+    # Uma barra por CRQ (planejado, real, execução), em cache por versão dos dados
+    gantt_data = get_gantt_model(data_dict)
     
     if not gantt_data:
         st.info("ℹ️ Não há dados suficientes para gerar o gráfico de Gantt. É necessário ter atividades com datas planejadas ou reais.")
@@ -524,14 +325,16 @@ def render_gantt_chart(data_dict):
     )
     
     # Adicionar barras para cada CRQ
+    registry = get_crq_registry()
+    gantt_por_crq = {d["CRQ"]: d for d in reversed(gantt_data)}
     for i, crq in enumerate(crqs_ordenados):
-        crq_info = SEQUENCIAS.get(crq, {})
+        crq_info = registry.get(crq, {})
         emoji = crq_info.get("emoji", "📋")
         nome = crq_info.get("nome", crq)
         y_labels.append(f"{emoji} {nome}")
         
         # Encontrar dados do CRQ
-        crq_data = next((d for d in gantt_data if d["CRQ"] == crq), None)
+        crq_data = gantt_por_crq.get(crq)
         if not crq_data:
             continue
         
@@ -704,6 +507,83 @@ def render_gantt_chart(data_dict):
     render_activities_execution_status(data_dict, agora_naive)
 
 
+def get_burndown_model(data_dict, crqs, agora):
+    """
+    Dados do Burndown em cache por (janela, versão dos dados, CRQs, minuto)
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+        crqs: Lista de CRQs considerados
+        agora: Data/hora atual
+
+    Returns:
+        dict: Resultado de compute_burndown (compartilhado; não modificar)
+    """
+    agora_minuto = agora.replace(second=0, microsecond=0)
+    data_key = session_data_key()
+    cache_key = (*data_key, tuple(crqs), agora_minuto) if data_key else None
+    return burndown_cache.get_or_compute(
+        cache_key, lambda: compute_burndown(data_dict, crqs, agora_minuto)
+    )
+
+
+def get_statistics_model(data_dict, db_manager=None):
+    """
+    Estatísticas do dashboard em cache por (janela, versão dos dados)
+
+    Com os dataframes já carregados na sessão, são calculadas em memória; sem eles,
+    vêm da agregação no banco (DatabaseManager.get_status_counts), sem carregar as linhas.
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ (vazio ou None se não carregado)
+        db_manager: Instância do DatabaseManager (usado apenas sem data_dict)
+
+    Returns:
+        dict: Estatísticas no formato de calculate_statistics (compartilhado; não modificar)
+    """
+    def calcular():
+        if data_dict:
+            return calculate_statistics(data_dict)
+        return db_manager.get_status_counts()
+
+    return statistics_cache.get_or_compute(session_data_key(), calcular)
+
+
+def get_gantt_model(data_dict):
+    """
+    Barras do Gantt por CRQ em cache por (janela, versão dos dados)
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+
+    Returns:
+        list: Resultado de compute_gantt_data (compartilhado; não modificar)
+    """
+    return gantt_cache.get_or_compute(session_data_key(), lambda: compute_gantt_data(data_dict))
+
+
+def get_execution_status(data_dict, agora):
+    """
+    Status de execução das atividades em cache por (janela, versão dos dados, minuto)
+
+    O resultado é compartilhado entre sessões que veem os mesmos dados; não modificar.
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+        agora: Data/hora atual (datetime sem timezone)
+
+    Returns:
+        dict: Resultado de compute_execution_status
+    """
+    agora_minuto = agora.replace(second=0, microsecond=0)
+    data_key = session_data_key()
+    cache_key = (*data_key, agora_minuto) if data_key else None
+    return execution_status_cache.get_or_compute(
+        cache_key, lambda: compute_execution_status(data_dict, agora_minuto)
+    )
+
+
+@timed("dashboard.render_activities_execution_status")
 def render_activities_execution_status(data_dict, agora):
     """
     Renderiza lista de atividades que deveriam estar em execução e não estão,
@@ -713,103 +593,28 @@ def render_activities_execution_status(data_dict, agora):
         data_dict: Dicionário com dataframes por CRQ
         agora: Data/hora atual (datetime sem timezone)
     """
-    from datetime import datetime
-    from config import SEQUENCIAS
-    from modules.calculations import parse_datetime_string
-    
     st.subheader("📋 Status de Execução das Atividades")
     
-    atividades_atrasadas = []  # Deveriam estar em execução mas não estão
-    atividades_em_execucao = []  # Estão em execução (com indicação de adiantamento)
+    registry = get_crq_registry()
+    execution_status = get_execution_status(data_dict, agora)
+    atividades_atrasadas = execution_status["atrasadas"]
+    atividades_em_execucao = execution_status["em_execucao"]
     
-    for sequencia, data in data_dict.items():
-        df = data["dataframe"]
-        
-        # Filtrar apenas atividades (não milestones)
-        if "Is_Milestone" in df.columns:
-            df_activities = df[df["Is_Milestone"].fillna(False) != True].copy()
-        else:
-            df_activities = df.copy()
-        
-        crq_info = SEQUENCIAS.get(sequencia, {})
-        emoji = crq_info.get("emoji", "📋")
-        nome_crq = crq_info.get("nome", sequencia)
-        
-        for idx, row in df_activities.iterrows():
-            status = str(row.get("Status", "")).strip()
-            atividade = str(row.get("Atividade", "")).strip()
-            seq = row.get("Seq", "")
-            
-            # Datas planejadas
-            inicio_planejado = row.get("Inicio")
-            
-            # Data de início real
-            inicio_real = row.get("Horario_Inicio_Real")
-            
-            # Converter datas para datetime
-            inicio_planejado_dt = None
-            if pd.notna(inicio_planejado):
-                if isinstance(inicio_planejado, (datetime, pd.Timestamp)):
-                    inicio_planejado_dt = inicio_planejado.to_pydatetime() if isinstance(inicio_planejado, pd.Timestamp) else inicio_planejado
-                else:
-                    inicio_planejado_dt = parse_datetime_string(str(inicio_planejado))
-                if inicio_planejado_dt and inicio_planejado_dt.tzinfo is not None:
-                    inicio_planejado_dt = inicio_planejado_dt.replace(tzinfo=None)
-            
-            inicio_real_dt = None
-            if pd.notna(inicio_real):
-                if isinstance(inicio_real, (datetime, pd.Timestamp)):
-                    inicio_real_dt = inicio_real.to_pydatetime() if isinstance(inicio_real, pd.Timestamp) else inicio_real
-                elif isinstance(inicio_real, str):
-                    inicio_real_dt = parse_datetime_string(inicio_real)
-                if inicio_real_dt and inicio_real_dt.tzinfo is not None:
-                    inicio_real_dt = inicio_real_dt.replace(tzinfo=None)
-            
-            # Verificar se deveria estar em execução
-            if inicio_planejado_dt and inicio_planejado_dt <= agora:
-                # Já passou do horário planejado de início
-                if status not in ["Em Execução", "Concluído", "Atrasado", "Adiantado"]:
-                    # Deveria estar em execução mas não está
-                    atividades_atrasadas.append({
-                        "CRQ": nome_crq,
-                        "Emoji": emoji,
-                        "Seq": seq,
-                        "Atividade": atividade,
-                        "Inicio_Planejado": inicio_planejado_dt,
-                        "Status": status
-                    })
-                elif status == "Em Execução" or status == "Adiantado":
-                    # Está em execução, verificar se está adiantada
-                    is_adiantada = False
-                    if inicio_real_dt and inicio_planejado_dt:
-                        if inicio_real_dt < inicio_planejado_dt:
-                            is_adiantada = True
-                    
-                    atividades_em_execucao.append({
-                        "CRQ": nome_crq,
-                        "Emoji": emoji,
-                        "Seq": seq,
-                        "Atividade": atividade,
-                        "Inicio_Planejado": inicio_planejado_dt,
-                        "Inicio_Real": inicio_real_dt,
-                        "Is_Adiantada": is_adiantada
-                    })
+    def format_inicio(valor):
+        return valor.strftime("%d/%m/%Y %H:%M") if pd.notna(valor) else "N/A"
     
     # Exibir atividades que deveriam estar em execução e não estão
     if atividades_atrasadas:
         st.markdown("#### 🚨 Atividades que Deveriam Estar em Execução")
         
-        # Agrupar por CRQ
-        for sequencia_key, sequencia_info in SEQUENCIAS.items():
-            crq_atrasadas = [a for a in atividades_atrasadas if a["CRQ"] == sequencia_info["nome"]]
-            if crq_atrasadas:
-                emoji = sequencia_info["emoji"]
-                nome = sequencia_info["nome"]
-                st.markdown(f"**{emoji} {nome}**")
-                
-                for ativ in crq_atrasadas:
-                    inicio_str = ativ["Inicio_Planejado"].strftime("%d/%m/%Y %H:%M") if ativ["Inicio_Planejado"] else "N/A"
-                    st.markdown(f"  - Seq {ativ['Seq']}: {ativ['Atividade']} (Início planejado: {inicio_str}, Status: {ativ['Status']})")
+        # Já agrupadas por CRQ; exibir na ordem do cadastro
+        for crq in registry.sort_crqs(atividades_atrasadas.keys()):
+            crq_info = registry.get(crq, {})
+            st.markdown(f"**{crq_info.get('emoji', '📋')} {crq_info.get('nome', crq)}**")
+            
+            for ativ in atividades_atrasadas[crq].itertuples(index=False):
+                inicio_str = format_inicio(ativ.Inicio_Planejado)
+                st.markdown(f"  - Seq {ativ.Seq}: {ativ.Atividade} (Início planejado: {inicio_str}, Status: {ativ.Status})")
         
         st.divider()
     else:
@@ -820,87 +625,70 @@ def render_activities_execution_status(data_dict, agora):
     if atividades_em_execucao:
         st.markdown("#### ⏳ Atividades em Execução")
         
-        # Agrupar por CRQ
-        for sequencia_key, sequencia_info in SEQUENCIAS.items():
-            crq_execucao = [a for a in atividades_em_execucao if a["CRQ"] == sequencia_info["nome"]]
-            if crq_execucao:
-                emoji = sequencia_info["emoji"]
-                nome = sequencia_info["nome"]
-                st.markdown(f"**{emoji} {nome}**")
+        for crq in registry.sort_crqs(atividades_em_execucao.keys()):
+            crq_info = registry.get(crq, {})
+            st.markdown(f"**{crq_info.get('emoji', '📋')} {crq_info.get('nome', crq)}**")
+            
+            for ativ in atividades_em_execucao[crq].itertuples(index=False):
+                inicio_planejado_str = format_inicio(ativ.Inicio_Planejado)
+                inicio_real_str = format_inicio(ativ.Inicio_Real)
                 
-                for ativ in crq_execucao:
-                    inicio_planejado_str = ativ["Inicio_Planejado"].strftime("%d/%m/%Y %H:%M") if ativ["Inicio_Planejado"] else "N/A"
-                    inicio_real_str = ativ["Inicio_Real"].strftime("%d/%m/%Y %H:%M") if ativ["Inicio_Real"] else "N/A"
-                    
-                    if ativ["Is_Adiantada"]:
-                        st.markdown(f"  - ✅ Seq {ativ['Seq']}: {ativ['Atividade']} (Adiantada - Início real: {inicio_real_str}, Planejado: {inicio_planejado_str})")
-                    else:
-                        st.markdown(f"  - ⏳ Seq {ativ['Seq']}: {ativ['Atividade']} (Início real: {inicio_real_str}, Planejado: {inicio_planejado_str})")
+                if ativ.Is_Adiantada:
+                    st.markdown(f"  - ✅ Seq {ativ.Seq}: {ativ.Atividade} (Adiantada - Início real: {inicio_real_str}, Planejado: {inicio_planejado_str})")
+                else:
+                    st.markdown(f"  - ⏳ Seq {ativ.Seq}: {ativ.Atividade} (Início real: {inicio_real_str}, Planejado: {inicio_planejado_str})")
         
         st.divider()
     else:
         st.info("ℹ️ Não há atividades em execução no momento.")
 
 
+@timed("dashboard.render_activities_tables")
 def render_activities_tables(data_dict):
     """
     Renderiza tabelas de detalhes
     
+    Usa a projeção de exibição em cache (datas e atrasos já formatados).
+    
     Args:
         data_dict: Dicionário com dataframes
     """
-    import pandas as pd
+    st.subheader("📋 Tabelas de Detalhes")
     
-    # Função para garantir que colunas sensíveis sejam string
-    def ensure_string_columns(df):
-        """Garante que colunas sensíveis sejam string para evitar erros do PyArrow"""
-        if df is None or len(df) == 0:
-            return df
-        
-        def safe_str_convert(val):
-            if pd.isna(val) or val is None:
-                return ""
-            try:
-                if isinstance(val, (int, float)):
-                    return str(int(val)) if isinstance(val, float) and val.is_integer() else str(val)
-                return str(val)
-            except:
-                return ""
+    registry = get_crq_registry()
+    display_df = get_display_frames(data_dict)["TODAS"]
+    
+    # Mesmas regras de get_activities_by_status/get_delayed_activities/get_next_activities
+    if "Is_Milestone" in display_df.columns:
+        atividades = display_df[~display_df["Is_Milestone"]]
+    else:
+        atividades = display_df
+    
+    def render_por_crq(df, display_cols, sort_col, ascending=True):
+        """Renderiza uma tabela por CRQ (agrupamento em uma única passada)"""
+        available_cols = [col for col in display_cols if col in df.columns]
+        if sort_col in df.columns:
+            df = df.sort_values(sort_col, ascending=ascending)
         
-        for col in ["Telefone", "Grupo", "Localidade", "Executor", "Tempo", "Atividade"]:
-            if col in df.columns:
-                df[col] = df[col].apply(safe_str_convert)
+        if "CRQ" not in df.columns:
+            st.dataframe(df[available_cols], width='stretch', hide_index=True)
+            return
         
-        return df
-    
-    st.subheader("📋 Tabelas de Detalhes")
+        for crq, crq_df in df.groupby("CRQ", sort=True):
+            crq_info = registry.get(crq, {})
+            emoji = crq_info.get("emoji", "📊")
+            nome = crq_info.get("nome", crq)
+            
+            st.markdown(f"**{emoji} {nome}** ({len(crq_df)} atividades)")
+            st.dataframe(crq_df[available_cols], width='stretch', hide_index=True)
+            st.divider()
     
     # Tabela 1: Atividades em Execução (segmentada por CRQ)
     st.markdown("#### ⏳ Atividades em Execução")
-    exec_df = get_activities_by_status(data_dict, "Em Execução")
-    exec_df = ensure_string_columns(exec_df)
+    exec_df = atividades[atividades["Status"].isin(["Em Execução", "Adiantado"])]
     
     if len(exec_df) > 0:
-        # Agrupar por CRQ
-        if "CRQ" in exec_df.columns:
-            for crq in sorted(exec_df["CRQ"].unique()):
-                crq_df = exec_df[exec_df["CRQ"] == crq].copy()
-                from config import SEQUENCIAS
-                crq_info = SEQUENCIAS.get(crq, {})
-                emoji = crq_info.get("emoji", "📊")
-                nome = crq_info.get("nome", crq)
-                
-                st.markdown(f"**{emoji} {nome}** ({len(crq_df)} atividades)")
-                display_cols = ["Seq", "Atividade", "CRQ", "Grupo", "Tempo", "Horario_Inicio_Real"]
-                available_cols = [col for col in display_cols if col in crq_df.columns]
-                crq_display = crq_df[available_cols].sort_values("Seq")
-                st.dataframe(crq_display, width='stretch', hide_index=True)
-                st.divider()
-        else:
-            display_cols = ["Seq", "Atividade", "CRQ", "Grupo", "Tempo", "Horario_Inicio_Real"]
-            available_cols = [col for col in display_cols if col in exec_df.columns]
-            exec_display = exec_df[available_cols].sort_values("Seq")
-            st.dataframe(exec_display, width='stretch', hide_index=True)
+        render_por_crq(exec_df, ["Seq", "Atividade", "CRQ", "Grupo", "Tempo", "Horario_Inicio_Real"], "Seq")
     else:
         st.info("Não há atividades em execução no momento")
     
@@ -908,44 +696,15 @@ def render_activities_tables(data_dict):
     
     # Tabela 2: Atividades Atrasadas (segmentada por CRQ)
     st.markdown("#### 🚨 Atividades Atrasadas")
-    delayed_df = get_delayed_activities(data_dict)
-    delayed_df = ensure_string_columns(delayed_df)
+    delayed_df = atividades[
+        (atividades["Status"] == "Atrasado") | (atividades.get("Atraso_Minutos", 0) > 0)
+    ]
     
     if len(delayed_df) > 0:
-        from modules.calculations import format_delay
-        delayed_display = delayed_df.copy()
-        delayed_display["Atraso"] = delayed_display["Atraso_Minutos"].apply(format_delay)
-        
-        # Agrupar por CRQ
-        if "CRQ" in delayed_display.columns:
-            for crq in sorted(delayed_display["CRQ"].unique()):
-                crq_df = delayed_display[delayed_display["CRQ"] == crq].copy()
-                from config import SEQUENCIAS
-                crq_info = SEQUENCIAS.get(crq, {})
-                emoji = crq_info.get("emoji", "📊")
-                nome = crq_info.get("nome", crq)
-                
-                st.markdown(f"**{emoji} {nome}** ({len(crq_df)} atividades)")
-                display_cols = ["Seq", "Atividade", "CRQ", "Grupo", "Atraso", "Observacoes"]
-                available_cols = [col for col in display_cols if col in crq_df.columns]
-                # Ordenar antes de filtrar colunas (usando Atraso_Minutos que existe no DataFrame original)
-                if "Atraso_Minutos" in crq_df.columns:
-                    crq_df_sorted = crq_df.sort_values("Atraso_Minutos", ascending=False)
-                else:
-                    crq_df_sorted = crq_df
-                crq_display = crq_df_sorted[available_cols]
-                st.dataframe(crq_display, width='stretch', hide_index=True)
-                st.divider()
-        else:
-            display_cols = ["Seq", "Atividade", "CRQ", "Grupo", "Atraso", "Observacoes"]
-            available_cols = [col for col in display_cols if col in delayed_display.columns]
-            # Ordenar antes de filtrar colunas (usando Atraso_Minutos que existe no DataFrame original)
-            if "Atraso_Minutos" in delayed_display.columns:
-                delayed_display_sorted = delayed_display.sort_values("Atraso_Minutos", ascending=False)
-            else:
-                delayed_display_sorted = delayed_display
-            delayed_display_final = delayed_display_sorted[available_cols]
-            st.dataframe(delayed_display_final, width='stretch', hide_index=True)
+        render_por_crq(
+            delayed_df, ["Seq", "Atividade", "CRQ", "Grupo", "Atraso", "Observacoes"],
+            "Atraso_Minutos", ascending=False
+        )
     else:
         st.info("Não há atividades atrasadas")
     
@@ -953,50 +712,20 @@ def render_activities_tables(data_dict):
     
     # Tabela 3: Próximas Atividades (segmentada por CRQ)
     st.markdown("#### 📅 Próximas Atividades a Executar")
-    next_df = get_next_activities(data_dict, limit=10)
-    next_df = ensure_string_columns(next_df)
+    next_df = atividades[atividades["Status"] == "Planejado"]
+    if "Inicio_Ordem" in next_df.columns:
+        next_df = next_df.sort_values("Inicio_Ordem")
+    next_df = next_df.head(10)
     
     if len(next_df) > 0:
-        # Agrupar por CRQ
-        if "CRQ" in next_df.columns:
-            for crq in sorted(next_df["CRQ"].unique()):
-                crq_df = next_df[next_df["CRQ"] == crq].copy()
-                from config import SEQUENCIAS
-                crq_info = SEQUENCIAS.get(crq, {})
-                emoji = crq_info.get("emoji", "📊")
-                nome = crq_info.get("nome", crq)
-                
-                st.markdown(f"**{emoji} {nome}** ({len(crq_df)} atividades)")
-                display_cols = ["Seq", "Atividade", "CRQ", "Grupo", "Inicio"]
-                available_cols = [col for col in display_cols if col in crq_df.columns]
-                crq_display = crq_df[available_cols].sort_values("Inicio")
-                
-                # Formatar data
-                if "Inicio" in crq_display.columns:
-                    crq_display["Inicio"] = crq_display["Inicio"].apply(
-                        lambda x: x.strftime("%d/%m/%Y %H:%M:%S") if pd.notna(x) and hasattr(x, 'strftime') else ""
-                    )
-                
-                st.dataframe(crq_display, width='stretch', hide_index=True)
-                st.divider()
-        else:
-            display_cols = ["Seq", "Atividade", "CRQ", "Grupo", "Inicio"]
-            available_cols = [col for col in display_cols if col in next_df.columns]
-            next_display = next_df[available_cols].sort_values("Inicio")
-            
-            # Formatar data
-            if "Inicio" in next_display.columns:
-                next_display["Inicio"] = next_display["Inicio"].apply(
-                    lambda x: x.strftime("%d/%m/%Y %H:%M:%S") if pd.notna(x) and hasattr(x, 'strftime') else ""
-                )
-            
-            st.dataframe(next_display, width='stretch', hide_index=True)
+        render_por_crq(next_df, ["Seq", "Atividade", "CRQ", "Grupo", "Inicio"], "Inicio_Ordem")
     else:
         st.info("Não há próximas atividades planejadas")
     
     st.divider()
 
 
+@timed("dashboard.render_sequence_status_cards")
 def render_sequence_status_cards(stats):
     """
     Renderiza cards de status por CRQ
@@ -1006,9 +735,7 @@ def render_sequence_status_cards(stats):
     """
     st.subheader("📊 Status por CRQ")
     
-    from config import SEQUENCIAS
-    
-    for sequencia_key, sequencia_info in SEQUENCIAS.items():
+    for sequencia_key, sequencia_info in get_crq_registry().items():
         if sequencia_key in stats["por_sequencia"]:
             seq_stats = stats["por_sequencia"][sequencia_key]
             # Usar total real (sem milestones) em vez do config
@@ -1016,32 +743,141 @@ def render_sequence_status_cards(stats):
             render_sequence_status_card(sequencia_key, seq_stats, total)
 
 
-def render_full_dashboard(data_dict):
+@fragment
+def render_details_panel(data_dict, stats):
+    """
+    Painel de detalhes: tabelas de atividades e status por CRQ (fragmento)
+    
+    Args:
+        data_dict: Dicionário com dataframes
+        stats: Estatísticas calculadas
+    """
+    render_activities_tables(data_dict)
+    render_sequence_status_cards(stats)
+
+
+@fragment
+def render_gantt_panel(data_dict):
+    """
+    Painel do Gantt e do status de execução (fragmento)
+    
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+    """
+    render_gantt_chart(data_dict)
+
+
+@fragment
+def render_burndown_panel(data_dict):
+    """
+    Painel do Burndown (fragmento): trocar o filtro de CRQ re-executa apenas este painel
+    
+    Args:
+        data_dict: Dicionário com dataframes
+    """
+    st.subheader("📉 Burndown")
+    render_burndown_chart(data_dict)
+
+
+def render_live_mode():
+    """
+    Controles do modo ao vivo: verifica a versão dos dados no intervalo escolhido
+    e recarrega a página apenas quando outra sessão alterou algo
+    
+    A verificação usa a versão compartilhada entre sessões (get_shared_data_version),
+    então várias telas paradas no dashboard quase não consultam o banco. A URL
+    ?ao_vivo=1 liga o modo ao abrir a página (útil para telas de monitoramento).
+    """
+    from datetime import datetime
+    from config import AUTO_REFRESH_INTERVALOS, AUTO_REFRESH_INTERVALO_PADRAO, AUTO_REFRESH_VERSAO_TTL
+    
+    query_params = getattr(st, "query_params", {})
+    col1, col2, col3 = st.columns([1, 1, 2])
+    with col1:
+        ao_vivo = st.toggle(
+            "🔴 Ao vivo",
+            value=query_params.get("ao_vivo") == "1",
+            key="dashboard_ao_vivo",
+            help="Atualiza o dashboard automaticamente quando os dados mudam"
+        )
+    with col2:
+        intervalo = st.selectbox(
+            "Verificar a cada",
+            AUTO_REFRESH_INTERVALOS,
+            index=AUTO_REFRESH_INTERVALOS.index(AUTO_REFRESH_INTERVALO_PADRAO),
+            format_func=lambda segundos: f"{segundos} s" if segundos < 60 else f"{segundos // 60} min",
+            key="dashboard_ao_vivo_intervalo",
+            disabled=not ao_vivo
+        )
+    
+    if not ao_vivo:
+        return
+    
+    if not hasattr(st, "fragment"):
+        with col3:
+            st.caption("⚠️ O modo ao vivo requer Streamlit 1.37 ou superior")
+        return
+    
+    @st.fragment(run_every=intervalo)
+    def verificar_versao():
+        db_manager = st.session_state.get("db_manager")
+        if db_manager is None:
+            return
+        try:
+            versao = get_shared_data_version(db_manager, max_age=AUTO_REFRESH_VERSAO_TTL)
+        except Exception:
+            log_exception("ao_vivo.erro_versao")
+            return
+        # Só versões mais novas que a da sessão: a versão compartilhada pode estar
+        # atrasada (cache de AUTO_REFRESH_VERSAO_TTL) logo após uma gravação
+        versao_sessao = st.session_state.get("data_version")
+        if versao_sessao is not None and versao > versao_sessao:
+            # Execução completa (não scope="fragment"): um fragmento só re-executa a si mesmo,
+            # e os painéis são fragmentos separados que, re-executados sozinhos, reusariam o
+            # data_dict antigo recebido como argumento. Colocá-los dentro deste fragmento os
+            # redesenharia a cada verificação, mesmo sem mudança; assim o custo de redesenhar
+            # só ocorre quando a versão muda, e os modelos vêm do cache da nova versão
+            st.rerun()
+        st.caption(f"🔴 Ao vivo — última verificação: {datetime.now().strftime('%H:%M:%S')}")
+    
+    with col3:
+        verificar_versao()
+
+
+@timed("dashboard.render_full_dashboard")
+def render_full_dashboard(data_dict, stats=None):
     """
     Renderiza dashboard completo
     
+    Cada painel é um fragmento independente que consome um modelo em cache
+    (por janela e versão dos dados): interagir com um painel não recalcula os outros.
+    
     Args:
         data_dict: Dicionário com dataframes
+        stats: Estatísticas já calculadas. Se None, vêm de get_statistics_model
     """
     if not data_dict:
         st.warning("⚠️ Nenhum dado carregado. Por favor, carregue um arquivo Excel primeiro.")
         return
     
-    # Calcular estatísticas
-    stats = calculate_statistics(data_dict)
+    # Calcular estatísticas (em cache por versão dos dados)
+    if stats is None:
+        stats = get_statistics_model(data_dict)
     
     # Indicadores principais
     render_main_indicators(stats)
     
     st.divider()
     
-    # Tabelas de detalhes
-    render_activities_tables(data_dict)
-    
-    # Status por CRQ
-    render_sequence_status_cards(stats)
+    # Tabelas de detalhes e status por CRQ
+    render_details_panel(data_dict, stats)
     
     st.divider()
     
     # Gráfico de Gantt (CRQs vs Horários)
-    render_gantt_chart(data_dict)
\ No newline at end of file
+    render_gantt_panel(data_dict)
+    
+    st.divider()
+    
+    # Burndown (com filtro por CRQ)
+    render_burndown_panel(data_dict)
@@ -5,21 +5,28 @@ import pandas as pd
 import streamlit as st
 from datetime import datetime
 from config import DATE_FORMAT, STATUS_OPCOES
-from modules.calculations import (
-    calculate_delay, update_status_by_delay,
-    validate_datetime_string, parse_datetime_string
-)
-from modules.database import DatabaseManager
+from modules.calculations import update_status_by_delay, validate_datetime_string
+from modules.database import DatabaseManager, ConflictError
 from modules.auth import can_edit_data
+from modules.activity_index import get_activity_row
+from modules.data_loader import reload_session_data
+from modules.display import get_display_frames, DISPLAY_COLUMNS
+from modules.transitions import (
+    resolve_transition, resolve_transitions_frame, apply_status_transitions,
+    TransitionError, InvalidTransitionError
+)
+from modules.instrumentation import log_exception
 
 
-def render_data_editor(data_dict, db_manager):
+def render_data_editor(data_dict, db_manager, lazy=True):
     """
     Renderiza editor de dados interativo com abas por CRQ
     
     Args:
         data_dict: Dicionário com dataframes
         db_manager: Gerenciador de banco de dados
+        lazy: Se True, usa um seletor de abas e renderiza apenas a aba ativa
+            (st.tabs executa o conteúdo de todas as abas a cada interação)
     """
     if not data_dict:
         st.warning("⚠️ Nenhum dado carregado. Por favor, carregue um arquivo Excel primeiro.")
@@ -37,7 +44,8 @@ def render_data_editor(data_dict, db_manager):
         return
     
     # Criar lista de nomes de abas com emojis
-    from config import SEQUENCIAS
+    from modules.crq_registry import get_crq_registry
+    registry = get_crq_registry()
     tab_names = []
     tab_keys = []
     
@@ -47,19 +55,34 @@ def render_data_editor(data_dict, db_manager):
     
     # Adicionar abas para cada CRQ
     for crq in crqs:
-        crq_info = SEQUENCIAS.get(crq, {})
+        crq_info = registry.get(crq, {})
         emoji = crq_info.get("emoji", "📊")
         nome = crq_info.get("nome", crq)
         tab_names.append(f"{emoji} {nome}")
         tab_keys.append(crq)
     
+    if lazy:
+        # Seletor no lugar de st.tabs: só a aba escolhida é calculada e renderizada
+        if st.session_state.get("editor_active_tab") not in tab_keys:
+            st.session_state.editor_active_tab = "TODAS"
+        
+        tab_key = st.radio(
+            "Aba:",
+            tab_keys,
+            format_func=lambda key: tab_names[tab_keys.index(key)],
+            horizontal=True,
+            label_visibility="collapsed",
+            key="editor_active_tab"
+        )
+        render_editor_tab_safe(data_dict, tab_key, tab_names[tab_keys.index(tab_key)], db_manager)
+        return
+    
     # Criar abas
     try:
         tabs = st.tabs(tab_names)
     except Exception as e:
+        log_exception("editor.abas.erro")
         st.error(f"❌ Erro ao criar abas: {str(e)}")
-        import traceback
-        st.code(traceback.format_exc())
         return
     
     # Processar cada aba - Streamlit renderiza todas, mas só mostra a ativa
@@ -69,27 +92,32 @@ def render_data_editor(data_dict, db_manager):
     
     for idx, tab in enumerate(tabs):
         with tab:
-            try:
-                if idx >= len(tab_keys):
-                    st.error(f"❌ Índice de aba inválido: {idx}")
-                    continue
-                    
-                if tab_keys[idx] == "TODAS":
-                    # Aba "Todas" - mostrar todas as sequências juntas
-                    render_editor_tab(data_dict, None, db_manager, "Todas")
-                else:
-                    # Aba de CRQ específica
-                    crq_selecionado = tab_keys[idx]
-                    if crq_selecionado in data_dict:
-                        render_editor_tab(data_dict, crq_selecionado, db_manager, crq_selecionado)
-                    else:
-                        st.error(f"❌ CRQ '{crq_selecionado}' não encontrado nos dados carregados.")
-                        st.info(f"CRQs disponíveis: {', '.join(data_dict.keys())}")
-            except Exception as e:
-                st.error(f"❌ Erro ao renderizar aba '{tab_names[idx] if idx < len(tab_names) else 'desconhecida'}': {str(e)}")
-                import traceback
-                with st.expander("Detalhes do erro"):
-                    st.code(traceback.format_exc())
+            render_editor_tab_safe(data_dict, tab_keys[idx], tab_names[idx], db_manager)
+
+
+def render_editor_tab_safe(data_dict, tab_key, tab_label, db_manager):
+    """
+    Renderiza uma aba do editor tratando erros (para não derrubar as demais)
+    
+    Args:
+        data_dict: Dicionário com dataframes
+        tab_key: "TODAS" ou sigla da CRQ
+        tab_label: Nome exibido da aba (para mensagens de erro)
+        db_manager: Gerenciador de banco de dados
+    """
+    try:
+        if tab_key == "TODAS":
+            # Aba "Todas" - mostrar todas as sequências juntas
+            render_editor_tab(data_dict, None, db_manager, "Todas")
+        elif tab_key in data_dict:
+            # Aba de CRQ específica
+            render_editor_tab(data_dict, tab_key, db_manager, tab_key)
+        else:
+            st.error(f"❌ CRQ '{tab_key}' não encontrado nos dados carregados.")
+            st.info(f"CRQs disponíveis: {', '.join(data_dict.keys())}")
+    except Exception as e:
+        log_exception("editor.aba.erro", aba=tab_label)
+        st.error(f"❌ Erro ao renderizar aba '{tab_label}': {str(e)}")
 
 
 def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
@@ -111,56 +139,24 @@ def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
         st.error("❌ Gerenciador de banco de dados não disponível")
         return
     
-    # Preparar dataframe
+    # Projeção de exibição já formatada (em cache por versão dos dados, compartilhada entre abas)
     try:
+        display_frames = get_display_frames(data_dict)
         if crq_selecionado is None:
-            # Combinar todos os CRQs
-            all_dfs = []
-            for crq, data in data_dict.items():
-                if "dataframe" not in data:
-                    st.warning(f"⚠️ CRQ '{crq}' não tem dataframe válido")
-                    continue
-                df = data["dataframe"].copy()
-                all_dfs.append(df)
-            if all_dfs:
-                df = pd.concat(all_dfs, ignore_index=True)
-            else:
-                st.info("Nenhum dado disponível")
-                return
+            df = display_frames["TODAS"]
         else:
-            if crq_selecionado not in data_dict:
+            if crq_selecionado not in display_frames:
                 st.error(f"❌ CRQ '{crq_selecionado}' não encontrado nos dados.")
                 st.info(f"CRQs disponíveis: {', '.join(data_dict.keys())}")
                 return
-            if "dataframe" not in data_dict[crq_selecionado]:
-                st.error(f"❌ CRQ '{crq_selecionado}' não tem dataframe válido.")
-                return
-            df = data_dict[crq_selecionado]["dataframe"].copy()
+            df = display_frames[crq_selecionado]
         
         if df is None or len(df) == 0:
             st.info("Nenhum dado disponível para este CRQ")
             return
-        
-        # Garantir que colunas sensíveis sejam string ANTES de qualquer processamento
-        # Isso evita erros do PyArrow mesmo que as colunas não sejam exibidas
-        def safe_str_convert(val):
-            if pd.isna(val) or val is None:
-                return ""
-            try:
-                if isinstance(val, (int, float)):
-                    return str(int(val)) if isinstance(val, float) and val.is_integer() else str(val)
-                return str(val)
-            except:
-                return ""
-        
-        for col in ["Telefone", "Grupo", "Localidade", "Executor", "Tempo", "Atividade"]:
-            if col in df.columns:
-                df[col] = df[col].apply(safe_str_convert)
     except Exception as e:
+        log_exception("editor.preparar_dataframe.erro")
         st.error(f"❌ Erro ao preparar dataframe: {str(e)}")
-        import traceback
-        with st.expander("Detalhes do erro"):
-            st.code(traceback.format_exc())
         return
     
     # Filtros
@@ -179,8 +175,8 @@ def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
             key=f"search_activity_{tab_name}"
         )
     
-    # Aplicar filtros
-    df_filtered = df.copy()
+    # Aplicar filtros (sem copiar: a projeção é somente leitura)
+    df_filtered = df
     
     if status_filter != "Todos":
         df_filtered = df_filtered[df_filtered["Status"] == status_filter]
@@ -192,60 +188,9 @@ def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
     
     st.divider()
     
-    # Preparar dataframe para exibição
-    display_df = df_filtered.copy()
-    
-    # Converter colunas que podem ter tipos mistos para string ANTES de selecionar colunas
-    # (para evitar erros do PyArrow)
-    def convert_to_string_safe(val):
-        if pd.isna(val) or val is None:
-            return ""
-        try:
-            # Se for numérico, converter para string
-            if isinstance(val, (int, float)):
-                return str(int(val)) if isinstance(val, float) and val.is_integer() else str(val)
-            return str(val)
-        except:
-            return ""
-    
-    # Converter colunas problemáticas para string
-    for col in ["Grupo", "Tempo", "Atividade", "Observacoes"]:
-        if col in display_df.columns:
-            display_df[col] = display_df[col].apply(convert_to_string_safe)
-    
     # Selecionar colunas para exibir (removendo colunas sensíveis: Executor, Localidade, Telefone)
-    columns_to_show = [
-        "Seq", "Atividade", "CRQ", "Grupo", "Status",
-        "Inicio", "Fim",
-        "Horario_Inicio_Real", "Horario_Fim_Real",
-        "Is_Milestone",
-        "Tempo", "Atraso_Minutos", "Observacoes", "Predecessoras"
-    ]
-    
-    available_cols = [col for col in columns_to_show if col in display_df.columns]
-    display_df = display_df[available_cols]
-    
-    # Formatar datas para exibição
-    for col in ["Inicio", "Fim"]:
-        if col in display_df.columns:
-            display_df[col] = display_df[col].apply(
-                lambda x: x.strftime(DATE_FORMAT) if pd.notna(x) and hasattr(x, 'strftime') else ""
-            )
-    
-    # Formatar atraso
-    if "Atraso_Minutos" in display_df.columns:
-        from modules.calculations import format_delay
-        display_df["Atraso"] = display_df["Atraso_Minutos"].apply(format_delay)
-    
-    # Garantir que Is_Milestone seja boolean
-    if "Is_Milestone" in display_df.columns:
-        display_df["Is_Milestone"] = display_df["Is_Milestone"].fillna(False).astype(bool)
-        # Converter para texto para exibição
-        display_df["Milestone"] = display_df["Is_Milestone"].apply(lambda x: "✓" if x else "")
-    
-    # Garantir que Predecessoras seja string
-    if "Predecessoras" in display_df.columns:
-        display_df["Predecessoras"] = display_df["Predecessoras"].fillna("").astype(str)
+    available_cols = [col for col in DISPLAY_COLUMNS + ["Atraso", "Milestone"] if col in df_filtered.columns]
+    display_df = df_filtered[available_cols]
     
     st.markdown(f"**Total de atividades filtradas: {len(display_df)}**")
     
@@ -262,6 +207,26 @@ def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
     
     # Exibir tabela somente leitura e clicável
     st.markdown("### 📋 Tabela de Atividades (Somente Leitura)")
+    modo_lote = st.toggle(
+        "☑️ Edição em lote",
+        key=f"bulk_mode_{tab_name}",
+        help="Selecione várias atividades e altere o status de todas de uma vez"
+    )
+    
+    if modo_lote:
+        st.info("💡 Selecione as atividades (caixas à esquerda) e escolha o novo status abaixo")
+        selected_rows = st.dataframe(
+            display_df,
+            width='stretch',
+            hide_index=True,
+            on_select="rerun",
+            selection_mode="multi-row",
+            key=f"table_bulk_{tab_name}"
+        )
+        posicoes = [pos for pos in selected_rows.selection.rows if pos < len(df_filtered)]
+        render_bulk_edit_form(df_filtered.iloc[posicoes], db_manager, tab_name)
+        return
+    
     st.info("💡 Clique em uma linha para editar a atividade")
     
     # Criar tabela somente leitura com seleção (st.dataframe é somente leitura por padrão)
@@ -285,6 +250,11 @@ def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
         selected_index = None
     
     # Exibir formulário se houver linha selecionada
+    if selected_index is not None and selected_index >= len(df_filtered):
+        # Seleção antiga não existe mais (filtro mudou ou dados foram recarregados)
+        st.session_state[selection_key] = None
+        selected_index = None
+    
     if selected_index is not None:
         try:
             # Obter dados da linha selecionada do display_df
@@ -297,64 +267,154 @@ def render_editor_tab(data_dict, crq_selecionado, db_manager, tab_name):
             else:
                 seq_crq = crq_selecionado
             
-            # IMPORTANTE: O display_df mantém a mesma ordem de linhas do df_filtered
-            # O selected_index é a posição da linha no display_df
-            # Podemos usar esse índice diretamente no df_filtered, pois a ordem é preservada
+            # O display_df mantém a ordem do df_filtered: a posição selecionada dá o
+            # Excel_Data_ID, e o índice de atividades localiza a linha no dataframe do CRQ
+            # sem percorrer os dados (funciona também com Seq duplicado)
+            excel_data_id = df_filtered.iloc[selected_index].get("Excel_Data_ID", 0)
+            excel_data_id = 0 if pd.isna(excel_data_id) else int(excel_data_id)
             
-            # Obter o índice real do df_filtered usando a posição selecionada
-            # O display_df é criado a partir do df_filtered com a mesma ordem de linhas
-            if selected_index < len(df_filtered):
-                # Usar o índice pela posição (iloc) para garantir que pegamos a linha correta
-                # mesmo com Seq duplicado
-                original_idx = df_filtered.iloc[selected_index].name
-            else:
-                # Fallback: buscar por Seq + Atividade para garantir unicidade
-                atividade = str(row_data.get("Atividade", ""))
-                mask = (
-                    (df_filtered["Seq"] == seq) &
-                    (df_filtered["Atividade"].astype(str) == atividade)
-                )
-                matching_indices = df_filtered[mask].index.tolist()
-                
-                if len(matching_indices) > 0:
-                    # Se há múltiplas correspondências, usar a posição relativa
-                    if selected_index < len(matching_indices):
-                        original_idx = matching_indices[selected_index]
-                    else:
-                        original_idx = matching_indices[0]
-                else:
-                    # Último fallback: buscar apenas por Seq
-                    matching_indices = df_filtered[df_filtered["Seq"] == seq].index.tolist()
-                    if len(matching_indices) > 0:
-                        original_idx = matching_indices[0] if selected_index >= len(matching_indices) else matching_indices[selected_index]
-                    else:
-                        st.error("❌ Erro ao localizar atividade no dataframe original")
-                        return
+            df_crq, original_idx = get_activity_row(data_dict, seq_crq, excel_data_id)
+            if df_crq is None:
+                st.error("❌ Erro ao localizar atividade no dataframe original")
+                return
             
             # Renderizar formulário de edição
             render_edit_form(
-                df_filtered, original_idx, seq, seq_crq, crq_selecionado,
-                data_dict, db_manager, tab_name, selection_key
+                df_crq, original_idx, seq, seq_crq, db_manager, tab_name, selection_key
             )
         except Exception as e:
+            log_exception("editor.selecao.erro", aba=tab_name)
             st.error(f"❌ Erro ao processar seleção: {str(e)}")
-            import traceback
-            with st.expander("Detalhes do erro"):
-                st.code(traceback.format_exc())
 
 
-def render_edit_form(df_filtered, original_idx, seq, seq_crq, crq_selecionado,
-                     data_dict, db_manager, tab_name, selection_key):
+def build_bulk_preview(df_selecionadas, novo_status, hora_referencia):
+    """
+    Calcula (sem gravar) o resultado da transição em lote das atividades selecionadas
+    
+    Args:
+        df_selecionadas: Linhas da projeção de exibição selecionadas
+        novo_status: Status desejado para todas
+        hora_referencia: Horário usado no preenchimento automático
+        
+    Returns:
+        pd.DataFrame: CRQ, Seq, Atividade, Status atual e o resultado de resolve_transitions_frame
+    """
+    atual = pd.DataFrame({
+        "status": df_selecionadas["Status"],
+        "horario_inicio_real": df_selecionadas["Horario_Inicio_Real"],
+        "horario_fim_real": df_selecionadas["Horario_Fim_Real"],
+        "fim": df_selecionadas["Fim"]
+    }, index=df_selecionadas.index)
+    resultado = resolve_transitions_frame(atual, novo_status, hora_atual=hora_referencia)
+    
+    preview = df_selecionadas[[col for col in ["CRQ", "Seq", "Atividade", "Status"] if col in df_selecionadas.columns]]
+    preview = preview.rename(columns={"Status": "Status Atual"})
+    return pd.concat([preview, resultado.rename(columns={
+        "status": "Novo Status",
+        "horario_inicio_real": "Horario_Inicio_Real",
+        "horario_fim_real": "Horario_Fim_Real",
+        "atraso_minutos": "Atraso_Minutos",
+        "erro": "Erro"
+    }).drop(columns=["tipo_erro"])], axis=1)
+
+
+def render_bulk_edit_form(df_selecionadas, db_manager, tab_name):
+    """
+    Renderiza a edição de status em lote das atividades selecionadas
+    
+    Valida todas juntas (prévia vetorizada) e grava em uma única transação,
+    com uma única recarga dos dados.
+    
+    Args:
+        df_selecionadas: Linhas da projeção de exibição selecionadas
+        db_manager: Gerenciador de banco de dados
+        tab_name: Nome da aba (para as keys)
+    """
+    st.divider()
+    st.markdown("### ✏️ Editar Atividades em Lote")
+    
+    if len(df_selecionadas) == 0:
+        st.caption("Nenhuma atividade selecionada")
+        return
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        novo_status = st.selectbox(
+            "Novo status:",
+            STATUS_OPCOES,
+            index=STATUS_OPCOES.index("Em Execução"),
+            key=f"bulk_status_{tab_name}"
+        )
+    with col2:
+        hora_informada = st.text_input(
+            "Horário de referência (vazio = agora):",
+            help=f"Preenche o início real (Em Execução) ou o fim real (status finais) vazios. Formato: {DATE_FORMAT}",
+            key=f"bulk_hora_{tab_name}"
+        ).strip()
+    
+    if hora_informada and not validate_datetime_string(hora_informada):
+        st.error(f"Data inválida: {hora_informada}. Use o formato {DATE_FORMAT}")
+        return
+    hora_referencia = hora_informada or datetime.now().strftime(DATE_FORMAT)
+    
+    preview = build_bulk_preview(df_selecionadas, novo_status, hora_referencia)
+    invalidas = preview["Erro"].notna()
+    
+    st.markdown(f"**{len(preview)} atividade(s) selecionada(s)** — {int((~invalidas).sum())} válida(s)")
+    st.dataframe(preview, width='stretch', hide_index=True)
+    
+    if invalidas.any():
+        st.warning(f"⚠️ {int(invalidas.sum())} atividade(s) não podem receber o status '{novo_status}' (veja a coluna Erro)")
+    
+    gravar_validas = st.checkbox(
+        "Gravar apenas as válidas",
+        value=False,
+        disabled=not invalidas.any(),
+        key=f"bulk_parcial_{tab_name}"
+    )
+    pode_gravar = not invalidas.any() or (gravar_validas and (~invalidas).any())
+    
+    if st.button(f"💾 Aplicar a {int((~invalidas).sum()) if gravar_validas else len(preview)} atividade(s)",
+                 type="primary", disabled=not pode_gravar, key=f"bulk_apply_{tab_name}"):
+        transicoes = [
+            {
+                "excel_data_id": int(linha.Excel_Data_ID), "crq": linha.CRQ, "seq": int(linha.Seq),
+                "status": novo_status, "versao_linha": getattr(linha, "Versao_Linha", None)
+            }
+            for linha in df_selecionadas.itertuples(index=False)
+        ]
+        try:
+            resultado = apply_status_transitions(
+                db_manager, transicoes, parcial=gravar_validas, hora_atual=hora_referencia
+            )
+        except ConflictError as e:
+            reload_session_data(db_manager)
+            st.error(f"⚠️ {str(e)}. Nada foi gravado: os dados foram recarregados, revise a seleção.")
+            return
+        except Exception as e:
+            st.error(f"❌ Erro ao gravar atividades: {str(e)}")
+            return
+        
+        if resultado["aplicadas"] == 0:
+            st.error("❌ Nenhuma atividade foi gravada: " + "; ".join(erro["erro"] for erro in resultado["erros"][:3]))
+            return
+        
+        # Uma única recarga para o lote inteiro
+        reload_session_data(db_manager)
+        st.session_state.pop(f"table_bulk_{tab_name}", None)
+        st.success(f"✅ {resultado['aplicadas']} atividade(s) atualizada(s)")
+        st.rerun()
+
+
+def render_edit_form(df_filtered, original_idx, seq, seq_crq, db_manager, tab_name, selection_key):
     """
     Renderiza formulário de edição para uma atividade
     
     Args:
-        df_filtered: DataFrame filtrado
+        df_filtered: DataFrame do CRQ da atividade (localizado pelo índice de atividades)
         original_idx: Índice original da linha
         seq: Número sequencial da atividade
         seq_crq: CRQ da atividade
-        crq_selecionado: CRQ selecionado na aba (None para "Todas")
-        data_dict: Dicionário com dataframes
         db_manager: Gerenciador de banco de dados
         tab_name: Nome da aba
         selection_key: Chave para armazenar seleção
@@ -459,11 +519,11 @@ def render_edit_form(df_filtered, original_idx, seq, seq_crq, crq_selecionado,
         
         # Validar e salvar
         if validate_and_save_activity(
-            df_filtered, original_idx, seq, seq_crq, crq_selecionado,
+            df_filtered, original_idx, seq, seq_crq,
             old_status, new_status,
             new_inicio_real, new_fim_real,
             new_observacoes, old_is_milestone, old_predecessoras,
-            data_dict, db_manager
+            db_manager
         ):
             st.success("✅ Atividade salva com sucesso!")
             # Limpar seleção
@@ -476,113 +536,41 @@ def render_edit_form(df_filtered, original_idx, seq, seq_crq, crq_selecionado,
         st.rerun()
 
 
-def validate_and_save_activity(df_filtered, original_idx, seq, seq_crq, crq_selecionado,
+def validate_and_save_activity(df_filtered, original_idx, seq, seq_crq,
                                 old_status, new_status,
                                 new_inicio_real, new_fim_real,
                                 new_observacoes, old_is_milestone, old_predecessoras,
-                                data_dict, db_manager):
+                                db_manager):
     """
     Valida e salva uma atividade
     
     Returns:
         bool: True se salvou com sucesso, False caso contrário
     """
-    import streamlit as st  # Garantir que st está disponível
-    
-    # Normalizar strings vazias
-    if new_inicio_real is None or (isinstance(new_inicio_real, str) and new_inicio_real.strip() == ""):
-        new_inicio_real = ""
-    if new_fim_real is None or (isinstance(new_fim_real, str) and new_fim_real.strip() == ""):
-        new_fim_real = ""
-    
-    # Validar transições de status
-    if new_status in ["Concluído", "Atrasado", "Adiantado"] and old_status not in ["Em Execução", "Concluído", "Atrasado", "Adiantado"]:
-        st.error(f"⚠️ Para alterar o status para '{new_status}', a atividade deve estar em 'Em Execução' primeiro.")
+    # Regras da transição (máquina de estados, horários automáticos, atraso) no motor puro
+    try:
+        resultado = resolve_transition(
+            old_status=old_status,
+            new_status=new_status,
+            old_inicio_real=df_filtered.loc[original_idx, "Horario_Inicio_Real"],
+            old_fim_real=df_filtered.loc[original_idx, "Horario_Fim_Real"],
+            fim_planejado=df_filtered.loc[original_idx, "Fim"],
+            new_inicio_real=new_inicio_real or "",
+            new_fim_real=new_fim_real or ""
+        )
+    except InvalidTransitionError as e:
+        st.error(f"⚠️ {str(e)}")
+        return False
+    except TransitionError as e:
+        st.error(str(e))
         return False
     
-    # Preencher automaticamente horários baseado na mudança de status
-    hora_atual = datetime.now().strftime(DATE_FORMAT)
-    old_inicio_real_value = df_filtered.loc[original_idx, "Horario_Inicio_Real"]
-    old_fim_real_value = df_filtered.loc[original_idx, "Horario_Fim_Real"]
-    
-    # Converter valores antigos para string se necessário
-    if old_inicio_real_value and pd.notna(old_inicio_real_value):
-        if isinstance(old_inicio_real_value, str):
-            old_inicio_real_str = old_inicio_real_value.strip()
-        elif hasattr(old_inicio_real_value, 'strftime'):
-            old_inicio_real_str = old_inicio_real_value.strftime(DATE_FORMAT)
-        else:
-            old_inicio_real_str = str(old_inicio_real_value).strip()
-    else:
-        old_inicio_real_str = ""
+    new_status = resultado["status"]
+    atraso_minutos = resultado["atraso_minutos"]
     
-    # Preencher automaticamente horários baseado na mudança de status
-    if old_status != new_status:
-        # Caso 1: Mudou de "Planejado" para "Em Execução" - preencher Horário Início Real
-        if old_status == "Planejado" and new_status == "Em Execução":
-            if not new_inicio_real or new_inicio_real.strip() == "":
-                new_inicio_real = hora_atual
-            if not new_fim_real or new_fim_real.strip() == "":
-                new_fim_real = ""
-        
-        # Caso 2: Mudou de "Em Execução" para "Concluído", "Atrasado" ou "Adiantado" - preencher Horário Fim Real
-        elif old_status == "Em Execução" and new_status in ["Concluído", "Atrasado", "Adiantado"]:
-            if not new_fim_real or new_fim_real.strip() == "":
-                new_fim_real = hora_atual
-            if old_inicio_real_str:
-                new_inicio_real = old_inicio_real_str
-            elif not new_inicio_real or new_inicio_real.strip() == "":
-                new_inicio_real = hora_atual
-        
-        # Caso 3: Qualquer outra mudança de status
-        else:
-            if not new_inicio_real or new_inicio_real.strip() == "":
-                if old_inicio_real_str:
-                    new_inicio_real = old_inicio_real_str
-                else:
-                    new_inicio_real = hora_atual
-    
-    # Validar datas (apenas se não estiverem vazias)
-    if new_inicio_real and new_inicio_real.strip():
-        if not validate_datetime_string(new_inicio_real):
-            st.error(f"Data inválida: {new_inicio_real}. Use o formato {DATE_FORMAT}")
-            return False
-    
-    if new_fim_real and new_fim_real.strip():
-        if not validate_datetime_string(new_fim_real):
-            st.error(f"Data inválida: {new_fim_real}. Use o formato {DATE_FORMAT}")
-            return False
-    
-    # Validar que fim >= início
-    if new_inicio_real and new_fim_real:
-        inicio_dt = parse_datetime_string(new_inicio_real)
-        fim_dt = parse_datetime_string(new_fim_real)
-        
-        if inicio_dt and fim_dt and fim_dt < inicio_dt:
-            st.error("Horário Fim Real deve ser maior ou igual ao Horário Início Real")
-            return False
-    
-    # Calcular atraso
-    atraso_minutos = 0
-    if new_fim_real:
-        fim_planejado = df_filtered.loc[original_idx, "Fim"]
-        if pd.notna(fim_planejado):
-            atraso_minutos = calculate_delay(fim_planejado, new_fim_real)
-    
-    # Atualizar status se necessário
-    # IMPORTANTE: Se o usuário escolheu "Concluído", manter "Concluído" mesmo se houver atraso
-    # Só alterar automaticamente se o status não foi explicitamente escolhido como "Concluído"
-    # ou se houver atraso positivo (atrasado)
-    if new_status == "Concluído":
-        # Se o usuário escolheu "Concluído", só mudar para "Atrasado" se houver atraso positivo
-        # Não mudar para "Adiantado" se o usuário escolheu "Concluído"
-        if atraso_minutos > 0:
-            new_status = "Atrasado"
-        # Se atraso_minutos < 0 (adiantado) ou == 0, manter "Concluído" como o usuário escolheu
-    
-    # Converter strings vazias para None
-    horario_inicio_real_final = new_inicio_real.strip() if new_inicio_real and new_inicio_real.strip() else None
-    horario_fim_real_final = new_fim_real.strip() if new_fim_real and new_fim_real.strip() else None
+    # Strings vazias já vêm como None do motor de transições
+    horario_inicio_real_final = resultado["horario_inicio_real"]
+    horario_fim_real_final = resultado["horario_fim_real"]
     observacoes_final = new_observacoes.strip() if new_observacoes and new_observacoes.strip() else None
     # Manter valores não editáveis (predecessoras e milestone) do original
     predecessoras_final = old_predecessoras.strip() if old_predecessoras and old_predecessoras.strip() else None
@@ -595,66 +583,35 @@ def validate_and_save_activity(df_filtered, original_idx, seq, seq_crq, crq_sele
     else:
         excel_data_id = int(excel_data_id)
     
+    # Versão da linha vista nesta sessão: se outra sessão salvou depois, não sobrescrever
+    versao_linha = df_filtered.loc[original_idx, "Versao_Linha"] if "Versao_Linha" in df_filtered.columns else None
+    versao_linha = None if versao_linha is None or pd.isna(versao_linha) else int(versao_linha)
+    
     # Salvar no banco de dados (FONTE ÚNICA DE VERDADE)
     # Usar excel_data_id para garantir que atualizamos apenas a linha correta
-    db_manager.save_activity_control(
-        seq=seq,
-        sequencia=seq_crq,
-        status=new_status,
-        horario_inicio_real=horario_inicio_real_final,
-        horario_fim_real=horario_fim_real_final,
-        atraso_minutos=atraso_minutos,
-        observacoes=observacoes_final,
-        is_milestone=is_milestone_final,
-        predecessoras=predecessoras_final,
-        excel_data_id=excel_data_id if excel_data_id > 0 else None
-    )
+    try:
+        db_manager.save_activity_control(
+            seq=seq,
+            sequencia=seq_crq,
+            status=new_status,
+            horario_inicio_real=horario_inicio_real_final,
+            horario_fim_real=horario_fim_real_final,
+            atraso_minutos=atraso_minutos,
+            observacoes=observacoes_final,
+            is_milestone=is_milestone_final,
+            predecessoras=predecessoras_final,
+            excel_data_id=excel_data_id if excel_data_id > 0 else None,
+            versao_esperada=versao_linha
+        )
+    except ConflictError:
+        # Recarregar para que o formulário mostre os valores atuais
+        reload_session_data(db_manager)
+        st.error("⚠️ Esta atividade foi alterada por outra sessão enquanto você editava. "
+                 "Os dados foram recarregados: confira os valores atuais e salve novamente.")
+        return False
     
-    # IMPORTANTE: Após salvar no banco, atualizar st.session_state.data_dict
-    # Isso garante que todas as sessões vejam as mesmas mudanças
-    # Recarregar do banco (fonte única de verdade) e atualizar session_state
-    import streamlit as st
-    saved_excel_data = db_manager.load_excel_data()
-    if saved_excel_data:
-        control_data = db_manager.get_all_activities_control()
-        from modules.data_loader import merge_control_data
-        # Recarregar do banco e atualizar session_state
-        merged_data = merge_control_data(saved_excel_data, control_data)
-        st.session_state.data_dict = merged_data
-        # Também atualizar o data_dict local para exibição imediata
-        data_dict.clear()
-        data_dict.update(merged_data)
-    
-    # Atualizar dataframe em memória (para exibição imediata)
-    if crq_selecionado is None:
-        # Na aba "Todas", atualizar o dataframe correto
-        if seq_crq in data_dict:
-            df_crq = data_dict[seq_crq]["dataframe"]
-            mask = (df_crq["Seq"] == seq)
-            if mask.any():
-                idx_crq = df_crq[mask].index[0]
-                df_crq.loc[idx_crq, "Status"] = new_status
-                df_crq.loc[idx_crq, "Horario_Inicio_Real"] = horario_inicio_real_final
-                df_crq.loc[idx_crq, "Horario_Fim_Real"] = horario_fim_real_final
-                df_crq.loc[idx_crq, "Atraso_Minutos"] = atraso_minutos
-                df_crq.loc[idx_crq, "Observacoes"] = observacoes_final if observacoes_final else ""
-                if "Is_Milestone" in df_crq.columns:
-                    df_crq.loc[idx_crq, "Is_Milestone"] = is_milestone_final
-                if "Predecessoras" in df_crq.columns:
-                    df_crq.loc[idx_crq, "Predecessoras"] = predecessoras_final if predecessoras_final else ""
-                data_dict[seq_crq]["dataframe"] = df_crq
-    else:
-        # Atualizar dataframe do CRQ específico
-        df = data_dict[crq_selecionado]["dataframe"]
-        df.loc[original_idx, "Status"] = new_status
-        df.loc[original_idx, "Horario_Inicio_Real"] = horario_inicio_real_final
-        df.loc[original_idx, "Horario_Fim_Real"] = horario_fim_real_final
-        df.loc[original_idx, "Atraso_Minutos"] = atraso_minutos
-        df.loc[original_idx, "Observacoes"] = observacoes_final if observacoes_final else ""
-        if "Is_Milestone" in df.columns:
-            df.loc[original_idx, "Is_Milestone"] = is_milestone_final
-        if "Predecessoras" in df.columns:
-            df.loc[original_idx, "Predecessoras"] = predecessoras_final if predecessoras_final else ""
-        data_dict[crq_selecionado]["dataframe"] = df
+    # Recarregar do banco (fonte única de verdade): os dados da sessão já trazem a linha
+    # gravada e a nova Versao_Linha
+    reload_session_data(db_manager)
     
     return True
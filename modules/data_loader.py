@@ -4,176 +4,188 @@ Módulo para carregamento de dados do arquivo Excel
 import pandas as pd
 import streamlit as st
 from datetime import datetime
-from config import EXCEL_COLUMNS, SEQUENCIAS
+from config import EXCEL_COLUMNS
+from modules.crq_registry import CRQRegistry, get_crq_registry
+from modules.cache import publish_shared_data_version
+from modules.instrumentation import timed
 
 
 @st.cache_data(show_spinner="Carregando arquivo Excel...")
-def load_excel_file(uploaded_file):
+def load_excel_file(uploaded_file, siglas=None):
     """
     Carrega arquivo Excel e retorna dados de todas as abas
     
     Args:
         uploaded_file: Arquivo Excel carregado via Streamlit
+        siglas: Siglas do cadastro de CRQs (CRQRegistry.fingerprint). Fazem parte da chave
+            do cache: editar o cadastro invalida a leitura anterior do mesmo arquivo.
+            Padrão: cadastro da sessão
         
     Returns:
         dict: Dicionário com dados de cada sequência
     """
     try:
-        # Ler todas as abas do Excel
-        excel_file = pd.ExcelFile(uploaded_file)
-        sheet_names = excel_file.sheet_names
+        # Só as siglas importam para identificar as abas
+        registry = get_crq_registry() if siglas is None else CRQRegistry({sigla: {} for sigla in siglas})
+        return read_excel_workbook(uploaded_file, registry)
+    
+    except Exception as e:
+        st.error(f"Erro ao carregar arquivo Excel: {str(e)}")
+        return None
+
+
+def read_excel_workbook(arquivo, registry):
+    """
+    Lê as abas do Excel reconhecidas pelo cadastro de CRQs (sem cache; usada também pela API)
+    
+    Args:
+        arquivo: Caminho ou arquivo (file-like) do Excel
+        registry: CRQRegistry usado para identificar as abas
+        
+    Returns:
+        dict: {sigla: {"dataframe", "sheet_name"}}
+        
+    Raises:
+        Exception: Se o arquivo não puder ser lido como Excel
+    """
+    # Ler todas as abas do Excel
+    excel_file = pd.ExcelFile(arquivo)
+    sheet_names = excel_file.sheet_names
+    
+    dados = {}
+    
+    for sheet_name in sheet_names:
+        # Identificar sequência pelo nome da aba (cadastro de CRQs)
+        sequencia = registry.match(sheet_name)
+        
+        if not sequencia:
+            # Pular abas não reconhecidas
+            continue
+        
+        # Ler aba
+        df = pd.read_excel(arquivo, sheet_name=sheet_name)
+        
+        # Verificar se o dataframe está vazio
+        if df.empty or len(df.columns) == 0:
+            continue
+        
+        # Normalizar nomes das colunas (remover espaços, normalizar maiúsculas/minúsculas)
+        df.columns = [str(col).strip() for col in df.columns]
         
-        dados = {}
+        # Mapear nomes de colunas para os esperados (case-insensitive e tolerante a espaços)
+        expected_cols = ["Seq", "Atividade", "Grupo", "Localidade", 
+                        "Executor", "Telefone", "Inicio", "Fim", "Tempo"]
         
-        for sheet_name in sheet_names:
-            # Identificar sequência pelo nome da aba
-            sequencia = None
-            for seq_key, seq_info in SEQUENCIAS.items():
-                if seq_key in sheet_name.upper():
-                    sequencia = seq_key
+        # Criar mapeamento flexível
+        col_mapping = {}
+        for i, expected in enumerate(expected_cols):
+            # Procurar coluna correspondente (case-insensitive, ignorando espaços)
+            found = False
+            for j, actual_col in enumerate(df.columns):
+                if actual_col.strip().lower() == expected.lower():
+                    col_mapping[expected] = j
+                    found = True
                     break
             
-            if not sequencia:
-                # Tentar identificar por padrão
-                if "REDE" in sheet_name.upper():
-                    sequencia = "REDE"
-                elif "OPENSHIFT" in sheet_name.upper():
-                    sequencia = "OPENSHIFT"
-                elif "NFS" in sheet_name.upper():
-                    sequencia = "NFS"
-                elif "SI" in sheet_name.upper():
-                    sequencia = "SI"
-                else:
-                    # Pular abas não reconhecidas
-                    continue
-            
-            # Ler aba
-            df = pd.read_excel(uploaded_file, sheet_name=sheet_name)
-            
-            # Verificar se o dataframe está vazio
-            if df.empty or len(df.columns) == 0:
-                continue
-            
-            # Normalizar nomes das colunas (remover espaços, normalizar maiúsculas/minúsculas)
-            df.columns = [str(col).strip() for col in df.columns]
-            
-            # Mapear nomes de colunas para os esperados (case-insensitive e tolerante a espaços)
-            expected_cols = ["Seq", "Atividade", "Grupo", "Localidade", 
-                            "Executor", "Telefone", "Inicio", "Fim", "Tempo"]
-            
-            # Criar mapeamento flexível
-            col_mapping = {}
-            for i, expected in enumerate(expected_cols):
-                # Procurar coluna correspondente (case-insensitive, ignorando espaços)
-                found = False
-                for j, actual_col in enumerate(df.columns):
-                    if actual_col.strip().lower() == expected.lower():
-                        col_mapping[expected] = j
-                        found = True
-                        break
-                
-                # Se não encontrou, usar posição por índice (assumindo ordem)
-                if not found and i < len(df.columns):
-                    col_mapping[expected] = i
-            
-            # Verificar se temos pelo menos as colunas essenciais
-            if len(col_mapping) < 5:  # Mínimo: Seq, Atividade, Inicio, Fim, Tempo
-                st.warning(f"Estrutura da aba {sheet_name} pode estar incorreta. Colunas encontradas: {list(df.columns[:9])}")
-                continue
-            
-            # Selecionar e renomear colunas
-            selected_cols = []
-            for expected in expected_cols:
-                if expected in col_mapping:
-                    idx = col_mapping[expected]
-                    if idx < len(df.columns):
-                        selected_cols.append(df.columns[idx])
-                    else:
-                        selected_cols.append(None)
+            # Se não encontrou, usar posição por índice (assumindo ordem)
+            if not found and i < len(df.columns):
+                col_mapping[expected] = i
+        
+        # Verificar se temos pelo menos as colunas essenciais
+        if len(col_mapping) < 5:  # Mínimo: Seq, Atividade, Inicio, Fim, Tempo
+            st.warning(f"Estrutura da aba {sheet_name} pode estar incorreta. Colunas encontradas: {list(df.columns[:9])}")
+            continue
+        
+        # Selecionar e renomear colunas
+        selected_cols = []
+        for expected in expected_cols:
+            if expected in col_mapping:
+                idx = col_mapping[expected]
+                if idx < len(df.columns):
+                    selected_cols.append(df.columns[idx])
                 else:
                     selected_cols.append(None)
+            else:
+                selected_cols.append(None)
+        
+        # Criar novo dataframe com colunas corretas
+        new_df = pd.DataFrame()
+        for i, expected in enumerate(expected_cols):
+            if selected_cols[i] is not None and selected_cols[i] in df.columns:
+                new_df[expected] = df[selected_cols[i]]
+            else:
+                new_df[expected] = None
+        
+        df = new_df
+        
+        # Limpar dados - ser mais tolerante
+        # Remover apenas linhas onde AMBOS Seq E Atividade estão completamente vazios
+        # Se tiver pelo menos um preenchido, manter a linha
+        
+        # Converter Seq para string primeiro para verificar vazios
+        df["Seq"] = df["Seq"].astype(str)
+        df["Atividade"] = df["Atividade"].astype(str)
+        
+        # Criar máscara: manter se Seq não está vazio OU Atividade não está vazia
+        mask_valid = (
+            (df["Seq"].notna() & (df["Seq"].str.strip() != "") & (df["Seq"].str.strip() != "nan")) |
+            (df["Atividade"].notna() & (df["Atividade"].str.strip() != "") & (df["Atividade"].str.strip() != "nan"))
+        )
+        df = df[mask_valid].copy()
+        
+        # Converter tipos
+        try:
+            # Tentar converter Seq para numérico, mas manter linhas mesmo se falhar
+            # Usar errors='coerce' para converter inválidos para NaN, mas manter a linha
+            df["Seq"] = pd.to_numeric(df["Seq"], errors='coerce').astype('Int64')
             
-            # Criar novo dataframe com colunas corretas
-            new_df = pd.DataFrame()
-            for i, expected in enumerate(expected_cols):
-                if selected_cols[i] is not None and selected_cols[i] in df.columns:
-                    new_df[expected] = df[selected_cols[i]]
-                else:
-                    new_df[expected] = None
-            
-            df = new_df
-            
-            # Limpar dados - ser mais tolerante
-            # Remover apenas linhas onde AMBOS Seq E Atividade estão completamente vazios
-            # Se tiver pelo menos um preenchido, manter a linha
-            
-            # Converter Seq para string primeiro para verificar vazios
-            df["Seq"] = df["Seq"].astype(str)
-            df["Atividade"] = df["Atividade"].astype(str)
-            
-            # Criar máscara: manter se Seq não está vazio OU Atividade não está vazia
-            mask_valid = (
-                (df["Seq"].notna() & (df["Seq"].str.strip() != "") & (df["Seq"].str.strip() != "nan")) |
-                (df["Atividade"].notna() & (df["Atividade"].str.strip() != "") & (df["Atividade"].str.strip() != "nan"))
-            )
-            df = df[mask_valid].copy()
-            
-            # Converter tipos
+            # Não remover linhas baseado apenas em Seq - manter todas que têm Atividade
+            # O salvamento no banco vai tratar linhas sem Seq válido
+        except Exception as e:
+            st.warning(f"Erro ao converter Seq na aba {sheet_name}: {str(e)}")
+            # Continuar mesmo com erro, tentar salvar o que conseguir
+            # Manter Seq como string se não conseguir converter
+        
+        # Converter datas
+        for col in ["Inicio", "Fim"]:
+            if col in df.columns:
+                df[col] = pd.to_datetime(df[col], errors='coerce')
+        
+        # Converter colunas de texto para string (evitar tipos mistos)
+        # Função robusta para converter qualquer tipo para string
+        def safe_str_convert(val):
+            if pd.isna(val) or val is None:
+                return ""
             try:
-                # Tentar converter Seq para numérico, mas manter linhas mesmo se falhar
-                # Usar errors='coerce' para converter inválidos para NaN, mas manter a linha
-                df["Seq"] = pd.to_numeric(df["Seq"], errors='coerce').astype('Int64')
-                
-                # Não remover linhas baseado apenas em Seq - manter todas que têm Atividade
-                # O salvamento no banco vai tratar linhas sem Seq válido
-            except Exception as e:
-                st.warning(f"Erro ao converter Seq na aba {sheet_name}: {str(e)}")
-                # Continuar mesmo com erro, tentar salvar o que conseguir
-                # Manter Seq como string se não conseguir converter
-            
-            # Converter datas
-            for col in ["Inicio", "Fim"]:
-                if col in df.columns:
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-            
-            # Converter colunas de texto para string (evitar tipos mistos)
-            # Função robusta para converter qualquer tipo para string
-            def safe_str_convert(val):
-                if pd.isna(val) or val is None:
-                    return ""
-                try:
-                    if isinstance(val, (int, float)):
-                        return str(int(val)) if isinstance(val, float) and val.is_integer() else str(val)
-                    return str(val)
-                except:
-                    return ""
-            
-            for col in ["Telefone", "Grupo", "Localidade", "Executor", "Atividade"]:
-                if col in df.columns:
-                    df[col] = df[col].apply(safe_str_convert)
-            
-            # Converter coluna Tempo de hh:mm:ss para minutos
-            if "Tempo" in df.columns:
-                from modules.calculations import convert_time_to_minutes
-                df["Tempo"] = df["Tempo"].apply(convert_time_to_minutes)
-                # Converter para float (minutos)
-                df["Tempo"] = pd.to_numeric(df["Tempo"], errors='coerce').fillna(0)
-            
-            # Adicionar CRQ ao dataframe
-            df["CRQ"] = sequencia
-            
-            dados[sequencia] = {
-                "dataframe": df,
-                "sheet_name": sheet_name
-            }
+                if isinstance(val, (int, float)):
+                    return str(int(val)) if isinstance(val, float) and val.is_integer() else str(val)
+                return str(val)
+            except:
+                return ""
+        
+        for col in ["Telefone", "Grupo", "Localidade", "Executor", "Atividade"]:
+            if col in df.columns:
+                df[col] = df[col].apply(safe_str_convert)
+        
+        # Converter coluna Tempo de hh:mm:ss para minutos
+        if "Tempo" in df.columns:
+            from modules.calculations import convert_time_to_minutes
+            df["Tempo"] = df["Tempo"].apply(convert_time_to_minutes)
+            # Converter para float (minutos)
+            df["Tempo"] = pd.to_numeric(df["Tempo"], errors='coerce').fillna(0)
+        
+        # Adicionar CRQ ao dataframe
+        df["CRQ"] = sequencia
         
-        return dados
+        dados[sequencia] = {
+            "dataframe": df,
+            "sheet_name": sheet_name
+        }
     
-    except Exception as e:
-        st.error(f"Erro ao carregar arquivo Excel: {str(e)}")
-        return None
+    return dados
 
 
+@timed("merge_control_data")
 def merge_control_data(excel_data, control_data):
     """
     Mescla dados do Excel com dados de controle do banco
@@ -198,6 +210,8 @@ def merge_control_data(excel_data, control_data):
         df["Observacoes"] = ""
         df["Is_Milestone"] = False
         df["Predecessoras"] = ""
+        # Versão da linha no banco (controle de concorrência otimista nas edições)
+        df["Versao_Linha"] = 0
         
         # Marcar como milestone linhas com Grupo vazio
         if "Grupo" in df.columns:
@@ -265,6 +279,7 @@ def merge_control_data(excel_data, control_data):
                 # Se não está no banco mas foi detectado como milestone, manter True
                 # (já foi definido acima)
                 df.at[idx, "Predecessoras"] = control.get("predecessoras", "")
+                df.at[idx, "Versao_Linha"] = control.get("versao_linha", 0)
         
         # Garantir que todas as colunas sensíveis sejam string ANTES de retornar
         # Isso evita erros do PyArrow mesmo que as colunas não sejam exibidas
@@ -287,6 +302,47 @@ def merge_control_data(excel_data, control_data):
     return merged_data
 
 
+def load_data_from_database(db_manager):
+    """
+    Carrega dados do banco (Excel + controle) já mesclados
+    
+    Args:
+        db_manager: Gerenciador de banco de dados
+        
+    Returns:
+        tuple: (dados mesclados ou {} se não houver dados, versão dos dados lida antes da carga)
+    """
+    # Ler a versão ANTES da carga: se houver escrita concorrente, a próxima
+    # verificação de versão detecta a diferença e recarrega novamente
+    data_version = db_manager.get_data_version()
+    
+    saved_excel_data = db_manager.load_excel_data()
+    if not saved_excel_data:
+        return {}, data_version
+    
+    control_data = db_manager.get_all_activities_control()
+    return merge_control_data(saved_excel_data, control_data), data_version
+
+
+def reload_session_data(db_manager):
+    """
+    Recarrega dados do banco para o session_state (data_dict e data_version)
+    
+    Args:
+        db_manager: Gerenciador de banco de dados
+        
+    Returns:
+        dict: Dados mesclados ({} se não houver dados no banco)
+    """
+    data_dict, data_version = load_data_from_database(db_manager)
+    st.session_state.data_dict = data_dict
+    st.session_state.data_version = data_version
+    # Após uma escrita a sessão fica à frente da versão compartilhada: o modo ao vivo
+    # não deve tratar a própria gravação como mudança de outra sessão
+    publish_shared_data_version(db_manager.db_path, data_version)
+    return data_dict
+
+
 def validate_excel_structure(uploaded_file):
     """
     Valida se o arquivo Excel tem a estrutura esperada
@@ -307,15 +363,11 @@ def validate_excel_structure(uploaded_file):
         expected_cols_lower = ["seq", "atividade", "grupo", "localidade", 
                               "executor", "telefone", "inicio", "fim", "tempo"]
         
+        registry = get_crq_registry()
+        
         for sheet_name in excel_file.sheet_names:
             # Verificar se a aba é uma das sequências esperadas
-            is_recognized = False
-            for seq_key in SEQUENCIAS.keys():
-                if seq_key in sheet_name.upper():
-                    is_recognized = True
-                    break
-            
-            if not is_recognized:
+            if not registry.match(sheet_name):
                 continue
             
             # Ler aba
@@ -1,18 +1,79 @@
 """
 Módulo para gerenciamento do banco de dados SQLite
 """
+import logging
 import sqlite3
 import os
+import re
 from datetime import datetime
-from config import DB_PATH
+from config import (
+    DB_PATH, SEQUENCIAS, BACKUP_LOTE, BACKUP_DIR, BACKUP_SNAPSHOT_MANTER, BACKUP_SNAPSHOT_PAGINAS
+)
+from modules.instrumentation import timed, log_event, log_exception
+
+
+# Versão do formato de backup em streaming (NDJSON compactado)
+BACKUP_STREAM_VERSION = "2.1-ndjson"
+
+# Janela criada automaticamente (recebe os dados anteriores ao suporte a várias janelas)
+DEFAULT_JANELA_ID = 1
+DEFAULT_JANELA_NOME = "Janela padrão"
+
+# Colunas permitidas para ordenação em query_activities (evita SQL dinâmico arbitrário)
+ACTIVITY_ORDER_COLUMNS = {
+    "sequencia": "sequencia, seq, excel_data_id",
+    "seq": "seq, sequencia, excel_data_id",
+    "atividade": "atividade COLLATE NOCASE, excel_data_id",
+    "status": "status, sequencia, seq",
+    "inicio": "inicio, sequencia, seq",
+    "fim": "fim, sequencia, seq"
+}
+
+
+def build_fts_query(texto):
+    """
+    Converte texto livre em consulta FTS5 com correspondência por prefixo
+    
+    Args:
+        texto: Texto digitado pelo usuário (ex: "fire rot")
+        
+    Returns:
+        str: Consulta FTS5 (ex: '"fire"* "rot"*') ou None se não houver termos
+    """
+    termos = re.findall(r"\w+", str(texto or ""), flags=re.UNICODE)
+    if not termos:
+        return None
+    return " ".join(f'"{termo}"*' for termo in termos)
+
+
+class ConflictError(Exception):
+    """
+    Atividade alterada por outra sessão desde a leitura (versão da linha diferente)
+
+    Attributes:
+        conflitos: Lista de dicts com seq, sequencia, excel_data_id,
+            versao_esperada e versao_atual
+    """
+
+    def __init__(self, conflitos):
+        self.conflitos = conflitos
+        descricao = ", ".join(f"{c['sequencia']} seq {c['seq']}" for c in conflitos[:5])
+        super().__init__(f"Atividade(s) alterada(s) por outra sessão: {descricao}")
 
 
 class DatabaseManager:
     """Gerenciador do banco de dados SQLite"""
     
-    def __init__(self):
-        self.db_path = DB_PATH
+    def __init__(self, db_path=None):
+        """
+        Args:
+            db_path: Caminho do banco (padrão: config.DB_PATH)
+        """
+        self.db_path = db_path or DB_PATH
         self.init_database()
+        # Janela ativa desta instância (uma por sessão): todas as consultas e
+        # escritas de atividades ficam restritas a ela
+        self.janela_id = self.get_latest_janela_id()
     
     def get_connection(self):
         """Retorna conexão com o banco de dados"""
@@ -32,7 +93,7 @@ class DatabaseManager:
             old_sql = existing_table[0]
             # Se tem constraint antiga sem excel_data_id, precisa recriar
             if 'UNIQUE(seq, sequencia)' in old_sql and 'UNIQUE(seq, sequencia, excel_data_id)' not in old_sql:
-                print("AVISO: Tabela activity_control tem constraint antiga, será recriada na migração abaixo")
+                log_event("banco.migracao.constraint_antiga", logging.WARNING, tabela="activity_control")
         else:
             # Tabela não existe, criar com constraint correta
             cursor.execute("""
@@ -76,7 +137,7 @@ class DatabaseManager:
                 # Se tem UNIQUE mas não tem excel_data_id na constraint, precisa migrar
                 if has_old_constraint:
                     needs_migration = True
-                    print(f"DEBUG: Detectada constraint antiga: {old_sql[:200]}")
+                    log_event("banco.migracao.constraint_detectada", logging.DEBUG, sql=old_sql[:200])
             
             # Verificar também se a coluna excel_data_id existe mas não está na constraint
             if not needs_migration:
@@ -89,13 +150,13 @@ class DatabaseManager:
                         # Se tem a coluna mas não está na constraint UNIQUE, precisa migrar
                         if 'UNIQUE(seq, sequencia, excel_data_id)' not in old_sql:
                             needs_migration = True
-                            print("DEBUG: Coluna excel_data_id existe mas não está na constraint UNIQUE")
+                            log_event("banco.migracao.excel_data_id_fora_da_constraint", logging.DEBUG)
                 except:
                     pass
             
             if needs_migration:
                 # Tabela antiga precisa ser migrada
-                print("AVISO: Migrando tabela activity_control para suportar excel_data_id")
+                log_event("banco.migracao.inicio", logging.INFO, tabela="activity_control")
                 
                 # Verificar se a tabela tem dados
                 cursor.execute("SELECT COUNT(*) FROM activity_control")
@@ -172,14 +233,13 @@ class DatabaseManager:
                 """)
                 
                 conn.commit()
-                print("AVISO: Migração concluída com sucesso")
+                log_event("banco.migracao.concluida", logging.INFO, tabela="activity_control")
             else:
                 # Tabela já tem constraint correta, não precisa migrar
-                print("DEBUG: Tabela activity_control já tem constraint correta")
-        except Exception as e:
-            print(f"AVISO: Erro na migração (pode ser ignorado se tabela já está correta): {e}")
-            import traceback
-            print(traceback.format_exc())
+                log_event("banco.migracao.desnecessaria", logging.DEBUG, tabela="activity_control")
+        except Exception:
+            # Pode ser ignorado se a tabela já está correta
+            log_exception("banco.migracao.erro", tabela="activity_control")
         
         # Adicionar novas colunas se a tabela já existir (migração)
         try:
@@ -192,6 +252,12 @@ class DatabaseManager:
         except sqlite3.OperationalError:
             pass  # Coluna já existe
         
+        # Versão da linha para controle de concorrência otimista (incrementada a cada atualização)
+        try:
+            cursor.execute("ALTER TABLE activity_control ADD COLUMN versao_linha INTEGER DEFAULT 0")
+        except sqlite3.OperationalError:
+            pass  # Coluna já existe
+        
         # Criar índices para melhor performance
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_seq_sequencia 
@@ -275,7 +341,7 @@ class DatabaseManager:
             old_sql = cursor.fetchone()
             if old_sql and 'UNIQUE(sequencia, seq)' in old_sql[0]:
                 # Tabela antiga tem UNIQUE, precisa recriar
-                print("AVISO: Removendo constraint UNIQUE da tabela excel_data (migração)")
+                log_event("banco.migracao.inicio", logging.INFO, tabela="excel_data")
                 cursor.execute("""
                     CREATE TABLE excel_data_new (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -308,13 +374,455 @@ class DatabaseManager:
                     CREATE INDEX IF NOT EXISTS idx_excel_seq_sequencia 
                     ON excel_data(seq, sequencia)
                 """)
-        except Exception as e:
+        except Exception:
             # Se der erro na migração, continuar (pode ser que a tabela já esteja correta)
-            print(f"AVISO: Erro na migração (pode ser ignorado se tabela já está correta): {e}")
+            log_exception("banco.migracao.erro", tabela="excel_data")
+
+        # Janelas de mudança: cada linha de excel_data/activity_control pertence a uma janela,
+        # permitindo manter várias janelas lado a lado sem apagar o histórico
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS janelas (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nome TEXT NOT NULL,
+                descricao TEXT,
+                arquivo TEXT,
+                data_criacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                data_atualizacao TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("SELECT COUNT(*) FROM janelas")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("INSERT INTO janelas (id, nome) VALUES (?, ?)",
+                           (DEFAULT_JANELA_ID, DEFAULT_JANELA_NOME))
+        
+        # Migração: dados existentes ficam na janela padrão
+        for table in ["excel_data", "activity_control"]:
+            try:
+                cursor.execute(f"ALTER TABLE {table} ADD COLUMN janela_id INTEGER DEFAULT {DEFAULT_JANELA_ID}")
+            except sqlite3.OperationalError:
+                pass  # Coluna já existe
+        
+        # Índices particionados por janela (todas as consultas filtram por janela_id)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_excel_janela_sequencia_seq 
+            ON excel_data(janela_id, sequencia, seq)
+        """)
+        
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_janela_sequencia_seq 
+            ON activity_control(janela_id, sequencia, seq)
+        """)
         
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_janela_excel_data_id 
+            ON activity_control(janela_id, excel_data_id)
+        """)
+
+        # Cadastro de CRQs (substitui o SEQUENCIAS fixo do config, usado apenas como carga inicial)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS crqs (
+                sigla TEXT PRIMARY KEY,
+                nome TEXT NOT NULL,
+                emoji TEXT DEFAULT '📊',
+                total INTEGER DEFAULT 0,
+                ordem INTEGER DEFAULT 0
+            )
+        """)
+        cursor.execute("SELECT COUNT(*) FROM crqs")
+        if cursor.fetchone()[0] == 0:
+            cursor.executemany("""
+                INSERT INTO crqs (sigla, nome, emoji, total, ordem) VALUES (?, ?, ?, ?, ?)
+            """, [
+                (sigla, info["nome"], info["emoji"], info["total"], ordem)
+                for ordem, (sigla, info) in enumerate(SEQUENCIAS.items())
+            ])
+
+        # View com os dados do Excel já mesclados com o controle (mesmas regras do merge_control_data)
+        # Recriada a cada inicialização para acompanhar mudanças na definição
+        cursor.execute("DROP VIEW IF EXISTS vw_atividades")
+        cursor.execute("""
+            CREATE VIEW vw_atividades AS
+            SELECT e.id AS excel_data_id, e.janela_id,
+                   e.sequencia, e.seq, e.atividade, e.grupo, e.localidade,
+                   e.executor, e.telefone, e.inicio, e.fim, e.tempo,
+                   COALESCE(ac.status, acl.status, 'Planejado') AS status,
+                   COALESCE(ac.horario_inicio_real, acl.horario_inicio_real) AS horario_inicio_real,
+                   COALESCE(ac.horario_fim_real, acl.horario_fim_real) AS horario_fim_real,
+                   COALESCE(ac.atraso_minutos, acl.atraso_minutos, 0) AS atraso_minutos,
+                   COALESCE(ac.observacoes, acl.observacoes, '') AS observacoes,
+                   CASE
+                       WHEN TRIM(COALESCE(e.grupo, '')) IN ('', 'nan') THEN 1
+                       WHEN COALESCE(ac.is_milestone, acl.is_milestone, 0) = 1 THEN 1
+                       ELSE 0
+                   END AS is_milestone,
+                   COALESCE(ac.predecessoras, acl.predecessoras, '') AS predecessoras,
+                   COALESCE(ac.versao_linha, acl.versao_linha, 0) AS versao_linha
+            FROM excel_data e
+            LEFT JOIN activity_control ac
+                   ON ac.excel_data_id = e.id AND ac.seq = e.seq AND ac.sequencia = e.sequencia
+            LEFT JOIN activity_control acl
+                   ON ac.id IS NULL
+                  AND acl.id = (
+                      SELECT MAX(l.id) FROM activity_control l
+                      WHERE l.seq = e.seq AND l.sequencia = e.sequencia
+                        AND l.janela_id = e.janela_id
+                        AND COALESCE(l.excel_data_id, 0) = 0
+                  )
+        """)
+
+        # Índice de busca textual (FTS5) sincronizado por triggers
+        self.fts_enabled = self.init_fts_index(cursor)
+
+        # Versão dos dados: contador incrementado por triggers a cada escrita em
+        # excel_data/activity_control (permite detectar mudanças sem recarregar tudo)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS data_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                versao INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO data_version (id, versao) VALUES (1, 0)")
+        for table in ["excel_data", "activity_control", "crqs"]:
+            for event in ["INSERT", "UPDATE", "DELETE"]:
+                cursor.execute(f"""
+                    CREATE TRIGGER IF NOT EXISTS trg_{table}_version_{event.lower()}
+                    AFTER {event} ON {table}
+                    BEGIN
+                        UPDATE data_version SET versao = versao + 1 WHERE id = 1;
+                    END
+                """)
+
         conn.commit()
         conn.close()
+
+    def init_fts_index(self, cursor):
+        """
+        Cria o índice FTS5 de busca textual das atividades e os triggers de sincronização
+        
+        O índice cobre atividade, executor, grupo, localidade (excel_data) e
+        observacoes (activity_control), com rowid = excel_data.id.
+        
+        Args:
+            cursor: Cursor da conexão em uso pelo init_database
+            
+        Returns:
+            bool: True se o FTS5 está disponível, False caso contrário (busca usa LIKE)
+        """
+        try:
+            cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name='atividades_fts'")
+            existing = cursor.fetchone()
+            
+            # Migração: índice antigo sem localidade/observacoes precisa ser recriado
+            if existing and "observacoes" not in existing[0]:
+                log_event("banco.fts_recriado", logging.WARNING, motivo="colunas localidade/observacoes ausentes")
+                cursor.execute("DROP TABLE atividades_fts")
+                existing = None
+            
+            cursor.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS atividades_fts USING fts5(
+                    atividade, executor, grupo, localidade, observacoes,
+                    tokenize = 'unicode61 remove_diacritics 2'
+                )
+            """)
+        except sqlite3.OperationalError as e:
+            log_event("banco.fts_indisponivel", logging.WARNING, erro=str(e), busca="LIKE")
+            return False
+        
+        # Triggers recriados a cada inicialização para acompanhar mudanças na definição
+        for trigger in ["trg_excel_data_fts_insert", "trg_excel_data_fts_delete",
+                        "trg_excel_data_fts_update", "trg_activity_control_fts_insert",
+                        "trg_activity_control_fts_update", "trg_activity_control_fts_delete"]:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        
+        # Reindexa as linhas do excel_data afetadas por uma mudança no controle
+        # (por excel_data_id ou, em registros antigos sem excel_data_id, por janela + seq + sequencia)
+        def refresh_from_control(ref):
+            return f"""
+                DELETE FROM atividades_fts WHERE rowid IN (
+                    SELECT id FROM excel_data
+                    WHERE id = {ref}.excel_data_id
+                       OR (COALESCE({ref}.excel_data_id, 0) = 0 AND janela_id = {ref}.janela_id
+                           AND seq = {ref}.seq AND sequencia = {ref}.sequencia)
+                );
+                INSERT INTO atividades_fts(rowid, atividade, executor, grupo, localidade, observacoes)
+                SELECT excel_data_id, atividade, executor, grupo, localidade, observacoes
+                FROM vw_atividades
+                WHERE excel_data_id = {ref}.excel_data_id
+                   OR (COALESCE({ref}.excel_data_id, 0) = 0 AND janela_id = {ref}.janela_id
+                       AND seq = {ref}.seq AND sequencia = {ref}.sequencia);
+            """
+        
+        cursor.execute("""
+            CREATE TRIGGER trg_excel_data_fts_insert AFTER INSERT ON excel_data
+            BEGIN
+                INSERT INTO atividades_fts(rowid, atividade, executor, grupo, localidade, observacoes)
+                SELECT excel_data_id, atividade, executor, grupo, localidade, observacoes
+                FROM vw_atividades WHERE excel_data_id = new.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER trg_excel_data_fts_delete AFTER DELETE ON excel_data
+            BEGIN
+                DELETE FROM atividades_fts WHERE rowid = old.id;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER trg_excel_data_fts_update
+            AFTER UPDATE OF atividade, executor, grupo, localidade ON excel_data
+            BEGIN
+                DELETE FROM atividades_fts WHERE rowid = old.id;
+                INSERT INTO atividades_fts(rowid, atividade, executor, grupo, localidade, observacoes)
+                SELECT excel_data_id, atividade, executor, grupo, localidade, observacoes
+                FROM vw_atividades WHERE excel_data_id = new.id;
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_activity_control_fts_insert AFTER INSERT ON activity_control
+            WHEN COALESCE(new.observacoes, '') != ''
+            BEGIN
+                {refresh_from_control("new")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_activity_control_fts_update
+            AFTER UPDATE OF observacoes ON activity_control
+            WHEN old.observacoes IS NOT new.observacoes
+            BEGIN
+                {refresh_from_control("new")}
+            END
+        """)
+        cursor.execute(f"""
+            CREATE TRIGGER trg_activity_control_fts_delete AFTER DELETE ON activity_control
+            WHEN COALESCE(old.observacoes, '') != ''
+            BEGIN
+                {refresh_from_control("old")}
+            END
+        """)
+        
+        if not existing:
+            # Índice novo: popular com os dados já existentes
+            cursor.execute("""
+                INSERT INTO atividades_fts(rowid, atividade, executor, grupo, localidade, observacoes)
+                SELECT excel_data_id, atividade, executor, grupo, localidade, observacoes
+                FROM vw_atividades
+            """)
+        
+        return True
     
+    def get_data_version(self):
+        """
+        Retorna a versão atual dos dados (muda a cada escrita no Excel ou no controle)
+        
+        Returns:
+            int: Versão dos dados
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT versao FROM data_version WHERE id = 1")
+        result = cursor.fetchone()
+        conn.close()
+        return result[0] if result else 0
+
+    def get_crqs(self):
+        """
+        Retorna o cadastro de CRQs na ordem de exibição
+
+        Returns:
+            dict: {sigla: {"nome": ..., "emoji": ..., "total": ...}}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT sigla, nome, emoji, total FROM crqs ORDER BY ordem, sigla")
+        results = cursor.fetchall()
+        conn.close()
+
+        return {
+            row[0]: {"nome": row[1], "emoji": row[2], "total": row[3] or 0}
+            for row in results
+        }
+
+    def get_crq_registry(self, versao=None):
+        """
+        Retorna o cadastro de CRQs com identificador de abas pré-compilado
+
+        O cadastro fica em cache nesta instância e só é relido quando a versão dos
+        dados muda (alterações em crqs também incrementam a versão).
+
+        Args:
+            versao: Versão dos dados já conhecida (None para consultar o banco)
+
+        Returns:
+            CRQRegistry: Cadastro de CRQs
+        """
+        from modules.crq_registry import CRQRegistry
+
+        if versao is None:
+            versao = self.get_data_version()
+
+        cached = getattr(self, "_crq_registry", None)
+        if cached is not None and cached[0] == versao:
+            return cached[1]
+
+        registry = CRQRegistry(self.get_crqs())
+        self._crq_registry = (versao, registry)
+        return registry
+
+    def save_crq(self, sigla, nome=None, emoji=None, total=None, ordem=None):
+        """
+        Cadastra ou atualiza uma CRQ
+
+        Args:
+            sigla: Sigla da CRQ (identifica a aba do Excel, ex: "REDE")
+            nome: Nome de exibição (padrão: a própria sigla)
+            emoji: Emoji de exibição
+            total: Total esperado de atividades
+            ordem: Posição de exibição (padrão: ao final)
+        """
+        sigla = str(sigla).strip().upper()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        if ordem is None:
+            cursor.execute("SELECT ordem FROM crqs WHERE sigla = ?", (sigla,))
+            existing = cursor.fetchone()
+            if existing:
+                ordem = existing[0]
+            else:
+                cursor.execute("SELECT COALESCE(MAX(ordem), -1) + 1 FROM crqs")
+                ordem = cursor.fetchone()[0]
+
+        cursor.execute("""
+            INSERT INTO crqs (sigla, nome, emoji, total, ordem)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(sigla) DO UPDATE SET
+                nome = excluded.nome, emoji = excluded.emoji,
+                total = excluded.total, ordem = excluded.ordem
+        """, (sigla, (nome or sigla).strip(), emoji or "📊", int(total or 0), ordem))
+
+        conn.commit()
+        conn.close()
+
+    def delete_crq(self, sigla):
+        """
+        Remove uma CRQ do cadastro (as atividades já importadas são mantidas)
+
+        Args:
+            sigla: Sigla da CRQ
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM crqs WHERE sigla = ?", (sigla,))
+        conn.commit()
+        conn.close()
+
+    def list_janelas(self):
+        """
+        Lista as janelas de mudança cadastradas (mais recentes primeiro)
+
+        Returns:
+            list: Lista de dicts com id, nome, descricao, arquivo, data_criacao e atividades
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT j.id, j.nome, j.descricao, j.arquivo, j.data_criacao,
+                   (SELECT COUNT(*) FROM excel_data e WHERE e.janela_id = j.id) AS atividades
+            FROM janelas j
+            ORDER BY j.id DESC
+        """)
+        results = cursor.fetchall()
+        conn.close()
+
+        return [
+            {
+                "id": row[0],
+                "nome": row[1],
+                "descricao": row[2] or "",
+                "arquivo": row[3] or "",
+                "data_criacao": row[4],
+                "atividades": row[5]
+            }
+            for row in results
+        ]
+
+    def get_latest_janela_id(self):
+        """
+        Retorna o ID da janela mais recente (janela ativa padrão de uma nova sessão)
+
+        Returns:
+            int: ID da janela
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(id) FROM janelas")
+        result = cursor.fetchone()
+        conn.close()
+        return result[0] if result and result[0] is not None else DEFAULT_JANELA_ID
+
+    def create_janela(self, nome, descricao=None):
+        """
+        Cria uma nova janela de mudança
+
+        Args:
+            nome: Nome da janela (ex: "Janela 12/03")
+            descricao: Descrição opcional
+
+        Returns:
+            int: ID da janela criada
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("""
+            INSERT INTO janelas (nome, descricao) VALUES (?, ?)
+        """, (nome.strip(), descricao))
+        janela_id = cursor.lastrowid
+        conn.commit()
+        conn.close()
+        return janela_id
+
+    def set_active_janela(self, janela_id):
+        """
+        Define a janela ativa desta instância (consultas e escritas passam a usá-la)
+
+        Args:
+            janela_id: ID da janela
+        """
+        self.janela_id = int(janela_id)
+
+    @timed("db.delete_janela")
+    def delete_janela(self, janela_id):
+        """
+        Remove uma janela e todas as suas atividades (Excel e controle)
+
+        Args:
+            janela_id: ID da janela
+
+        Returns:
+            tuple: (excel_deleted, control_deleted) - número de registros deletados
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("DELETE FROM activity_control WHERE janela_id = ?", (janela_id,))
+        control_deleted = cursor.rowcount
+        cursor.execute("DELETE FROM excel_data WHERE janela_id = ?", (janela_id,))
+        excel_deleted = cursor.rowcount
+        cursor.execute("DELETE FROM janelas WHERE id = ?", (janela_id,))
+
+        # Sempre manter ao menos uma janela cadastrada
+        cursor.execute("SELECT COUNT(*) FROM janelas")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("INSERT INTO janelas (id, nome) VALUES (?, ?)",
+                           (DEFAULT_JANELA_ID, DEFAULT_JANELA_NOME))
+
+        conn.commit()
+        conn.close()
+
+        if self.janela_id == janela_id:
+            self.janela_id = self.get_latest_janela_id()
+
+        return excel_deleted, control_deleted
+
     def get_activity_control(self, seq, sequencia, excel_data_id=None):
         """
         Busca dados de controle de uma atividade específica
@@ -331,20 +839,20 @@ class DatabaseManager:
             # Buscar por excel_data_id (mais preciso quando há duplicatas)
             cursor.execute("""
                 SELECT status, horario_inicio_real, horario_fim_real, 
-                       atraso_minutos, observacoes, is_milestone, predecessoras
+                       atraso_minutos, observacoes, is_milestone, predecessoras, versao_linha
                 FROM activity_control
-                WHERE seq = ? AND sequencia = ? AND excel_data_id = ?
-            """, (seq, sequencia, excel_data_id))
+                WHERE seq = ? AND sequencia = ? AND excel_data_id = ? AND janela_id = ?
+            """, (seq, sequencia, excel_data_id, self.janela_id))
         else:
             # Buscar apenas por seq e sequencia (compatibilidade com código antigo)
             # Se houver múltiplas linhas, retorna a primeira
             cursor.execute("""
                 SELECT status, horario_inicio_real, horario_fim_real, 
-                       atraso_minutos, observacoes, is_milestone, predecessoras
+                       atraso_minutos, observacoes, is_milestone, predecessoras, versao_linha
                 FROM activity_control
-                WHERE seq = ? AND sequencia = ?
+                WHERE seq = ? AND sequencia = ? AND janela_id = ?
                 LIMIT 1
-            """, (seq, sequencia))
+            """, (seq, sequencia, self.janela_id))
         
         result = cursor.fetchone()
         conn.close()
@@ -357,14 +865,17 @@ class DatabaseManager:
                 "atraso_minutos": result[3],
                 "observacoes": result[4],
                 "is_milestone": bool(result[5]) if result[5] is not None else False,
-                "predecessoras": result[6] if result[6] else ""
+                "predecessoras": result[6] if result[6] else "",
+                "versao_linha": result[7] or 0
             }
         return None
     
+    @timed("db.save_activity_control")
     def save_activity_control(self, seq, sequencia, status=None, 
                              horario_inicio_real=None, horario_fim_real=None,
                              atraso_minutos=None, observacoes=None,
-                             is_milestone=None, predecessoras=None, excel_data_id=None):
+                             is_milestone=None, predecessoras=None, excel_data_id=None,
+                             versao_esperada=None):
         """
         Salva ou atualiza dados de controle de uma atividade
         
@@ -372,85 +883,252 @@ class DatabaseManager:
             seq: Número sequencial
             sequencia: Sequência/CRQ
             excel_data_id: ID da linha no excel_data (opcional, para identificar linha única)
+            versao_esperada: Versão da linha vista pelo editor (Versao_Linha). Se informada
+                e a linha tiver sido alterada depois disso, nada é gravado
             ... outros parâmetros ...
+            
+        Returns:
+            int: Nova versão da linha
+            
+        Raises:
+            ConflictError: Se a versão da linha não for a esperada ou se outra sessão
+                tiver criado a linha ao mesmo tempo
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         # Normalizar excel_data_id: None vira 0, mas manter 0 se fornecido explicitamente
         if excel_data_id is None:
             excel_data_id = 0
+        chave = (seq, sequencia, excel_data_id, self.janela_id)
         
-        # Verificar se já existe (sempre usar excel_data_id na busca, mesmo se for 0)
-        existing = self.get_activity_control(seq, sequencia, excel_data_id)
-        
-        if existing:
-            # Atualizar
-            updates = []
-            params = []
-            
-            if status is not None:
-                updates.append("status = ?")
-                params.append(status)
-            if horario_inicio_real is not None:
-                updates.append("horario_inicio_real = ?")
-                params.append(horario_inicio_real)
-            if horario_fim_real is not None:
-                updates.append("horario_fim_real = ?")
-                params.append(horario_fim_real)
-            if atraso_minutos is not None:
-                updates.append("atraso_minutos = ?")
-                params.append(atraso_minutos)
-            if observacoes is not None:
-                updates.append("observacoes = ?")
-                params.append(observacoes)
-            if is_milestone is not None:
-                updates.append("is_milestone = ?")
-                params.append(1 if is_milestone else 0)
-            if predecessoras is not None:
-                updates.append("predecessoras = ?")
-                params.append(predecessoras)
-            
-            updates.append("data_atualizacao = ?")
-            params.append(datetime.now().isoformat())
-            
-            # Sempre usar excel_data_id na cláusula WHERE (mesmo se for 0)
-            params.extend([seq, sequencia, excel_data_id])
-            cursor.execute(f"""
-                UPDATE activity_control
-                SET {', '.join(updates)}
-                WHERE seq = ? AND sequencia = ? AND excel_data_id = ?
-            """, params)
-        else:
-            # Inserir novo - sempre usar excel_data_id (mesmo se for 0)
+        def conflito(versao_atual):
+            return ConflictError([{
+                "seq": seq, "sequencia": sequencia, "excel_data_id": excel_data_id,
+                "versao_esperada": None if versao_esperada is None else int(versao_esperada),
+                "versao_atual": versao_atual
+            }])
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        try:
+            # Leitura da versão e escrita na mesma transação (BEGIN IMMEDIATE reserva a escrita):
+            # outra sessão não consegue gravar a linha entre a verificação e a gravação
+            cursor.execute("BEGIN IMMEDIATE")
+            # Sempre usar excel_data_id na busca, mesmo se for 0
             cursor.execute("""
-                INSERT INTO activity_control 
-                (seq, sequencia, excel_data_id, status, horario_inicio_real, horario_fim_real, 
-                 atraso_minutos, observacoes, is_milestone, predecessoras)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (seq, sequencia, excel_data_id,
-                  status or "Planejado",
-                  horario_inicio_real,
-                  horario_fim_real,
-                  atraso_minutos or 0,
-                  observacoes,
-                  1 if is_milestone else 0,
-                  predecessoras or ""))
+                SELECT COALESCE(versao_linha, 0) FROM activity_control
+                WHERE seq = ? AND sequencia = ? AND excel_data_id = ? AND janela_id = ?
+            """, chave)
+            existing = cursor.fetchone()
+            versao_atual = existing[0] if existing else 0
+            
+            if versao_esperada is not None and int(versao_esperada) != versao_atual:
+                raise conflito(versao_atual)
+            
+            if existing:
+                # Atualizar
+                updates = []
+                params = []
+                
+                if status is not None:
+                    updates.append("status = ?")
+                    params.append(status)
+                if horario_inicio_real is not None:
+                    updates.append("horario_inicio_real = ?")
+                    params.append(horario_inicio_real)
+                if horario_fim_real is not None:
+                    updates.append("horario_fim_real = ?")
+                    params.append(horario_fim_real)
+                if atraso_minutos is not None:
+                    updates.append("atraso_minutos = ?")
+                    params.append(atraso_minutos)
+                if observacoes is not None:
+                    updates.append("observacoes = ?")
+                    params.append(observacoes)
+                if is_milestone is not None:
+                    updates.append("is_milestone = ?")
+                    params.append(1 if is_milestone else 0)
+                if predecessoras is not None:
+                    updates.append("predecessoras = ?")
+                    params.append(predecessoras)
+                
+                updates.append("data_atualizacao = ?")
+                params.append(datetime.now().isoformat())
+                updates.append("versao_linha = COALESCE(versao_linha, 0) + 1")
+                
+                cursor.execute(f"""
+                    UPDATE activity_control
+                    SET {', '.join(updates)}
+                    WHERE seq = ? AND sequencia = ? AND excel_data_id = ? AND janela_id = ?
+                """, params + list(chave))
+            else:
+                # Inserir novo - sempre usar excel_data_id (mesmo se for 0). A linha nasce na
+                # versão 1: quem leu "sem controle" (versão 0) não a sobrescreve depois
+                cursor.execute("""
+                    INSERT INTO activity_control 
+                    (janela_id, seq, sequencia, excel_data_id, status, horario_inicio_real, horario_fim_real, 
+                     atraso_minutos, observacoes, is_milestone, predecessoras, versao_linha)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                """, (self.janela_id, seq, sequencia, excel_data_id,
+                      status or "Planejado",
+                      horario_inicio_real,
+                      horario_fim_real,
+                      atraso_minutos or 0,
+                      observacoes,
+                      1 if is_milestone else 0,
+                      predecessoras or ""))
+            
+            conn.commit()
+        except sqlite3.IntegrityError:
+            # Linha criada por outra gravação (ex: mesma chave em outra janela): não sobrescrever
+            conn.rollback()
+            raise conflito(None)
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
         
-        conn.commit()
+        return versao_atual + 1 if existing else 1
+    
+    def get_activities_state(self, sequencias=None):
+        """
+        Estado atual (Excel + controle) das atividades da janela ativa em uma única consulta
+        
+        Args:
+            sequencias: Lista de CRQs para filtrar (None para todas)
+            
+        Returns:
+            list: Dicts com excel_data_id, sequencia, seq, fim, status, horario_inicio_real,
+                horario_fim_real, observacoes, is_milestone, predecessoras e versao_linha
+        """
+        conn = self.get_connection()
+        conn.row_factory = sqlite3.Row
+        cursor = conn.cursor()
+        
+        query = """
+            SELECT excel_data_id, sequencia, seq, fim, status, horario_inicio_real,
+                   horario_fim_real, observacoes, is_milestone, predecessoras, versao_linha
+            FROM vw_atividades
+            WHERE janela_id = ?
+        """
+        params = [self.janela_id]
+        if sequencias:
+            query += f" AND sequencia IN ({','.join(['?'] * len(sequencias))})"
+            params.extend(sequencias)
+        
+        cursor.execute(query, params)
+        results = [dict(row) for row in cursor.fetchall()]
         conn.close()
+        return results
+    
+    @timed("db.save_activity_controls")
+    def save_activity_controls(self, registros):
+        """
+        Salva os dados de controle de várias atividades em uma única transação
+        
+        Cada registro atualiza a linha (seq, sequencia, excel_data_id) da janela ativa
+        ou a insere se ainda não existir. Em caso de erro nada é gravado.
+        
+        Args:
+            registros: Lista de dicts com seq, sequencia, excel_data_id, status,
+                horario_inicio_real, horario_fim_real, atraso_minutos, observacoes,
+                is_milestone, predecessoras e, opcionalmente, versao_esperada
+                (versão da linha lida; se a linha mudou depois disso, o lote é rejeitado)
+            
+        Returns:
+            int: Quantidade de registros gravados
+            
+        Raises:
+            ConflictError: Se alguma linha foi alterada por outra sessão (nada é gravado)
+        """
+        if not registros:
+            return 0
+        
+        agora = datetime.now().isoformat()
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        conflitos = []
+        try:
+            for registro in registros:
+                versao_esperada = registro.get("versao_esperada")
+                valores = (
+                    registro["status"],
+                    registro.get("horario_inicio_real"),
+                    registro.get("horario_fim_real"),
+                    registro.get("atraso_minutos") or 0,
+                    registro.get("observacoes"),
+                    1 if registro.get("is_milestone") else 0,
+                    registro.get("predecessoras") or ""
+                )
+                chave = (registro["seq"], registro["sequencia"], registro.get("excel_data_id") or 0)
+                
+                cursor.execute("""
+                    UPDATE activity_control
+                    SET status = ?, horario_inicio_real = ?, horario_fim_real = ?,
+                        atraso_minutos = ?, observacoes = ?, is_milestone = ?,
+                        predecessoras = ?, data_atualizacao = ?,
+                        versao_linha = COALESCE(versao_linha, 0) + 1
+                    WHERE seq = ? AND sequencia = ? AND excel_data_id = ? AND janela_id = ?
+                      AND (? IS NULL OR COALESCE(versao_linha, 0) = ?)
+                """, valores + (agora,) + chave + (self.janela_id, versao_esperada, versao_esperada))
+                atualizadas = cursor.rowcount
+                
+                if atualizadas == 0 and versao_esperada is not None:
+                    cursor.execute("""
+                        SELECT COALESCE(versao_linha, 0) FROM activity_control
+                        WHERE seq = ? AND sequencia = ? AND excel_data_id = ? AND janela_id = ?
+                    """, chave + (self.janela_id,))
+                    atual = cursor.fetchone()
+                    if atual is not None or int(versao_esperada) != 0:
+                        conflitos.append({
+                            "seq": chave[0], "sequencia": chave[1], "excel_data_id": chave[2],
+                            "versao_esperada": int(versao_esperada),
+                            "versao_atual": atual[0] if atual else None
+                        })
+                        continue
+                
+                if atualizadas == 0:
+                    # Linha nova na versão 1 (ver save_activity_control); se outra sessão
+                    # criou a mesma linha depois do UPDATE, a restrição UNIQUE acusa o conflito
+                    try:
+                        cursor.execute("""
+                            INSERT INTO activity_control
+                            (status, horario_inicio_real, horario_fim_real, atraso_minutos,
+                             observacoes, is_milestone, predecessoras, data_atualizacao,
+                             seq, sequencia, excel_data_id, janela_id, versao_linha)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, 1)
+                        """, valores + (agora,) + chave + (self.janela_id,))
+                    except sqlite3.IntegrityError:
+                        conflitos.append({
+                            "seq": chave[0], "sequencia": chave[1], "excel_data_id": chave[2],
+                            "versao_esperada": None if versao_esperada is None else int(versao_esperada),
+                            "versao_atual": None
+                        })
+            
+            if conflitos:
+                raise ConflictError(conflitos)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return len(registros)
     
+    @timed("db.get_all_activities_control")
     def get_all_activities_control(self):
-        """Retorna todos os dados de controle"""
+        """Retorna todos os dados de controle da janela ativa"""
         conn = self.get_connection()
         cursor = conn.cursor()
         
         cursor.execute("""
             SELECT seq, sequencia, excel_data_id, status, horario_inicio_real, 
                    horario_fim_real, atraso_minutos, observacoes,
-                   is_milestone, predecessoras
+                   is_milestone, predecessoras, versao_linha
             FROM activity_control
-        """)
+            WHERE janela_id = ?
+        """, (self.janela_id,))
         
         results = cursor.fetchall()
         conn.close()
@@ -473,21 +1151,201 @@ class DatabaseManager:
                 "atraso_minutos": row[6],
                 "observacoes": row[7],
                 "is_milestone": bool(row[8]) if row[8] is not None else False,
-                "predecessoras": row[9] if row[9] else ""
+                "predecessoras": row[9] if row[9] else "",
+                "versao_linha": row[10] or 0
             }
         
         return activities
-    
-    def clear_all_control_data(self):
-        """Limpa todos os dados de controle (útil para reset)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+
+    def get_status_counts(self):
+        """
+        Calcula as estatísticas do dashboard (janela ativa) diretamente no banco
+
+        Usa uma única agregação GROUP BY sequencia, status sobre a view vw_atividades,
+        sem carregar e mesclar todas as linhas. Milestones ficam fora das contagens e
+        atividades com Atraso_Minutos > 0 contam como atrasadas.
+
+        Returns:
+            dict: Estatísticas no mesmo formato de calculate_statistics
+        """
+        from modules.calculations import calculate_statistics_from_counts
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+
+        cursor.execute("""
+            SELECT sequencia, status,
+                   SUM(CASE WHEN is_milestone = 0 THEN 1 ELSE 0 END) AS atividades,
+                   SUM(is_milestone) AS milestones,
+                   SUM(CASE WHEN is_milestone = 0 AND atraso_minutos > 0
+                             AND status != 'Atrasado' THEN 1 ELSE 0 END) AS atrasadas_por_tempo
+            FROM vw_atividades
+            WHERE janela_id = ?
+            GROUP BY sequencia, status
+            ORDER BY sequencia
+        """, (self.janela_id,))
+
+        results = cursor.fetchall()
+        conn.close()
+
+        return calculate_statistics_from_counts(results)
+
+    def query_activities(self, sequencia=None, status=None, texto=None,
+                         order_by="sequencia", descending=False, limit=50, offset=0):
+        """
+        Lista atividades (Excel + controle) da janela ativa com filtros, ordenação e paginação no banco
+        
+        Args:
+            sequencia: CRQ para filtrar (None para todas)
+            status: Status para filtrar (None para todos)
+            texto: Busca textual em atividade/executor/grupo/localidade/observações
+                (FTS5 com prefixo)
+            order_by: Coluna de ordenação (chave de ACTIVITY_ORDER_COLUMNS)
+            descending: Se True, ordena de forma decrescente
+            limit: Número máximo de linhas (None para todas)
+            offset: Número de linhas a pular
+            
+        Returns:
+            tuple: (DataFrame da página, total de atividades que atendem aos filtros)
+        """
+        import pandas as pd
+        
+        where = ["janela_id = ?"]
+        params = [self.janela_id]
+        
+        if sequencia:
+            where.append("sequencia = ?")
+            params.append(sequencia)
+        
+        if status:
+            where.append("status = ?")
+            params.append(status)
+        
+        if texto and str(texto).strip():
+            fts_query = build_fts_query(texto) if self.fts_enabled else None
+            if fts_query:
+                where.append("excel_data_id IN (SELECT rowid FROM atividades_fts WHERE atividades_fts MATCH ?)")
+                params.append(fts_query)
+            else:
+                like = f"%{str(texto).strip()}%"
+                where.append("(atividade LIKE ? OR executor LIKE ? OR grupo LIKE ? "
+                             "OR localidade LIKE ? OR observacoes LIKE ?)")
+                params.extend([like] * 5)
+        
+        where_sql = f"WHERE {' AND '.join(where)}"
+        order_sql = ACTIVITY_ORDER_COLUMNS.get(order_by, ACTIVITY_ORDER_COLUMNS["sequencia"])
+        if descending:
+            order_sql = ", ".join(f"{col} DESC" for col in order_sql.split(", "))
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute(f"SELECT COUNT(*) FROM vw_atividades {where_sql}", params)
+        total = cursor.fetchone()[0]
+        
+        page_sql = ""
+        page_params = []
+        if limit is not None:
+            page_sql = "LIMIT ? OFFSET ?"
+            page_params = [int(limit), int(offset or 0)]
+        
+        cursor.execute(f"""
+            SELECT sequencia, seq, atividade, status, executor, grupo, inicio, fim,
+                   horario_inicio_real, horario_fim_real, observacoes, excel_data_id
+            FROM vw_atividades
+            {where_sql}
+            ORDER BY {order_sql}
+            {page_sql}
+        """, params + page_params)
+        rows = cursor.fetchall()
+        conn.close()
+        
+        df = pd.DataFrame(rows, columns=[
+            "CRQ", "Seq", "Atividade", "Status", "Executor", "Grupo", "Inicio", "Fim",
+            "Horario_Inicio_Real", "Horario_Fim_Real", "Observacoes", "Excel_Data_ID"
+        ])
+        df["Inicio"] = pd.to_datetime(df["Inicio"], errors='coerce')
+        df["Fim"] = pd.to_datetime(df["Fim"], errors='coerce')
         
-        cursor.execute("DELETE FROM activity_control")
+        return df, total
+
+    def search_activities(self, texto, sequencia=None, limit=50):
+        """
+        Busca textual ranqueada em atividades e observações da janela ativa (FTS5, com prefixo)
+        
+        Pesquisa em atividade, executor, grupo, localidade e observacoes. Os resultados
+        vêm ordenados por relevância (bm25), com peso maior para o nome da atividade.
+        
+        Args:
+            texto: Texto a buscar (cada termo casa por prefixo, ex: "fire" acha "firewall")
+            sequencia: CRQ para restringir a busca (None para todas)
+            limit: Número máximo de resultados
+            
+        Returns:
+            pd.DataFrame: Atividades encontradas com colunas Rank e Trecho
+        """
+        import pandas as pd
+        
+        columns = ["CRQ", "Seq", "Atividade", "Status", "Executor", "Grupo",
+                   "Observacoes", "Excel_Data_ID", "Rank", "Trecho"]
+        
+        fts_query = build_fts_query(texto)
+        if not fts_query:
+            return pd.DataFrame(columns=columns)
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        params = [fts_query, self.janela_id]
+        crq_sql = ""
+        if sequencia:
+            crq_sql = "AND v.sequencia = ?"
+            params.append(sequencia)
+        params.append(int(limit))
+        
+        if self.fts_enabled:
+            cursor.execute(f"""
+                SELECT v.sequencia, v.seq, v.atividade, v.status, v.executor, v.grupo,
+                       v.observacoes, v.excel_data_id,
+                       bm25(atividades_fts, 10.0, 2.0, 2.0, 1.0, 5.0) AS rank,
+                       snippet(atividades_fts, -1, '[', ']', '…', 10) AS trecho
+                FROM atividades_fts
+                JOIN vw_atividades v ON v.excel_data_id = atividades_fts.rowid
+                WHERE atividades_fts MATCH ? AND v.janela_id = ? {crq_sql}
+                ORDER BY rank
+                LIMIT ?
+            """, params)
+        else:
+            # Sem FTS5: busca por substring sem ranqueamento
+            like = f"%{str(texto).strip()}%"
+            cursor.execute(f"""
+                SELECT v.sequencia, v.seq, v.atividade, v.status, v.executor, v.grupo,
+                       v.observacoes, v.excel_data_id, 0 AS rank, v.atividade AS trecho
+                FROM vw_atividades v
+                WHERE (v.atividade LIKE ? OR v.executor LIKE ? OR v.grupo LIKE ?
+                       OR v.localidade LIKE ? OR v.observacoes LIKE ?)
+                  AND v.janela_id = ? {crq_sql}
+                ORDER BY v.sequencia, v.seq
+                LIMIT ?
+            """, [like] * 5 + params[1:])
+        
+        rows = cursor.fetchall()
+        conn.close()
+        
+        return pd.DataFrame(rows, columns=columns)
+
+    @timed("db.clear_all_control_data")
+    def clear_all_control_data(self):
+        """Limpa todos os dados de controle da janela ativa (útil para reset)"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("DELETE FROM activity_control WHERE janela_id = ?", (self.janela_id,))
         
         conn.commit()
         conn.close()
     
+    @timed("db.bulk_save_activities")
     def bulk_save_activities(self, activities_data):
         """Salva múltiplas atividades de uma vez"""
         conn = self.get_connection()
@@ -496,10 +1354,14 @@ class DatabaseManager:
         for activity in activities_data:
             cursor.execute("""
                 INSERT OR REPLACE INTO activity_control
-                (seq, sequencia, status, horario_inicio_real, horario_fim_real,
-                 atraso_minutos, observacoes, data_atualizacao)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                (janela_id, seq, sequencia, status, horario_inicio_real, horario_fim_real,
+                 atraso_minutos, observacoes, data_atualizacao, versao_linha)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, (
+                    SELECT COALESCE(MAX(versao_linha), -1) + 1 FROM activity_control
+                    WHERE seq = ? AND sequencia = ? AND janela_id = ?
+                ))
             """, (
+                self.janela_id,
                 activity["seq"],
                 activity["sequencia"],
                 activity.get("status", "Planejado"),
@@ -507,28 +1369,69 @@ class DatabaseManager:
                 activity.get("horario_fim_real"),
                 activity.get("atraso_minutos", 0),
                 activity.get("observacoes"),
-                datetime.now().isoformat()
+                datetime.now().isoformat(),
+                activity["seq"],
+                activity["sequencia"],
+                self.janela_id
             ))
         
         conn.commit()
         conn.close()
     
-    def save_excel_data(self, data_dict, file_name=None):
+    def _iter_excel_rows(self, data_dict, validacao=None):
         """
-        Salva dados do Excel no banco de dados
+        Normaliza as linhas do Excel para gravação no excel_data (validate_excel_data)
+        
+        Os problemas encontrados são resumidos no log; o relatório completo fica
+        disponível para a interface em validate_excel_data.
         
         Args:
             data_dict: Dicionário com dataframes de cada sequência
-            file_name: Nome do arquivo Excel (opcional)
+            validacao: Resultado de validate_excel_data(data_dict) já calculado
+                (opcional; evita validar as mesmas linhas duas vezes)
+            
+        Returns:
+            iterator: Tuplas (sequencia, seq, atividade, grupo, localidade, executor,
+                      telefone, inicio, fim, tempo)
         """
-        import pandas as pd
+        from modules.import_validation import validate_excel_data, iter_import_rows
+        
+        linhas, relatorio = validacao if validacao is not None else validate_excel_data(data_dict)
+        if not relatorio.empty:
+            log_event(
+                "importacao.problemas", logging.WARNING,
+                problemas=len(relatorio),
+                ignoradas=int((~relatorio["Gravada"].astype(bool)).sum()),
+                tipos=relatorio["Tipo"].value_counts().to_dict()
+            )
+        log_event("importacao.normalizacao", logging.DEBUG, linhas=len(linhas))
+        
+        return iter_import_rows(linhas)
+    
+    @timed("db.save_excel_data")
+    def save_excel_data(self, data_dict, file_name=None, validacao=None):
+        """
+        Salva dados do Excel na janela ativa (substitui apenas os dados desta janela)
+        
+        Todas as linhas recebem ids novos: controles gravados por excel_data_id deixam
+        de apontar para as atividades. Para revisar o planejamento de uma janela em
+        andamento, use sync_excel_data.
         
+        Args:
+            data_dict: Dicionário com dataframes de cada sequência
+            file_name: Nome do arquivo Excel (opcional, registrado na janela)
+            validacao: Resultado de validate_excel_data(data_dict), se já calculado
+        """
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Limpar dados antigos do Excel ANTES de salvar novos
-        # Isso garante que não haja dados duplicados ou antigos
-        cursor.execute("DELETE FROM excel_data")
+        # Limpar dados antigos do Excel da janela ANTES de salvar novos
+        # Isso garante que não haja dados duplicados ou antigos (outras janelas são preservadas)
+        cursor.execute("DELETE FROM excel_data WHERE janela_id = ?", (self.janela_id,))
+        if file_name:
+            cursor.execute("""
+                UPDATE janelas SET arquivo = ?, data_atualizacao = ? WHERE id = ?
+            """, (file_name, datetime.now().isoformat(), self.janela_id))
         conn.commit()
         
         # Verificar se há dados sendo salvos
@@ -536,135 +1439,147 @@ class DatabaseManager:
             conn.close()
             return 0
         
-        # Contador de registros salvos
-        total_saved = 0
-        
-        # Salvar novos dados
-        for sequencia, data in data_dict.items():
-            df = data["dataframe"]
-            print(f"DEBUG: Salvando {len(df)} registros da sequência {sequencia}")
-            
-            for idx, row in df.iterrows():
-                try:
-                    # Converter datas para string ISO
-                    inicio_str = None
-                    fim_str = None
-                    
-                    if "Inicio" in row and pd.notna(row["Inicio"]):
-                        if hasattr(row["Inicio"], 'isoformat'):
-                            inicio_str = row["Inicio"].isoformat()
-                        elif isinstance(row["Inicio"], str):
-                            inicio_str = row["Inicio"]
-                        else:
-                            inicio_str = str(row["Inicio"])
-                    
-                    if "Fim" in row and pd.notna(row["Fim"]):
-                        if hasattr(row["Fim"], 'isoformat'):
-                            fim_str = row["Fim"].isoformat()
-                        elif isinstance(row["Fim"], str):
-                            fim_str = row["Fim"]
-                        else:
-                            fim_str = str(row["Fim"])
-                    
-                    # Converter Seq para int - ser mais tolerante
-                    seq_value = None
-                    if "Seq" in row:
-                        seq_raw = row["Seq"]
-                        if pd.notna(seq_raw):
-                            try:
-                                # Tentar converter diretamente
-                                seq_value = int(seq_raw)
-                            except (ValueError, TypeError):
-                                # Tentar extrair número de string
-                                try:
-                                    seq_str = str(seq_raw).strip()
-                                    # Remover caracteres não numéricos e tentar converter
-                                    import re
-                                    numbers = re.findall(r'\d+', seq_str)
-                                    if numbers:
-                                        seq_value = int(numbers[0])
-                                    else:
-                                        # Se não conseguir, usar índice como fallback
-                                        seq_value = 999000 + total_saved
-                                        print(f"AVISO: Seq inválido '{seq_raw}' na sequência {sequencia}, usando Seq temporário {seq_value}")
-                                except Exception as e:
-                                    # Usar índice como fallback
-                                    seq_value = 999000 + total_saved
-                                    print(f"AVISO: Erro ao processar Seq '{seq_raw}' na sequência {sequencia}: {e}, usando Seq temporário {seq_value}")
-                        else:
-                            # Seq é NaN, verificar se tem Atividade
-                            atividade = str(row.get("Atividade", "")).strip()
-                            if atividade and atividade != "":
-                                # Tem Atividade mas não Seq, gerar Seq temporário
-                                seq_value = 999000 + total_saved
-                                print(f"AVISO: Linha sem Seq mas com Atividade '{atividade[:50]}...' na sequência {sequencia}, usando Seq temporário {seq_value}")
-                            else:
-                                # Sem Seq e sem Atividade, pular
-                                print(f"AVISO: Linha sem Seq e sem Atividade na sequência {sequencia}, linha pulada")
-                                continue
-                    
-                    if seq_value is None:
-                        print(f"AVISO: Não foi possível determinar Seq para linha na sequência {sequencia}, linha pulada")
-                        continue
-                    
-                    # Validar que temos pelo menos Seq e Atividade
-                    atividade = str(row.get("Atividade", "")).strip()
-                    if not atividade or atividade == "":
-                        print(f"AVISO: Linha com Seq {seq_value} mas sem Atividade na sequência {sequencia}, linha pulada")
-                        continue
-                    
-                    # IMPORTANTE: Cada linha do Excel é única, mesmo que tenha o mesmo Seq
-                    # Não usar UNIQUE constraint, permitir múltiplas linhas com mesmo (sequencia, seq)
-                    # A chave primária 'id' garante unicidade de cada linha
-                    
-                    # Inserir novo registro (sempre INSERT, não UPDATE)
-                    # Como limpamos a tabela antes, não há risco de duplicatas de importação anterior
-                    cursor.execute("""
-                        INSERT INTO excel_data
-                        (sequencia, seq, atividade, grupo, localidade, executor, 
-                         telefone, inicio, fim, tempo)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    """, (
-                        sequencia,
-                        seq_value,
-                            atividade,
-                            str(row.get("Grupo", "")),
-                            str(row.get("Localidade", "")),
-                            str(row.get("Executor", "")),
-                            str(row.get("Telefone", "")),
-                            inicio_str,
-                            fim_str,
-                            float(row.get("Tempo", 0)) if pd.notna(row.get("Tempo", 0)) else 0
-                        ))
-                    total_saved += 1
-                except Exception as e:
-                    # Log do erro mas continua
-                    import traceback
-                    print(f"ERRO ao salvar linha {row.get('Seq', 'N/A')} da sequência {sequencia}: {e}")
-                    print(traceback.format_exc())
-                    continue
-            
-            print(f"DEBUG: Processados {total_saved} registros até agora da sequência {sequencia}")
+        # IMPORTANTE: Cada linha do Excel é única, mesmo que tenha o mesmo Seq
+        # Não usar UNIQUE constraint, permitir múltiplas linhas com mesmo (sequencia, seq)
+        # A chave primária 'id' garante unicidade de cada linha
+        # Como limpamos a tabela antes, não há risco de duplicatas de importação anterior
+        cursor.executemany("""
+            INSERT INTO excel_data
+            (janela_id, sequencia, seq, atividade, grupo, localidade, executor, 
+             telefone, inicio, fim, tempo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ((self.janela_id,) + linha for linha in self._iter_excel_rows(data_dict, validacao)))
         
         # Fazer commit de todos os registros de uma vez
         conn.commit()
         
         # Verificar quantos registros foram realmente salvos
-        cursor.execute("SELECT COUNT(*) FROM excel_data")
+        cursor.execute("SELECT COUNT(*) FROM excel_data WHERE janela_id = ?", (self.janela_id,))
         actual_count = cursor.fetchone()[0]
-        print(f"DEBUG: Total de registros realmente salvos no banco: {actual_count}")
-        
-        if actual_count != total_saved:
-            print(f"AVISO: Discrepância detectada! Processados {total_saved} mas salvos {actual_count}")
+        log_event("importacao.completa", janela_id=self.janela_id, linhas=actual_count)
         
         conn.close()
         
         # Retornar o número real de registros salvos, não o contador
         return actual_count
     
+    @timed("db.sync_excel_data")
+    def sync_excel_data(self, data_dict, file_name=None, validacao=None):
+        """
+        Reimporta um planejamento revisado aplicando apenas as diferenças (janela ativa)
+        
+        As linhas são casadas pela impressão digital (sequencia, seq, atividade); linhas
+        repetidas com a mesma impressão são casadas na ordem em que aparecem. Linhas
+        casadas mantêm o id (e, portanto, o controle: status, horários, observações) e
+        só são atualizadas se algum campo mudou; linhas novas são inseridas (com controle
+        "Planejado") e as que sumiram do planejamento são removidas junto com seus controles.
+        
+        Args:
+            data_dict: Dicionário com dataframes de cada sequência
+            file_name: Nome do arquivo Excel (opcional, registrado na janela)
+            validacao: Resultado de validate_excel_data(data_dict), se já calculado
+            
+        Returns:
+            dict: Contagens {"inseridas", "atualizadas", "removidas", "inalteradas"}
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("""
+            SELECT id, sequencia, seq, atividade, grupo, localidade, executor,
+                   telefone, inicio, fim, tempo
+            FROM excel_data
+            WHERE janela_id = ?
+            ORDER BY id
+        """, (self.janela_id,))
+        
+        # Impressão digital -> linhas atuais, na ordem de inserção
+        existentes = {}
+        for row in cursor.fetchall():
+            existentes.setdefault((row[1], row[2], row[3]), []).append(row)
+        
+        inserir = []
+        atualizar = []
+        inalteradas = 0
+        
+        def comparavel(valores):
+            return tuple(None if valor is None else str(valor) for valor in valores)
+        
+        for linha in self._iter_excel_rows(data_dict or {}, validacao):
+            candidatas = existentes.get(linha[:3])
+            if not candidatas:
+                inserir.append((self.janela_id,) + linha)
+                continue
+            
+            atual = candidatas.pop(0)
+            # Comparar como texto: as colunas são TEXT (ex: tempo 30 é gravado como "30.0")
+            if comparavel(atual[4:]) == comparavel(linha[3:]):
+                inalteradas += 1
+            else:
+                atualizar.append(linha[3:] + (atual[0],))
+        
+        remover = [(row[0],) for candidatas in existentes.values() for row in candidatas]
+        
+        try:
+            if atualizar:
+                cursor.executemany("""
+                    UPDATE excel_data
+                    SET grupo = ?, localidade = ?, executor = ?, telefone = ?,
+                        inicio = ?, fim = ?, tempo = ?
+                    WHERE id = ?
+                """, atualizar)
+            if remover:
+                cursor.executemany("DELETE FROM activity_control WHERE excel_data_id = ?", remover)
+                cursor.executemany("DELETE FROM excel_data WHERE id = ?", remover)
+            if inserir:
+                cursor.executemany("""
+                    INSERT INTO excel_data
+                    (janela_id, sequencia, seq, atividade, grupo, localidade, executor,
+                     telefone, inicio, fim, tempo)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, inserir)
+                # Controle "Planejado" das linhas novas (as mantidas já têm o seu);
+                # sem Grupo = milestone, como na mesclagem
+                cursor.execute("""
+                    INSERT INTO activity_control
+                    (janela_id, seq, sequencia, excel_data_id, status, atraso_minutos,
+                     is_milestone, predecessoras)
+                    SELECT e.janela_id, e.seq, e.sequencia, e.id, 'Planejado', 0,
+                           CASE WHEN TRIM(COALESCE(e.grupo, '')) IN ('', 'nan') THEN 1 ELSE 0 END, ''
+                    FROM excel_data e
+                    WHERE e.janela_id = ?
+                      AND NOT EXISTS (
+                          SELECT 1 FROM activity_control ac
+                          WHERE ac.excel_data_id = e.id AND ac.janela_id = e.janela_id
+                      )
+                """, (self.janela_id,))
+            if file_name:
+                cursor.execute("""
+                    UPDATE janelas SET arquivo = ?, data_atualizacao = ? WHERE id = ?
+                """, (file_name, datetime.now().isoformat(), self.janela_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        log_event(
+            "importacao.incremental", janela_id=self.janela_id, inseridas=len(inserir),
+            atualizadas=len(atualizar), removidas=len(remover), inalteradas=inalteradas
+        )
+        
+        return {
+            "inseridas": len(inserir),
+            "atualizadas": len(atualizar),
+            "removidas": len(remover),
+            "inalteradas": inalteradas
+        }
+    
+    @timed("db.load_excel_data")
     def load_excel_data(self):
         """
-        Carrega dados do Excel salvos no banco de dados
+        Carrega dados do Excel da janela ativa salvos no banco de dados
         
         Returns:
             dict: Dicionário com dataframes de cada sequência ou None se não houver dados
@@ -679,8 +1594,9 @@ class DatabaseManager:
             SELECT id, sequencia, seq, atividade, grupo, localidade, executor, 
                    telefone, inicio, fim, tempo
             FROM excel_data
+            WHERE janela_id = ?
             ORDER BY sequencia, seq
-        """)
+        """, (self.janela_id,))
         
         results = cursor.fetchall()
         conn.close()
@@ -753,32 +1669,34 @@ class DatabaseManager:
         
         return data_dict if data_dict else None
     
+    @timed("db.clear_all_data")
     def clear_all_data(self):
         """
-        Limpa todos os dados do banco (Excel e controle)
+        Limpa todos os dados da janela ativa (Excel e controle); outras janelas são preservadas
         
         Returns:
             tuple: (excel_deleted, control_deleted) - número de registros deletados
         """
         conn = self.get_connection()
         cursor = conn.cursor()
+        janela = (self.janela_id,)
         
         # Contar registros antes de deletar
-        cursor.execute("SELECT COUNT(*) FROM excel_data")
+        cursor.execute("SELECT COUNT(*) FROM excel_data WHERE janela_id = ?", janela)
         excel_count = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM activity_control")
+        cursor.execute("SELECT COUNT(*) FROM activity_control WHERE janela_id = ?", janela)
         control_count = cursor.fetchone()[0]
         
-        # Deletar todos os dados
-        cursor.execute("DELETE FROM excel_data")
-        cursor.execute("DELETE FROM activity_control")
+        # Deletar todos os dados da janela
+        cursor.execute("DELETE FROM excel_data WHERE janela_id = ?", janela)
+        cursor.execute("DELETE FROM activity_control WHERE janela_id = ?", janela)
         
         # Verificar se foi deletado
-        cursor.execute("SELECT COUNT(*) FROM excel_data")
+        cursor.execute("SELECT COUNT(*) FROM excel_data WHERE janela_id = ?", janela)
         excel_remaining = cursor.fetchone()[0]
         
-        cursor.execute("SELECT COUNT(*) FROM activity_control")
+        cursor.execute("SELECT COUNT(*) FROM activity_control WHERE janela_id = ?", janela)
         control_remaining = cursor.fetchone()[0]
         
         conn.commit()
@@ -788,7 +1706,7 @@ class DatabaseManager:
     
     def export_all_data(self):
         """
-        Exporta todos os dados do banco (Excel + controle) para um formato JSON
+        Exporta todos os dados da janela ativa (Excel + controle) para um formato JSON
         
         Returns:
             dict: Dicionário com todos os dados exportados
@@ -803,8 +1721,9 @@ class DatabaseManager:
             SELECT sequencia, seq, atividade, grupo, localidade, executor, 
                    telefone, inicio, fim, tempo
             FROM excel_data
+            WHERE janela_id = ?
             ORDER BY sequencia, seq
-        """)
+        """, (self.janela_id,))
         excel_rows = cursor.fetchall()
         
         excel_data = []
@@ -828,8 +1747,9 @@ class DatabaseManager:
                    atraso_minutos, observacoes, is_milestone, predecessoras,
                    data_criacao, data_atualizacao
             FROM activity_control
+            WHERE janela_id = ?
             ORDER BY sequencia, seq
-        """)
+        """, (self.janela_id,))
         control_rows = cursor.fetchall()
         
         control_data = []
@@ -848,12 +1768,19 @@ class DatabaseManager:
                 "data_atualizacao": row[10]
             })
         
+        cursor.execute("SELECT nome, descricao FROM janelas WHERE id = ?", (self.janela_id,))
+        janela_row = cursor.fetchone()
+        
         conn.close()
         
         # Criar estrutura de exportação
         export_data = {
             "version": "1.0",
             "export_date": datetime.now().isoformat(),
+            "janela": {
+                "nome": janela_row[0] if janela_row else "",
+                "descricao": janela_row[1] if janela_row else ""
+            },
             "excel_data": excel_data,
             "control_data": control_data,
             "metadata": {
@@ -864,9 +1791,10 @@ class DatabaseManager:
         
         return export_data
     
+    @timed("db.import_all_data")
     def import_all_data(self, import_data):
         """
-        Importa todos os dados do formato JSON para o banco
+        Importa todos os dados do formato JSON para a janela ativa (substitui os dados dela)
         
         Args:
             import_data: Dicionário com dados exportados
@@ -878,9 +1806,9 @@ class DatabaseManager:
             conn = self.get_connection()
             cursor = conn.cursor()
             
-            # Limpar dados existentes
-            cursor.execute("DELETE FROM excel_data")
-            cursor.execute("DELETE FROM activity_control")
+            # Limpar dados existentes da janela
+            cursor.execute("DELETE FROM excel_data WHERE janela_id = ?", (self.janela_id,))
+            cursor.execute("DELETE FROM activity_control WHERE janela_id = ?", (self.janela_id,))
             
             excel_imported = 0
             control_imported = 0
@@ -891,10 +1819,11 @@ class DatabaseManager:
                     try:
                         cursor.execute("""
                             INSERT INTO excel_data
-                            (sequencia, seq, atividade, grupo, localidade, executor, 
+                            (janela_id, sequencia, seq, atividade, grupo, localidade, executor, 
                              telefone, inicio, fim, tempo)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                         """, (
+                            self.janela_id,
                             row.get("sequencia"),
                             row.get("seq"),
                             row.get("atividade", ""),
@@ -907,8 +1836,8 @@ class DatabaseManager:
                             row.get("tempo", "")
                         ))
                         excel_imported += 1
-                    except Exception as e:
-                        print(f"Erro ao importar linha Excel: {e}")
+                    except Exception:
+                        log_exception("importacao.linha_excel.erro", seq=row.get("seq"), sequencia=row.get("sequencia"))
                         continue
             
             # Importar dados de controle
@@ -917,11 +1846,12 @@ class DatabaseManager:
                     try:
                         cursor.execute("""
                             INSERT INTO activity_control
-                            (seq, sequencia, status, horario_inicio_real, horario_fim_real,
+                            (janela_id, seq, sequencia, status, horario_inicio_real, horario_fim_real,
                              atraso_minutos, observacoes, is_milestone, predecessoras,
                              data_criacao, data_atualizacao)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
                         """, (
+                            self.janela_id,
                             row.get("seq"),
                             row.get("sequencia"),
                             row.get("status", "Planejado"),
@@ -935,8 +1865,8 @@ class DatabaseManager:
                             row.get("data_atualizacao")
                         ))
                         control_imported += 1
-                    except Exception as e:
-                        print(f"Erro ao importar linha controle: {e}")
+                    except Exception:
+                        log_exception("importacao.linha_controle.erro", seq=row.get("seq"), sequencia=row.get("sequencia"))
                         continue
             
             conn.commit()
@@ -944,6 +1874,476 @@ class DatabaseManager:
             
             return excel_imported, control_imported, True
             
-        except Exception as e:
-            print(f"Erro ao importar dados: {e}")
-            return 0, 0, False
\ No newline at end of file
+        except Exception:
+            log_exception("importacao.backup.erro", janela_id=self.janela_id)
+            return 0, 0, False
+    
+    def export_backup_stream(self, destino, lote=BACKUP_LOTE):
+        """
+        Exporta a janela ativa em NDJSON compactado (gzip), gravando linha a linha
+        
+        Formato: uma linha JSON por registro, com "tipo" = "cabecalho", "excel",
+        "controle" e "rodape" (contagens, para conferir se o arquivo está completo).
+        Linhas "excel" levam o id de origem e controles o excel_data_id correspondente,
+        para que a importação religue cada controle à sua atividade (mesmo com Seq
+        repetido na CRQ). As consultas são lidas em lotes (fetchmany), então a
+        memória não cresce com o tamanho do histórico.
+        
+        Args:
+            destino: Arquivo binário aberto para escrita (ex: tempfile, BytesIO)
+            lote: Número de linhas lidas do banco por vez
+            
+        Returns:
+            tuple: (excel_count, control_count)
+        """
+        import gzip
+        import json
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        cursor.execute("SELECT nome, descricao FROM janelas WHERE id = ?", (self.janela_id,))
+        janela_row = cursor.fetchone()
+        
+        consultas = [
+            ("excel", ["id", "sequencia", "seq", "atividade", "grupo", "localidade", "executor",
+                       "telefone", "inicio", "fim", "tempo"], """
+                SELECT id, sequencia, seq, atividade, grupo, localidade, executor,
+                       telefone, inicio, fim, tempo
+                FROM excel_data
+                WHERE janela_id = ?
+                ORDER BY sequencia, seq
+            """),
+            ("controle", ["seq", "sequencia", "excel_data_id", "status", "horario_inicio_real",
+                          "horario_fim_real", "atraso_minutos", "observacoes", "is_milestone",
+                          "predecessoras", "data_criacao", "data_atualizacao", "versao_linha"], """
+                SELECT seq, sequencia, excel_data_id, status, horario_inicio_real, horario_fim_real,
+                       atraso_minutos, observacoes, is_milestone, predecessoras,
+                       data_criacao, data_atualizacao, versao_linha
+                FROM activity_control
+                WHERE janela_id = ?
+                ORDER BY sequencia, seq
+            """)
+        ]
+        contagens = {"excel": 0, "controle": 0}
+        
+        try:
+            with gzip.GzipFile(fileobj=destino, mode="wb") as gz:
+                def escrever(registro):
+                    gz.write(json.dumps(registro, default=str, ensure_ascii=False).encode("utf-8") + b"\n")
+                
+                escrever({
+                    "tipo": "cabecalho",
+                    "version": BACKUP_STREAM_VERSION,
+                    "export_date": datetime.now().isoformat(),
+                    "janela": {
+                        "nome": janela_row[0] if janela_row else "",
+                        "descricao": janela_row[1] if janela_row else ""
+                    }
+                })
+                
+                for tipo, colunas, sql in consultas:
+                    cursor.execute(sql, (self.janela_id,))
+                    while True:
+                        rows = cursor.fetchmany(lote)
+                        if not rows:
+                            break
+                        for row in rows:
+                            registro = dict(zip(colunas, row))
+                            if tipo == "controle":
+                                registro["is_milestone"] = bool(registro["is_milestone"])
+                            escrever({"tipo": tipo, **registro})
+                        contagens[tipo] += len(rows)
+                
+                escrever({
+                    "tipo": "rodape",
+                    "excel_count": contagens["excel"],
+                    "control_count": contagens["controle"]
+                })
+        finally:
+            conn.close()
+        
+        return contagens["excel"], contagens["controle"]
+    
+    @timed("db.import_backup_stream")
+    def import_backup_stream(self, origem, lote=BACKUP_LOTE):
+        """
+        Importa um backup NDJSON compactado (export_backup_stream) para a janela ativa
+        
+        Substitui os dados da janela em uma única transação: o arquivo é lido linha
+        a linha e gravado com executemany a cada lote. Se o arquivo estiver truncado
+        (sem rodapé ou com contagens divergentes), nada é gravado.
+        
+        As linhas Excel recebem ids novos (atribuídos aqui, em sequência) e cada
+        controle é religado pelo mapa id de origem -> id novo. Controles sem
+        correspondência (backups antigos, sem ids) ficam sem excel_data_id e
+        voltam a ser casados por seq + sequencia.
+        
+        Args:
+            origem: Arquivo binário aberto para leitura (ex: UploadedFile do Streamlit)
+            lote: Número de linhas gravadas por executemany
+            
+        Returns:
+            tuple: (excel_imported, control_imported)
+            
+        Raises:
+            ValueError: Se o arquivo não for um backup válido ou estiver incompleto
+        """
+        import gzip
+        import json
+        
+        sql_excel = """
+            INSERT INTO excel_data
+            (id, janela_id, sequencia, seq, atividade, grupo, localidade, executor,
+             telefone, inicio, fim, tempo)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        sql_controle = """
+            INSERT INTO activity_control
+            (janela_id, seq, sequencia, excel_data_id, status, horario_inicio_real, horario_fim_real,
+             atraso_minutos, observacoes, is_milestone, predecessoras,
+             data_criacao, data_atualizacao, versao_linha)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """
+        
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        lotes = {"excel": [], "controle": []}
+        contagens = {"excel": 0, "controle": 0}
+        rodape = None
+        # id de origem (no backup) -> id novo da linha Excel
+        ids_excel = {}
+        proximo_id = None
+        
+        def gravar(tipo):
+            if lotes[tipo]:
+                cursor.executemany(sql_excel if tipo == "excel" else sql_controle, lotes[tipo])
+                contagens[tipo] += len(lotes[tipo])
+                lotes[tipo] = []
+        
+        try:
+            with gzip.GzipFile(fileobj=origem, mode="rb") as gz:
+                for numero, linha in enumerate(gz, start=1):
+                    if not linha.strip():
+                        continue
+                    try:
+                        row = json.loads(linha)
+                    except json.JSONDecodeError:
+                        raise ValueError(f"Linha {numero} do backup não é um JSON válido")
+                    
+                    tipo = row.get("tipo")
+                    if numero == 1:
+                        if tipo != "cabecalho":
+                            raise ValueError("Arquivo não é um backup em streaming (cabeçalho ausente)")
+                        cursor.execute("DELETE FROM excel_data WHERE janela_id = ?", (self.janela_id,))
+                        cursor.execute("DELETE FROM activity_control WHERE janela_id = ?", (self.janela_id,))
+                        # Ids novos após o maior já usado (AUTOINCREMENT não reutiliza ids)
+                        cursor.execute("""
+                            SELECT MAX(COALESCE((SELECT MAX(id) FROM excel_data), 0),
+                                       COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'excel_data'), 0))
+                        """)
+                        proximo_id = cursor.fetchone()[0] + 1
+                        continue
+                    
+                    if tipo == "excel":
+                        if row.get("id") is not None:
+                            ids_excel[row["id"]] = proximo_id
+                        lotes["excel"].append((
+                            proximo_id,
+                            self.janela_id,
+                            row.get("sequencia"),
+                            row.get("seq"),
+                            row.get("atividade", ""),
+                            row.get("grupo", ""),
+                            row.get("localidade", ""),
+                            row.get("executor", ""),
+                            row.get("telefone", ""),
+                            row.get("inicio"),
+                            row.get("fim"),
+                            row.get("tempo", "")
+                        ))
+                        proximo_id += 1
+                    elif tipo == "controle":
+                        lotes["controle"].append((
+                            self.janela_id,
+                            row.get("seq"),
+                            row.get("sequencia"),
+                            ids_excel.get(row.get("excel_data_id")),
+                            row.get("status", "Planejado"),
+                            row.get("horario_inicio_real"),
+                            row.get("horario_fim_real"),
+                            row.get("atraso_minutos", 0),
+                            row.get("observacoes"),
+                            1 if row.get("is_milestone", False) else 0,
+                            row.get("predecessoras"),
+                            row.get("data_criacao"),
+                            row.get("data_atualizacao"),
+                            row.get("versao_linha") or 0
+                        ))
+                    elif tipo == "rodape":
+                        rodape = row
+                        continue
+                    else:
+                        continue
+                    
+                    if len(lotes[tipo]) >= lote:
+                        gravar(tipo)
+            
+            gravar("excel")
+            gravar("controle")
+            
+            if rodape is None:
+                raise ValueError("Backup incompleto (rodapé ausente): o arquivo pode estar truncado")
+            if (rodape.get("excel_count"), rodape.get("control_count")) != (contagens["excel"], contagens["controle"]):
+                raise ValueError(
+                    f"Backup inconsistente: rodapé indica {rodape.get('excel_count')} registros Excel e "
+                    f"{rodape.get('control_count')} controles, mas {contagens['excel']} e "
+                    f"{contagens['controle']} foram lidos"
+                )
+            
+            conn.commit()
+        except (OSError, EOFError) as e:
+            conn.rollback()
+            raise ValueError(f"Arquivo de backup corrompido ou não compactado: {e}")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        
+        return contagens["excel"], contagens["controle"]
+    
+    @staticmethod
+    def _file_checksum(caminho):
+        """Calcula o SHA-256 de um arquivo lendo em blocos"""
+        import hashlib
+        
+        sha = hashlib.sha256()
+        with open(caminho, "rb") as arquivo:
+            for bloco in iter(lambda: arquivo.read(1024 * 1024), b""):
+                sha.update(bloco)
+        return sha.hexdigest()
+    
+    def create_snapshot(self, destino_dir=None, manter=BACKUP_SNAPSHOT_MANTER,
+                        paginas=BACKUP_SNAPSHOT_PAGINAS, rotacionar=True):
+        """
+        Cria um snapshot do banco inteiro (todas as janelas) com a API de backup do SQLite
+        
+        A cópia é feita por páginas, em passos de `paginas`: entre um passo e outro
+        o banco fica livre para as demais sessões gravarem. O snapshot preserva
+        índices, ids (excel_data_id) e todas as colunas. Ao final é gravado o
+        checksum (arquivo .sha256 ao lado do snapshot).
+        
+        Args:
+            destino_dir: Pasta dos snapshots (padrão: BACKUP_DIR)
+            manter: Quantos snapshots manter na rotação
+            paginas: Páginas copiadas por passo (-1 copia tudo de uma vez)
+            rotacionar: Se True, remove os snapshots mais antigos além de `manter`
+            
+        Returns:
+            dict: {"arquivo", "caminho", "tamanho", "checksum", "data"}
+        """
+        destino_dir = destino_dir or BACKUP_DIR
+        os.makedirs(destino_dir, exist_ok=True)
+        
+        agora = datetime.now()
+        nome = f"snapshot_{agora.strftime('%Y%m%d_%H%M%S_%f')}.db"
+        caminho = os.path.join(destino_dir, nome)
+        temporario = caminho + ".tmp"
+        
+        origem = self.get_connection()
+        destino = sqlite3.connect(temporario)
+        try:
+            origem.backup(destino, pages=paginas, sleep=0.005)
+        except Exception:
+            destino.close()
+            if os.path.exists(temporario):
+                os.remove(temporario)
+            raise
+        finally:
+            origem.close()
+        destino.close()
+        
+        checksum = self._file_checksum(temporario)
+        # Renomear só depois de completo: um snapshot listado nunca está pela metade
+        os.replace(temporario, caminho)
+        with open(caminho + ".sha256", "w", encoding="utf-8") as arquivo:
+            arquivo.write(f"{checksum}  {nome}\n")
+        
+        if rotacionar:
+            self.rotate_snapshots(destino_dir, manter)
+        
+        return {
+            "arquivo": nome,
+            "caminho": caminho,
+            "tamanho": os.path.getsize(caminho),
+            "checksum": checksum,
+            "data": agora
+        }
+    
+    def get_database_stats(self):
+        """
+        Tamanho do banco em disco e número de linhas das tabelas principais
+
+        Returns:
+            dict: {"arquivo_bytes", "wal_bytes", "paginas", "pagina_bytes",
+                   "paginas_livres", "fts_disponivel", "linhas": {tabela: n}}
+        """
+        arquivo_bytes = os.path.getsize(self.db_path) if os.path.exists(self.db_path) else 0
+        wal = f"{self.db_path}-wal"
+        wal_bytes = os.path.getsize(wal) if os.path.exists(wal) else 0
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute("PRAGMA page_count")
+        paginas = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        pagina_bytes = cursor.fetchone()[0]
+        cursor.execute("PRAGMA freelist_count")
+        paginas_livres = cursor.fetchone()[0]
+
+        linhas = {}
+        for tabela in ("janelas", "excel_data", "activity_control", "crqs"):
+            cursor.execute(f"SELECT COUNT(*) FROM {tabela}")
+            linhas[tabela] = cursor.fetchone()[0]
+        conn.close()
+
+        return {
+            "arquivo_bytes": arquivo_bytes,
+            "wal_bytes": wal_bytes,
+            "paginas": paginas,
+            "pagina_bytes": pagina_bytes,
+            "paginas_livres": paginas_livres,
+            "fts_disponivel": self.fts_enabled,
+            "linhas": linhas,
+        }
+    
+    def list_snapshots(self, destino_dir=None):
+        """
+        Lista os snapshots disponíveis, do mais recente para o mais antigo
+        
+        Args:
+            destino_dir: Pasta dos snapshots (padrão: BACKUP_DIR)
+            
+        Returns:
+            list: Lista de dicts com arquivo, caminho, tamanho e data
+        """
+        destino_dir = destino_dir or BACKUP_DIR
+        if not os.path.isdir(destino_dir):
+            return []
+        
+        snapshots = []
+        for nome in os.listdir(destino_dir):
+            if not (nome.startswith("snapshot_") and nome.endswith(".db")):
+                continue
+            caminho = os.path.join(destino_dir, nome)
+            estado = os.stat(caminho)
+            snapshots.append({
+                "arquivo": nome,
+                "caminho": caminho,
+                "tamanho": estado.st_size,
+                "data": datetime.fromtimestamp(estado.st_mtime)
+            })
+        
+        # O nome carrega o horário de criação (ordenável)
+        snapshots.sort(key=lambda snapshot: snapshot["arquivo"], reverse=True)
+        return snapshots
+    
+    def rotate_snapshots(self, destino_dir=None, manter=BACKUP_SNAPSHOT_MANTER):
+        """
+        Remove os snapshots mais antigos, mantendo os `manter` mais recentes
+        
+        Args:
+            destino_dir: Pasta dos snapshots (padrão: BACKUP_DIR)
+            manter: Quantos snapshots manter
+            
+        Returns:
+            int: Número de snapshots removidos
+        """
+        removidos = 0
+        for snapshot in self.list_snapshots(destino_dir)[max(manter, 1):]:
+            for caminho in (snapshot["caminho"], snapshot["caminho"] + ".sha256"):
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+            removidos += 1
+        return removidos
+    
+    def verify_snapshot(self, caminho):
+        """
+        Confere o checksum de um snapshot com o gravado na criação
+        
+        Args:
+            caminho: Caminho do arquivo de snapshot
+            
+        Returns:
+            bool: True se o arquivo está íntegro
+            
+        Raises:
+            ValueError: Se o snapshot ou o arquivo de checksum não existir
+        """
+        if not os.path.exists(caminho):
+            raise ValueError(f"Snapshot não encontrado: {caminho}")
+        if not os.path.exists(caminho + ".sha256"):
+            raise ValueError(f"Checksum do snapshot não encontrado: {os.path.basename(caminho)}.sha256")
+        
+        with open(caminho + ".sha256", encoding="utf-8") as arquivo:
+            conteudo = arquivo.read().split()
+        
+        return bool(conteudo) and self._file_checksum(caminho) == conteudo[0]
+    
+    @timed("db.restore_snapshot")
+    def restore_snapshot(self, caminho, paginas=-1):
+        """
+        Restaura o banco inteiro a partir de um snapshot (cópia por páginas, sem reinserir linhas)
+        
+        Antes de restaurar, o checksum é conferido e um snapshot do estado atual é
+        criado (para desfazer a restauração, se necessário). A versão dos dados é
+        avançada para que todas as sessões recarreguem.
+        
+        Args:
+            caminho: Caminho do arquivo de snapshot
+            paginas: Páginas copiadas por passo (-1 copia tudo de uma vez, mais rápido)
+            
+        Returns:
+            dict: Snapshot de segurança criado antes da restauração
+            
+        Raises:
+            ValueError: Se o snapshot não existir ou o checksum não conferir
+        """
+        if not self.verify_snapshot(caminho):
+            raise ValueError(f"Checksum não confere: o snapshot {os.path.basename(caminho)} está corrompido")
+        
+        # Sem rotação aqui: o snapshot escolhido pode ser o mais antigo da pasta
+        destino_dir = os.path.dirname(caminho)
+        seguranca = self.create_snapshot(destino_dir, rotacionar=False)
+        versao_anterior = self.get_data_version()
+        
+        origem = sqlite3.connect(caminho)
+        destino = self.get_connection()
+        try:
+            origem.backup(destino, pages=paginas)
+        finally:
+            origem.close()
+            destino.close()
+        
+        # Snapshots antigos podem ter esquema anterior: aplicar as migrações
+        self.init_database()
+        
+        # A versão restaurada pode ser menor que a atual: avançar além das duas,
+        # senão sessões com a versão atual não perceberiam a troca dos dados
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(
+            "UPDATE data_version SET versao = MAX(versao, ?) + 1 WHERE id = 1",
+            (versao_anterior,)
+        )
+        conn.commit()
+        conn.close()
+        
+        self._crq_registry = None
+        from modules.cache import invalidate_shared_data_version
+        invalidate_shared_data_version(self.db_path)
+        
+        self.rotate_snapshots(destino_dir)
+        return seguranca
@@ -0,0 +1,182 @@
+"""
+Módulo de projeção de exibição: colunas formatadas (datas, atraso, milestone) para as tabelas
+"""
+import numpy as np
+import pandas as pd
+from config import DATE_FORMAT
+from modules.cache import VersionedCache, session_data_key
+
+
+# Colunas exibidas nas tabelas (sem colunas sensíveis: Executor, Localidade, Telefone)
+DISPLAY_COLUMNS = [
+    "Seq", "Atividade", "CRQ", "Grupo", "Status",
+    "Inicio", "Fim",
+    "Horario_Inicio_Real", "Horario_Fim_Real",
+    "Is_Milestone",
+    "Tempo", "Atraso_Minutos", "Observacoes", "Predecessoras"
+]
+
+# Colunas convertidas para texto (evita tipos mistos no PyArrow)
+STRING_COLUMNS = ["Telefone", "Grupo", "Localidade", "Executor", "Tempo", "Atividade", "Observacoes", "Predecessoras"]
+
+# Projeções por (janela, versão dos dados), compartilhadas entre abas e sessões
+display_cache = VersionedCache("display_frames", max_entries=8)
+
+
+def to_display_string(serie):
+    """
+    Converte uma coluna para texto de exibição (versão vetorizada do safe_str_convert)
+
+    Vazios viram "", números inteiros perdem o ".0" (ex: 5.0 -> "5").
+
+    Args:
+        serie: pd.Series
+
+    Returns:
+        pd.Series: Coluna de strings (dtype object)
+    """
+    if pd.api.types.is_bool_dtype(serie):
+        return serie.astype(str).astype(object)
+
+    if pd.api.types.is_numeric_dtype(serie):
+        numeros = serie.astype("Float64")
+        texto = numeros.astype(str).astype(object)
+        inteiros = (numeros.notna() & (numeros % 1 == 0)).fillna(False).to_numpy(dtype=bool)
+        texto[inteiros] = numeros[inteiros].astype("Int64").astype(str).astype(object)
+        return texto.where(numeros.notna().to_numpy(dtype=bool), "")
+
+    texto = serie.astype(object).where(serie.notna(), "")
+    # Colunas object podem trazer números misturados a textos (ex: Tempo do Excel)
+    numericos = texto.map(lambda v: isinstance(v, (int, float, np.number)) and not isinstance(v, bool))
+    if numericos.any():
+        texto[numericos] = to_display_string(pd.to_numeric(texto[numericos]))
+    return texto.astype(str).astype(object)
+
+
+def format_datetime_series(serie, formato=DATE_FORMAT):
+    """
+    Formata uma coluna de datas (datetimes ficam no formato; textos são mantidos)
+
+    Args:
+        serie: pd.Series com datetimes e/ou strings
+        formato: Formato de saída
+
+    Returns:
+        pd.Series: Coluna de strings ("" para vazios)
+    """
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime(formato).fillna("").astype(object)
+
+    datas = pd.to_datetime(serie.where(serie.map(lambda v: hasattr(v, "strftime"))), errors='coerce')
+    formatadas = datas.dt.strftime(formato)
+    return formatadas.where(datas.notna(), to_display_string(serie)).astype(object)
+
+
+def format_delay_series(minutos):
+    """
+    Versão vetorizada de format_delay (ex: "+1h 15min", "-30min", "0 min")
+
+    Args:
+        minutos: pd.Series com atraso em minutos (negativo se adiantado)
+
+    Returns:
+        pd.Series: Atrasos formatados
+    """
+    m = pd.to_numeric(minutos, errors='coerce').fillna(0).astype(int)
+    sinal = pd.Series(np.where(m > 0, "+", "-"), index=m.index)
+    absoluto = m.abs()
+    horas = (absoluto // 60).astype(str)
+    resto = absoluto % 60
+
+    return pd.Series(np.select(
+        [m == 0, absoluto < 60, resto == 0],
+        ["0 min", sinal + absoluto.astype(str) + " min", sinal + horas + "h"],
+        default=sinal + horas + "h " + resto.astype(str) + "min"
+    ), index=m.index, dtype=object)
+
+
+def build_display_frame(df):
+    """
+    Monta a projeção de exibição de um dataframe de atividades
+
+    Mantém Seq/Status/Is_Milestone/Atraso_Minutos originais (para filtros e ordenação),
+    formata as datas no DATE_FORMAT, converte colunas de texto e adiciona:
+    Atraso (texto), Milestone ("✓"), Inicio_Ordem (datetime do início), Excel_Data_ID
+    e Versao_Linha.
+
+    Args:
+        df: DataFrame de atividades (um CRQ ou vários)
+
+    Returns:
+        pd.DataFrame: Projeção com o mesmo índice do df
+    """
+    colunas = [col for col in DISPLAY_COLUMNS if col in df.columns]
+    display_df = df[colunas].copy()
+
+    for col in STRING_COLUMNS:
+        if col in display_df.columns:
+            display_df[col] = to_display_string(display_df[col])
+
+    for col in ["Inicio", "Fim", "Horario_Inicio_Real", "Horario_Fim_Real"]:
+        if col in display_df.columns:
+            display_df[col] = format_datetime_series(df[col])
+
+    if "Inicio" in df.columns:
+        display_df["Inicio_Ordem"] = pd.to_datetime(df["Inicio"], errors='coerce')
+
+    if "Atraso_Minutos" in display_df.columns:
+        display_df["Atraso"] = format_delay_series(display_df["Atraso_Minutos"])
+
+    if "Is_Milestone" in display_df.columns:
+        display_df["Is_Milestone"] = display_df["Is_Milestone"].fillna(False).astype(bool)
+        display_df["Milestone"] = np.where(display_df["Is_Milestone"], "✓", "")
+
+    if "Excel_Data_ID" in df.columns:
+        display_df["Excel_Data_ID"] = pd.to_numeric(df["Excel_Data_ID"], errors='coerce').fillna(0).astype(int)
+
+    if "Versao_Linha" in df.columns:
+        display_df["Versao_Linha"] = pd.to_numeric(df["Versao_Linha"], errors='coerce').fillna(0).astype(int)
+
+    return display_df
+
+
+def build_display_frames(data_dict):
+    """
+    Monta as projeções de exibição por CRQ e a combinada ("TODAS")
+
+    Cada linha é formatada uma única vez; "TODAS" é a concatenação dos CRQs.
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+
+    Returns:
+        dict: {"TODAS": DataFrame, sequencia: DataFrame}
+    """
+    frames = {}
+    for sequencia, data in data_dict.items():
+        df = data.get("dataframe")
+        if df is None:
+            continue
+        frames[sequencia] = build_display_frame(df).reset_index(drop=True)
+
+    frames["TODAS"] = (
+        pd.concat([frames[sequencia] for sequencia in data_dict if sequencia in frames], ignore_index=True)
+        if frames else pd.DataFrame(columns=DISPLAY_COLUMNS)
+    )
+    return frames
+
+
+def get_display_frames(data_dict):
+    """
+    Projeções de exibição da sessão em cache por (janela, versão dos dados)
+
+    Os dataframes retornados são compartilhados: filtrar/selecionar é seguro,
+    mas não devem ser modificados no lugar.
+
+    Args:
+        data_dict: Dicionário com dataframes por CRQ
+
+    Returns:
+        dict: {"TODAS": DataFrame, sequencia: DataFrame}
+    """
+    return display_cache.get_or_compute(session_data_key(), lambda: build_display_frames(data_dict))
@@ -0,0 +1,322 @@
+"""
+Módulo de exportação dos dados das janelas para análise (Parquet / Arrow IPC) e planilha (XLSX)
+"""
+import re
+import pandas as pd
+from config import DATE_FORMAT, STATUS_COLORS
+
+
+# Colunas exportadas: (coluna da vw_atividades, nome no arquivo)
+ANALYTICS_COLUMNS = [
+    ("v.janela_id", "Janela_ID"),
+    ("j.nome", "Janela"),
+    ("v.sequencia", "CRQ"),
+    ("v.seq", "Seq"),
+    ("v.atividade", "Atividade"),
+    ("v.grupo", "Grupo"),
+    ("v.localidade", "Localidade"),
+    ("v.executor", "Executor"),
+    ("v.inicio", "Inicio"),
+    ("v.fim", "Fim"),
+    ("v.tempo", "Tempo"),
+    ("v.status", "Status"),
+    ("v.horario_inicio_real", "Horario_Inicio_Real"),
+    ("v.horario_fim_real", "Horario_Fim_Real"),
+    ("v.atraso_minutos", "Atraso_Minutos"),
+    ("v.observacoes", "Observacoes"),
+    ("v.is_milestone", "Is_Milestone"),
+    ("v.predecessoras", "Predecessoras"),
+    ("v.excel_data_id", "Excel_Data_ID"),
+    ("v.versao_linha", "Versao_Linha"),
+]
+
+# Colunas com poucos valores distintos: viram categóricas (dicionário no Arrow/Parquet)
+CATEGORY_COLUMNS = ["Janela", "CRQ", "Grupo", "Localidade", "Executor", "Status"]
+DATETIME_COLUMNS = ["Inicio", "Fim", "Horario_Inicio_Real", "Horario_Fim_Real"]
+INTEGER_COLUMNS = ["Janela_ID", "Seq", "Atraso_Minutos", "Excel_Data_ID", "Versao_Linha"]
+TEXT_COLUMNS = ["Atividade", "Tempo", "Observacoes", "Predecessoras"]
+
+# Colunas da planilha de status: (coluna do dataframe de análise, cabeçalho, largura)
+XLSX_COLUMNS = [
+    ("Seq", "Seq", 7),
+    ("Atividade", "Atividade", 50),
+    ("Grupo", "Grupo", 18),
+    ("Status", "Status", 14),
+    ("Inicio", "Início Planejado", 20),
+    ("Fim", "Fim Planejado", 20),
+    ("Horario_Inicio_Real", "Início Real", 20),
+    ("Horario_Fim_Real", "Fim Real", 20),
+    ("Atraso_Minutos", "Atraso (min)", 12),
+    ("Observacoes", "Observações", 50),
+]
+
+# DATE_FORMAT no formato de número do Excel
+XLSX_DATE_FORMAT = "dd/mm/yyyy hh:mm:ss"
+
+EXPORT_FORMATS = {
+    "Parquet": {"extensao": "parquet", "mime": "application/vnd.apache.parquet"},
+    "Arrow IPC": {"extensao": "arrow", "mime": "application/vnd.apache.arrow.file"},
+}
+
+
+def parse_mixed_datetime_series(serie):
+    """
+    Converte uma coluna de datas gravadas no DATE_FORMAT ou em ISO 8601
+
+    O banco guarda o planejado do Excel em ISO e os horários reais no DATE_FORMAT.
+
+    Args:
+        serie: pd.Series de strings
+
+    Returns:
+        pd.Series: datetime64[us] (NaT para vazios ou inválidos)
+    """
+    datas = pd.to_datetime(serie, format=DATE_FORMAT, errors='coerce')
+    restantes = datas.isna() & serie.notna()
+    if restantes.any():
+        datas[restantes] = pd.to_datetime(serie[restantes], format="ISO8601", errors='coerce')
+    # Mesma resolução em todas as colunas de data (timestamp[us] no Arrow)
+    return datas.dt.as_unit("us")
+
+
+def load_analytics_frame(db_manager, janela_ids=None):
+    """
+    Carrega as atividades mescladas (Excel + controle) com tipos para análise
+
+    Datas viram datetime64, contadores inteiros, Is_Milestone booleano e as
+    colunas de baixa cardinalidade categóricas. Todas as conversões são por coluna.
+
+    Args:
+        db_manager: Gerenciador de banco de dados
+        janela_ids: Lista de janelas a exportar (None para todas, ou seja, o histórico)
+
+    Returns:
+        pd.DataFrame: Uma linha por atividade, ordenado por janela, CRQ e seq
+    """
+    where_sql = ""
+    params = []
+    if janela_ids is not None:
+        janela_ids = [int(janela_id) for janela_id in janela_ids]
+        where_sql = f"WHERE v.janela_id IN ({', '.join('?' for _ in janela_ids)})"
+        params = janela_ids
+
+    conn = db_manager.get_connection()
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT {', '.join(coluna for coluna, _ in ANALYTICS_COLUMNS)}
+        FROM vw_atividades v
+        LEFT JOIN janelas j ON j.id = v.janela_id
+        {where_sql}
+        ORDER BY v.janela_id, v.sequencia, v.seq, v.excel_data_id
+    """, params)
+    rows = cursor.fetchall()
+    conn.close()
+
+    df = pd.DataFrame(rows, columns=[nome for _, nome in ANALYTICS_COLUMNS])
+
+    for col in DATETIME_COLUMNS:
+        df[col] = parse_mixed_datetime_series(df[col].astype(object))
+
+    for col in INTEGER_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype("int64")
+
+    df["Is_Milestone"] = df["Is_Milestone"].fillna(0).astype(bool)
+
+    for col in TEXT_COLUMNS:
+        df[col] = df[col].astype(object).where(df[col].notna(), None).astype("string")
+
+    for col in CATEGORY_COLUMNS:
+        df[col] = df[col].fillna("").astype(str).astype("category")
+
+    return df
+
+
+def _require_pyarrow():
+    """Importa o pyarrow (dependência opcional, necessária só para estas exportações)"""
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Exportação Parquet/Arrow requer o pacote pyarrow (pip install pyarrow)")
+    return pyarrow
+
+
+def to_arrow_table(df):
+    """
+    Converte o dataframe de análise para uma tabela Arrow (colunar, sem laços por linha)
+
+    Args:
+        df: DataFrame de load_analytics_frame
+
+    Returns:
+        pyarrow.Table: Categóricas como dicionário, datas como timestamp
+    """
+    pa = _require_pyarrow()
+    return pa.Table.from_pandas(df, preserve_index=False)
+
+
+def export_parquet(df, destino, compressao="zstd"):
+    """
+    Grava o dataframe de análise em Parquet
+
+    Args:
+        df: DataFrame de load_analytics_frame
+        destino: Caminho ou arquivo binário aberto para escrita
+        compressao: Codec do Parquet (ex: "zstd", "snappy", None)
+    """
+    pa = _require_pyarrow()
+    pa.parquet.write_table(to_arrow_table(df), destino, compression=compressao)
+
+
+def export_arrow_ipc(df, destino):
+    """
+    Grava o dataframe de análise no formato de arquivo Arrow IPC (Feather v2)
+
+    Sem compressão: leitores podem mapear o arquivo em memória
+    (pyarrow.memory_map + pyarrow.ipc.open_file) sem copiar os dados.
+
+    Args:
+        df: DataFrame de load_analytics_frame
+        destino: Caminho ou arquivo binário aberto para escrita
+    """
+    pa = _require_pyarrow()
+    tabela = to_arrow_table(df)
+    with pa.ipc.new_file(destino, tabela.schema) as escritor:
+        escritor.write_table(tabela)
+
+
+def export_analytics(db_manager, formato, destino, janela_ids=None):
+    """
+    Exporta as atividades para análise no formato escolhido
+
+    Args:
+        db_manager: Gerenciador de banco de dados
+        formato: Chave de EXPORT_FORMATS ("Parquet" ou "Arrow IPC")
+        destino: Caminho ou arquivo binário aberto para escrita
+        janela_ids: Janelas a exportar (None para todas)
+
+    Returns:
+        int: Número de atividades exportadas
+
+    Raises:
+        ValueError: Se o formato não for suportado
+        ImportError: Se o pyarrow não estiver instalado
+    """
+    if formato not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação inválido: {formato}")
+
+    df = load_analytics_frame(db_manager, janela_ids)
+    if formato == "Parquet":
+        export_parquet(df, destino)
+    else:
+        export_arrow_ipc(df, destino)
+    return len(df)
+
+
+def _sheet_title(nome, usados):
+    """Nome de aba válido no Excel (até 31 caracteres, sem []:*?/\\) e único"""
+    titulo = re.sub(r"[\[\]:*?/\\]", "_", str(nome) or "Sem CRQ")[:31]
+    base, n = titulo, 2
+    while titulo.lower() in usados:
+        sufixo = f" ({n})"
+        titulo = base[:31 - len(sufixo)] + sufixo
+        n += 1
+    usados.add(titulo.lower())
+    return titulo
+
+
+def _add_status_formatting(ws, coluna_status, ultima_linha):
+    """Colore a coluna Status por STATUS_COLORS com formatação condicional (sem estilo por célula)"""
+    from openpyxl.formatting.rule import FormulaRule
+    from openpyxl.styles import Font, PatternFill
+
+    intervalo = f"{coluna_status}2:{coluna_status}{ultima_linha}"
+    for status, cor in STATUS_COLORS.items():
+        cor = cor.lstrip("#").upper()
+        ws.conditional_formatting.add(intervalo, FormulaRule(
+            formula=[f'${coluna_status}2="{status}"'],
+            fill=PatternFill(start_color=cor, end_color=cor, fill_type="solid"),
+            font=Font(color="FFFFFF", bold=True)
+        ))
+
+
+def export_status_xlsx(db_manager, destino, janela_ids=None):
+    """
+    Exporta o status das atividades para XLSX, uma aba por CRQ e uma aba de resumo
+
+    Usa o modo write-only do openpyxl (linhas gravadas em sequência, memória
+    constante). As cores de status vêm de formatação condicional por aba, em
+    vez de um estilo por célula; só as colunas de data recebem formato.
+
+    Args:
+        db_manager: Gerenciador de banco de dados
+        destino: Caminho ou arquivo binário aberto para escrita
+        janela_ids: Janelas a exportar (None para todas; padrão da tela: janela ativa)
+
+    Returns:
+        int: Número de atividades exportadas
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+    from openpyxl.utils import get_column_letter
+
+    df = load_analytics_frame(db_manager, janela_ids)
+
+    wb = Workbook(write_only=True)
+    usados = set()
+    negrito = Font(bold=True)
+
+    def cabecalho(ws, titulos):
+        linha = []
+        for titulo in titulos:
+            cell = WriteOnlyCell(ws, value=titulo)
+            cell.font = negrito
+            linha.append(cell)
+        ws.append(linha)
+
+    # Resumo: atividades por CRQ e status
+    resumo = pd.crosstab(df["CRQ"], df["Status"]) if len(df) else pd.DataFrame()
+    ws = wb.create_sheet(_sheet_title("Resumo", usados))
+    ws.freeze_panes = "B2"
+    cabecalho(ws, ["CRQ"] + [str(status) for status in resumo.columns] + ["Total"])
+    for crq, contagens in resumo.iterrows():
+        valores = [int(v) for v in contagens.tolist()]
+        ws.append([str(crq)] + valores + [sum(valores)])
+
+    colunas = [col for col, _, _ in XLSX_COLUMNS]
+    colunas_data = {i for i, col in enumerate(colunas) if col in DATETIME_COLUMNS}
+    coluna_status = get_column_letter(colunas.index("Status") + 1)
+    ultima_coluna = get_column_letter(len(colunas))
+
+    for crq, df_crq in df.groupby("CRQ", observed=True, sort=False):
+        ws = wb.create_sheet(_sheet_title(crq, usados))
+        for i, (_, _, largura) in enumerate(XLSX_COLUMNS, start=1):
+            ws.column_dimensions[get_column_letter(i)].width = largura
+        ws.freeze_panes = "A2"
+        ultima_linha = len(df_crq) + 1
+        ws.auto_filter.ref = f"A1:{ultima_coluna}{ultima_linha}"
+        _add_status_formatting(ws, coluna_status, ultima_linha)
+
+        cabecalho(ws, [titulo for _, titulo, _ in XLSX_COLUMNS])
+
+        # Uma célula formatada por coluna de data, reaproveitada a cada linha:
+        # no modo write-only a linha é serializada no append
+        celulas_data = {}
+        for i in colunas_data:
+            celulas_data[i] = WriteOnlyCell(ws)
+            celulas_data[i].number_format = XLSX_DATE_FORMAT
+
+        # Valores já convertidos por coluna (NaT/NA -> None, categorias -> texto)
+        valores = df_crq[colunas].astype(object).where(df_crq[colunas].notna(), None)
+        for linha in valores.itertuples(index=False, name=None):
+            celulas = list(linha)
+            for i, cell in celulas_data.items():
+                if celulas[i] is not None:
+                    cell.value = celulas[i].to_pydatetime()
+                    celulas[i] = cell
+            ws.append(celulas)
+
+    wb.save(destino)
+    return len(df)
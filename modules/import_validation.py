@@ -0,0 +1,212 @@
+"""
+Módulo de validação da importação do Excel: normaliza as linhas e gera o relatório de problemas
+"""
+import numpy as np
+import pandas as pd
+
+
+# Seq atribuído a linhas com Atividade mas sem Seq numérico (999000 + posição na importação)
+SEQ_TEMPORARIO_BASE = 999000
+
+# Colunas gravadas no excel_data, na ordem do INSERT (sem janela_id)
+IMPORT_ROW_COLUMNS = [
+    "sequencia", "seq", "atividade", "grupo", "localidade", "executor",
+    "telefone", "inicio", "fim", "tempo"
+]
+
+REPORT_COLUMNS = ["CRQ", "Aba", "Linha", "Seq", "Tipo", "Descricao", "Gravada"]
+
+# Tipo do problema -> (descrição, se a linha ainda é gravada)
+ISSUE_TYPES = {
+    "linha_vazia": ("Linha sem Seq e sem Atividade", False),
+    "atividade_ausente": ("Linha com Seq mas sem Atividade", False),
+    "seq_ausente": ("Linha sem Seq: Seq temporário atribuído", True),
+    "seq_sem_numero": ("Seq sem número: Seq temporário atribuído", True),
+    "seq_texto": ("Seq não numérico: número extraído do texto", True),
+    "seq_duplicado": ("Seq repetido no CRQ", True),
+    "tempo_invalido": ("Tempo inválido: gravado como 0", True),
+    "data_ausente": ("Início ou Fim ausente/inválido", True),
+    "fim_antes_inicio": ("Fim anterior ao Início", True),
+}
+
+
+def _is_blank(serie):
+    """Valores vazios (NaN, "" ou "nan", como o load_excel_file deixa os textos)"""
+    texto = serie.astype(object).where(serie.notna(), "").astype(str).str.strip()
+    return (texto == "") | (texto.str.lower() == "nan")
+
+
+def _to_iso_series(serie):
+    """Datas para texto ISO (como datetime.isoformat); textos são mantidos"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        iso = serie.dt.strftime("%Y-%m-%dT%H:%M:%S")
+        fracao = (serie.dt.microsecond != 0).fillna(False)
+        if fracao.any():
+            iso[fracao] = serie[fracao].dt.strftime("%Y-%m-%dT%H:%M:%S.%f")
+        return iso.astype(object).where(serie.notna(), None)
+
+    return serie.map(
+        lambda valor: valor.isoformat() if hasattr(valor, "isoformat") else str(valor),
+        na_action="ignore"
+    ).astype(object).where(serie.notna(), None)
+
+
+def _text_column(df, col):
+    """Coluna de texto como o str() da importação (ausente -> "")"""
+    if col not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    # map(str) e não astype(str): no pandas 3 o astype(str) mantém NaN como ausente
+    return df[col].map(str).astype(object)
+
+
+def validate_excel_data(data_dict):
+    """
+    Normaliza as linhas do Excel e aponta todos os problemas em uma única passada por CRQ
+
+    Regras (as mesmas da gravação): Seq numérico é truncado para inteiro; Seq em
+    texto usa o primeiro número encontrado; sem número (ou sem Seq) recebe
+    SEQ_TEMPORARIO_BASE + posição, se houver Atividade; linhas sem Atividade não
+    são gravadas. Tempo inválido vira 0.
+
+    Args:
+        data_dict: Dicionário com dataframes de cada sequência ({"dataframe", "sheet_name"})
+
+    Returns:
+        tuple: (linhas, relatorio)
+            linhas: DataFrame com IMPORT_ROW_COLUMNS, apenas as linhas a gravar
+            relatorio: DataFrame com REPORT_COLUMNS (Linha = linha na planilha)
+    """
+    blocos = []
+    problemas = []
+    gravadas_antes = 0
+
+    for sequencia, data in (data_dict or {}).items():
+        df = data["dataframe"]
+        if df is None or df.empty:
+            continue
+        aba = data.get("sheet_name", sequencia)
+
+        seq_bruto = df["Seq"] if "Seq" in df.columns else pd.Series(pd.NA, index=df.index, dtype=object)
+        atividade = _text_column(df, "Atividade").str.strip()
+        sem_atividade = _is_blank(atividade)
+        tem_seq = seq_bruto.notna()
+
+        # Seq numérico (truncado como int()); em texto, o primeiro número encontrado
+        seq_numerico = pd.to_numeric(seq_bruto, errors='coerce')
+        seq_texto = seq_numerico.isna() & tem_seq
+        numero_texto = pd.to_numeric(
+            seq_bruto.astype(object).astype(str).str.extract(r"(\d+)", expand=False), errors='coerce'
+        )
+        seq = np.trunc(seq_numerico.where(~seq_texto, numero_texto).astype(float))
+
+        precisa_temporario = seq.isna() & ~sem_atividade
+        gravar = ~sem_atividade
+
+        # Posição global da linha entre as gravadas (numeração do Seq temporário)
+        posicao = gravadas_antes + gravar.cumsum() - gravar
+        seq = seq.where(~precisa_temporario, SEQ_TEMPORARIO_BASE + posicao)
+        gravadas_antes += int(gravar.sum())
+
+        tempo_bruto = df["Tempo"] if "Tempo" in df.columns else pd.Series(0, index=df.index)
+        tempo = pd.to_numeric(tempo_bruto, errors='coerce')
+        tempo_invalido = tempo.isna() & tempo_bruto.notna()
+        tempo = tempo.astype(object).where(tempo.notna(), 0)
+
+        inicio = df["Inicio"] if "Inicio" in df.columns else pd.Series(None, index=df.index, dtype=object)
+        fim = df["Fim"] if "Fim" in df.columns else pd.Series(None, index=df.index, dtype=object)
+        inicio_data = pd.to_datetime(inicio, errors='coerce')
+        fim_data = pd.to_datetime(fim, errors='coerce')
+
+        condicoes = {
+            "linha_vazia": sem_atividade & ~tem_seq,
+            "atividade_ausente": sem_atividade & tem_seq,
+            "seq_ausente": precisa_temporario & ~tem_seq,
+            "seq_sem_numero": precisa_temporario & tem_seq,
+            "seq_texto": seq_texto & numero_texto.notna() & gravar,
+            "seq_duplicado": seq.duplicated(keep=False) & gravar & ~precisa_temporario,
+            "tempo_invalido": tempo_invalido & gravar,
+            "data_ausente": (inicio_data.isna() | fim_data.isna()) & gravar,
+            "fim_antes_inicio": (fim_data < inicio_data) & gravar,
+        }
+
+        # Linha na planilha: índice do read_excel (0 = primeira linha após o cabeçalho)
+        linha_planilha = pd.to_numeric(pd.Series(df.index, index=df.index), errors='coerce') + 2
+        for tipo, mascara in condicoes.items():
+            mascara = mascara.fillna(False).astype(bool)
+            if not mascara.any():
+                continue
+            descricao, gravada = ISSUE_TYPES[tipo]
+            problemas.append(pd.DataFrame({
+                "CRQ": sequencia,
+                "Aba": aba,
+                "Linha": linha_planilha[mascara].astype("Int64"),
+                "Seq": seq_bruto[mascara].astype(object).where(seq_bruto[mascara].notna(), None),
+                "Tipo": tipo,
+                "Descricao": descricao,
+                "Gravada": gravada,
+            }))
+
+        blocos.append(pd.DataFrame({
+            "sequencia": sequencia,
+            "seq": seq[gravar].astype("int64"),
+            "atividade": atividade[gravar],
+            "grupo": _text_column(df, "Grupo")[gravar],
+            "localidade": _text_column(df, "Localidade")[gravar],
+            "executor": _text_column(df, "Executor")[gravar],
+            "telefone": _text_column(df, "Telefone")[gravar],
+            "inicio": _to_iso_series(inicio[gravar]),
+            "fim": _to_iso_series(fim[gravar]),
+            "tempo": tempo[gravar],
+        }, columns=IMPORT_ROW_COLUMNS))
+
+    linhas = (
+        pd.concat(blocos, ignore_index=True) if blocos
+        else pd.DataFrame(columns=IMPORT_ROW_COLUMNS)
+    )
+    relatorio = (
+        pd.concat(problemas, ignore_index=True).sort_values(["CRQ", "Linha"], kind="stable", ignore_index=True)
+        if problemas else pd.DataFrame(columns=REPORT_COLUMNS)
+    )
+    return linhas, relatorio
+
+
+def iter_import_rows(linhas):
+    """
+    Tuplas prontas para o INSERT no excel_data (tipos nativos do Python, None para vazios)
+
+    Args:
+        linhas: DataFrame retornado por validate_excel_data
+
+    Yields:
+        tuple: Valores na ordem de IMPORT_ROW_COLUMNS
+    """
+    valores = linhas[IMPORT_ROW_COLUMNS].astype(object)
+    yield from valores.where(linhas[IMPORT_ROW_COLUMNS].notna(), None).itertuples(index=False, name=None)
+
+
+def build_validation_report(linhas, relatorio):
+    """
+    Resumo serializável (JSON) da validação, para a API
+
+    Args:
+        linhas: DataFrame de linhas retornado por validate_excel_data
+        relatorio: DataFrame de problemas retornado por validate_excel_data
+
+    Returns:
+        dict: {"linhas_gravaveis", "problemas", "linhas_ignoradas", "por_tipo", "itens"}
+    """
+    itens = relatorio[REPORT_COLUMNS].astype(object)
+    itens = itens.where(relatorio[REPORT_COLUMNS].notna(), None).to_dict("records")
+    # Tipos nativos (Int64/numpy não são serializáveis em JSON)
+    for item in itens:
+        for coluna, valor in item.items():
+            if isinstance(valor, np.generic):
+                item[coluna] = valor.item()
+
+    return {
+        "linhas_gravaveis": int(len(linhas)),
+        "problemas": int(len(relatorio)),
+        "linhas_ignoradas": int((~relatorio["Gravada"].astype(bool)).sum()) if not relatorio.empty else 0,
+        "por_tipo": {str(tipo): int(total) for tipo, total in relatorio["Tipo"].value_counts().items()},
+        "itens": itens,
+    }
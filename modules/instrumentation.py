@@ -0,0 +1,280 @@
+"""
+Módulo de instrumentação: logs estruturados (JSON) e medição de tempo das etapas críticas
+"""
+import bisect
+import functools
+import json
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from config import LOG_LEVEL, PERF_LIMITE_LENTO_MS, PERF_HISTOGRAMA_LIMITES_MS, PERF_BUFFER_TAMANHO
+
+
+logger = logging.getLogger("janela_mudanca")
+
+# Histogramas registrados por etapa (ex: "db.load_excel_data")
+HISTOGRAMAS = {}
+_histogramas_lock = threading.Lock()
+
+# Etapas medidas na execução (rerun) corrente de cada thread do Streamlit
+_rerun_atual = threading.local()
+
+# Medições recentes (buffer circular): (instante epoch, etapa, ms, sessão)
+_amostras = deque(maxlen=PERF_BUFFER_TAMANHO)
+
+# Reruns por sessão: {sessao: {"reruns": n, "ultimo": instante epoch}}
+_reruns_por_sessao = {}
+_reruns_lock = threading.Lock()
+
+
+class JsonFormatter(logging.Formatter):
+    """Formata cada registro de log como uma linha JSON (campos extras em "dados")"""
+
+    def format(self, record):
+        linha = {
+            "ts": datetime.fromtimestamp(record.created).isoformat(timespec="milliseconds"),
+            "nivel": record.levelname,
+            "evento": record.getMessage(),
+        }
+        linha.update(getattr(record, "dados", {}))
+        if record.exc_info:
+            linha["erro"] = self.formatException(record.exc_info)
+        return json.dumps(linha, default=str, ensure_ascii=False)
+
+
+def configure_logging(nivel=None):
+    """
+    Configura o logger da aplicação (saída JSON no stderr); chamadas repetidas não duplicam o handler
+
+    Args:
+        nivel: Nível de log (padrão: LOG_LEVEL do config)
+    """
+    if not any(isinstance(h.formatter, JsonFormatter) for h in logger.handlers):
+        handler = logging.StreamHandler()
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+        logger.propagate = False
+    logger.setLevel(nivel or LOG_LEVEL)
+
+
+def log_event(evento, nivel=logging.INFO, **dados):
+    """
+    Registra um evento estruturado
+
+    Args:
+        evento: Nome do evento (ex: "importacao.incremental")
+        nivel: Nível do log
+        **dados: Campos do evento
+    """
+    if not logger.handlers:
+        configure_logging()
+    if logger.isEnabledFor(nivel):
+        rerun_id = getattr(_rerun_atual, "id", None)
+        if rerun_id is not None:
+            dados.setdefault("rerun", rerun_id)
+        logger.log(nivel, evento, extra={"dados": dados})
+
+
+def log_exception(evento, **dados):
+    """Registra um erro com o traceback da exceção corrente"""
+    if not logger.handlers:
+        configure_logging()
+    logger.error(evento, exc_info=True, extra={"dados": dados})
+
+
+class Histogram:
+    """
+    Histograma de latências em milissegundos com faixas fixas (PERF_HISTOGRAMA_LIMITES_MS)
+
+    Guarda apenas contagens por faixa, soma e máximo: memória constante.
+    """
+
+    def __init__(self, etapa, limites=None):
+        self.etapa = etapa
+        self.limites = list(limites or PERF_HISTOGRAMA_LIMITES_MS)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.total = 0
+        self.soma_ms = 0.0
+        self.max_ms = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, ms):
+        """Registra uma medição"""
+        faixa = bisect.bisect_left(self.limites, ms)
+        with self._lock:
+            self.contagens[faixa] += 1
+            self.total += 1
+            self.soma_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def stats(self):
+        """
+        Returns:
+            dict: Etapa, total, média, máximo e contagens por faixa ("<=10", ">5000")
+        """
+        with self._lock:
+            faixas = {f"<={limite:g}": n for limite, n in zip(self.limites, self.contagens)}
+            faixas[f">{self.limites[-1]:g}"] = self.contagens[-1]
+            return {
+                "etapa": self.etapa,
+                "total": self.total,
+                "media_ms": round(self.soma_ms / self.total, 2) if self.total else 0.0,
+                "max_ms": round(self.max_ms, 2),
+                "faixas": faixas,
+            }
+
+
+def get_histogram(etapa):
+    """Histograma da etapa (criado na primeira medição)"""
+    histograma = HISTOGRAMAS.get(etapa)
+    if histograma is None:
+        with _histogramas_lock:
+            histograma = HISTOGRAMAS.setdefault(etapa, Histogram(etapa))
+    return histograma
+
+
+def record_timing(etapa, ms, **dados):
+    """
+    Registra a duração de uma etapa: histograma, total do rerun e log estruturado
+
+    Etapas acima de PERF_LIMITE_LENTO_MS são registradas como WARNING; as demais como DEBUG.
+
+    Args:
+        etapa: Nome da etapa
+        ms: Duração em milissegundos
+        **dados: Campos extras do log (ex: linhas processadas)
+    """
+    get_histogram(etapa).observe(ms)
+    _amostras.append((time.time(), etapa, ms, getattr(_rerun_atual, "sessao", None)))
+
+    etapas = getattr(_rerun_atual, "etapas", None)
+    if etapas is not None:
+        etapas[etapa] = etapas.get(etapa, 0.0) + ms
+
+    nivel = logging.WARNING if ms >= PERF_LIMITE_LENTO_MS else logging.DEBUG
+    log_event("tempo", nivel, etapa=etapa, ms=round(ms, 2), **dados)
+
+
+@contextmanager
+def measure(etapa, **dados):
+    """
+    Mede o tempo do bloco (context manager)
+
+    Exemplo:
+        with measure("excel.validacao", linhas=len(df)):
+            ...
+
+    Args:
+        etapa: Nome da etapa
+        **dados: Campos extras do log
+    """
+    inicio = time.perf_counter()
+    erro = None
+    try:
+        yield
+    except BaseException as e:
+        erro = type(e).__name__
+        raise
+    finally:
+        if erro:
+            dados["erro"] = erro
+        record_timing(etapa, (time.perf_counter() - inicio) * 1000, **dados)
+
+
+def timed(etapa):
+    """
+    Decorador que mede o tempo de cada chamada da função
+
+    Args:
+        etapa: Nome da etapa (ex: "db.save_activity_control")
+    """
+    def decorador(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with measure(etapa):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorador
+
+
+def begin_rerun(sessao=None):
+    """
+    Inicia a contabilização de uma execução do script (rerun) na thread atual
+
+    Args:
+        sessao: Identificador da sessão (incluído no resumo)
+
+    Returns:
+        str: Identificador do rerun (incluído nos logs das etapas)
+    """
+    _rerun_atual.id = f"{sessao or 'sessao'}-{time.time_ns() % 10**9:09d}"
+    _rerun_atual.sessao = sessao
+    _rerun_atual.inicio = time.perf_counter()
+    _rerun_atual.etapas = {}
+
+    # Contado no início: reruns interrompidos (st.rerun/st.stop) não chegam ao end_rerun
+    agora = time.time()
+    with _reruns_lock:
+        contagem = _reruns_por_sessao.setdefault(sessao, {"reruns": 0, "ultimo": agora})
+        contagem["reruns"] += 1
+        contagem["ultimo"] = agora
+    return _rerun_atual.id
+
+
+def end_rerun(**dados):
+    """
+    Encerra o rerun atual: registra a duração total e o tempo acumulado por etapa
+
+    Args:
+        **dados: Campos extras do resumo (ex: página)
+
+    Returns:
+        dict: {"ms", "etapas"} ou None se não houver rerun em andamento
+    """
+    inicio = getattr(_rerun_atual, "inicio", None)
+    if inicio is None:
+        return None
+
+    resumo = {
+        "ms": round((time.perf_counter() - inicio) * 1000, 2),
+        "etapas": {etapa: round(ms, 2) for etapa, ms in sorted(
+            _rerun_atual.etapas.items(), key=lambda item: item[1], reverse=True
+        )},
+    }
+    get_histogram("rerun").observe(resumo["ms"])
+    _amostras.append((time.time(), "rerun", resumo["ms"], _rerun_atual.sessao))
+    log_event("rerun", logging.INFO, sessao=_rerun_atual.sessao, **resumo, **dados)
+
+    _rerun_atual.inicio = None
+    _rerun_atual.etapas = None
+    _rerun_atual.id = None
+    return resumo
+
+
+def recent_samples(segundos=3600):
+    """
+    Medições recentes do buffer circular
+
+    Args:
+        segundos: Janela de tempo (ex: 3600 para a última hora)
+
+    Returns:
+        list: Tuplas (instante epoch, etapa, ms, sessão), da mais antiga para a mais recente
+    """
+    limite = time.time() - segundos
+    # Cópia do deque (append concorrente é seguro; iterar durante um append não)
+    amostras = list(_amostras)
+    return [amostra for amostra in amostras if amostra[0] >= limite]
+
+
+def session_rerun_counts():
+    """
+    Returns:
+        dict: {sessao: {"reruns": n, "ultimo": instante epoch}} desde o início do processo
+    """
+    with _reruns_lock:
+        return {sessao: dict(contagem) for sessao, contagem in _reruns_por_sessao.items()}
@@ -2,23 +2,28 @@
 Módulo para construção de mensagem consolidada para WhatsApp
 """
 from datetime import datetime, timezone, timedelta
-from config import DATE_FORMAT, SEQUENCIAS
+from config import DATE_FORMAT
 from modules.calculations import (
     calculate_statistics, get_delayed_activities, 
     is_sequence_completed, format_delay
 )
+from modules.crq_registry import get_crq_registry
 
 
-def build_whatsapp_message(data_dict):
+def build_whatsapp_message(data_dict, registry=None):
     """
     Constrói mensagem consolidada para WhatsApp
     
     Args:
         data_dict: Dicionário com dataframes por CRQ
+        registry: Cadastro de CRQs (opcional; padrão: get_crq_registry())
         
     Returns:
         str: Mensagem formatada para WhatsApp
     """
+    if registry is None:
+        registry = get_crq_registry()
+    
     stats = calculate_statistics(data_dict)
     
     # Obter total real importado
@@ -45,7 +50,7 @@ def build_whatsapp_message(data_dict):
     crqs_iniciadas = []
     crqs_nao_iniciadas = []
     
-    for sequencia_key, sequencia_info in SEQUENCIAS.items():
+    for sequencia_key, sequencia_info in registry.items():
         if sequencia_key in stats["por_sequencia"]:
             seq_stats = stats["por_sequencia"][sequencia_key]
             
@@ -89,9 +94,9 @@ def build_whatsapp_message(data_dict):
     
     # CRQs concluídos
     concluidas = []
-    for sequencia_key in SEQUENCIAS.keys():
+    for sequencia_key, sequencia_info in registry.items():
         if is_sequence_completed(data_dict, sequencia_key):
-            concluidas.append(SEQUENCIAS[sequencia_key]["nome"])
+            concluidas.append(sequencia_info["nome"])
     
     if concluidas:
         message += "📋 *CONCLUÍDAS*\n"
@@ -104,11 +109,12 @@ def build_whatsapp_message(data_dict):
     if len(delayed_df) > 0:
         message += "🚨 *ATIVIDADES ATRASADAS*\n"
         
-        # Agrupar por CRQ
-        for sequencia_key, sequencia_info in SEQUENCIAS.items():
-            seq_delayed = delayed_df[delayed_df["CRQ"] == sequencia_key]
+        # Agrupar por CRQ (uma única passada)
+        delayed_por_crq = dict(tuple(delayed_df.groupby("CRQ", sort=False)))
+        for sequencia_key, sequencia_info in registry.items():
+            seq_delayed = delayed_por_crq.get(sequencia_key)
             
-            if len(seq_delayed) > 0:
+            if seq_delayed is not None and len(seq_delayed) > 0:
                 emoji = sequencia_info["emoji"]
                 nome = sequencia_info["nome"]
                 
@@ -0,0 +1,198 @@
+"""
+Módulo do painel de desempenho (administradores): latências, reruns, caches e banco
+"""
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from modules.cache import CACHES
+from modules.instrumentation import HISTOGRAMAS, recent_samples, session_rerun_counts
+
+
+# Janela de tempo analisada pelo painel (segundos)
+PERIODO_PAINEL = 3600
+
+# Quantidade de consultas mais lentas exibidas
+CONSULTAS_LENTAS = 10
+
+
+def build_stage_percentiles(amostras):
+    """
+    Percentis de latência por etapa
+
+    Args:
+        amostras: Tuplas (instante epoch, etapa, ms, sessão) de recent_samples
+
+    Returns:
+        DataFrame: Etapa, Chamadas, p50/p90/p99/Máx (ms) e Total (s), da etapa mais lenta (p90) para a mais rápida
+    """
+    colunas = ["Etapa", "Chamadas", "p50 (ms)", "p90 (ms)", "p99 (ms)", "Máx (ms)", "Total (s)"]
+    if not amostras:
+        return pd.DataFrame(columns=colunas)
+
+    df = pd.DataFrame(amostras, columns=["instante", "etapa", "ms", "sessao"])
+    grupos = df.groupby("etapa")["ms"]
+    percentis = grupos.quantile([0.5, 0.9, 0.99]).unstack()
+
+    resultado = pd.DataFrame({
+        "Etapa": percentis.index,
+        "Chamadas": grupos.size().reindex(percentis.index).values,
+        "p50 (ms)": percentis[0.5].values,
+        "p90 (ms)": percentis[0.9].values,
+        "p99 (ms)": percentis[0.99].values,
+        "Máx (ms)": grupos.max().reindex(percentis.index).values,
+        "Total (s)": (grupos.sum().reindex(percentis.index) / 1000).values,
+    }, columns=colunas)
+    return resultado.sort_values("p90 (ms)", ascending=False, ignore_index=True).round(2)
+
+
+def build_slowest_queries(amostras, limite=CONSULTAS_LENTAS):
+    """
+    Chamadas mais lentas ao banco (etapas "db.*")
+
+    Args:
+        amostras: Tuplas (instante epoch, etapa, ms, sessão) de recent_samples
+        limite: Quantidade de chamadas
+
+    Returns:
+        DataFrame: Horário, Etapa, Duração (ms) e Sessão
+    """
+    consultas = sorted(
+        (amostra for amostra in amostras if amostra[1].startswith("db.")),
+        key=lambda amostra: amostra[2], reverse=True
+    )[:limite]
+    return pd.DataFrame([{
+        "Horário": datetime.fromtimestamp(instante).strftime("%H:%M:%S"),
+        "Etapa": etapa,
+        "Duração (ms)": round(ms, 2),
+        "Sessão": sessao or "-",
+    } for instante, etapa, ms, sessao in consultas], columns=["Horário", "Etapa", "Duração (ms)", "Sessão"])
+
+
+def build_rerun_table(contagens, amostras):
+    """
+    Reruns por sessão (desde o início do processo) e duração mediana na janela analisada
+
+    Args:
+        contagens: Resultado de session_rerun_counts
+        amostras: Tuplas (instante epoch, etapa, ms, sessão) de recent_samples
+
+    Returns:
+        DataFrame: Sessão, Reruns, Última execução e Mediana (ms)
+    """
+    medianas = {}
+    duracoes = pd.DataFrame(
+        [amostra for amostra in amostras if amostra[1] == "rerun"],
+        columns=["instante", "etapa", "ms", "sessao"]
+    )
+    if not duracoes.empty:
+        medianas = duracoes.groupby(duracoes["sessao"].fillna("-"))["ms"].median().to_dict()
+
+    linhas = [{
+        "Sessão": sessao or "-",
+        "Reruns": contagem["reruns"],
+        "Última execução": datetime.fromtimestamp(contagem["ultimo"]).strftime("%d/%m %H:%M:%S"),
+        "Mediana (ms)": round(medianas.get(sessao or "-", float("nan")), 2),
+    } for sessao, contagem in contagens.items()]
+    return pd.DataFrame(linhas, columns=["Sessão", "Reruns", "Última execução", "Mediana (ms)"]).sort_values(
+        "Reruns", ascending=False, ignore_index=True
+    )
+
+
+def _format_bytes(valor):
+    """Tamanho legível (KB/MB/GB)"""
+    for unidade in ("B", "KB", "MB"):
+        if valor < 1024:
+            return f"{valor:.0f} {unidade}" if unidade == "B" else f"{valor:.1f} {unidade}"
+        valor /= 1024
+    return f"{valor:.2f} GB"
+
+
+def render_performance_panel(db_manager):
+    """
+    Renderiza o painel de desempenho a partir do buffer circular de medições em memória
+
+    Os dados são do processo atual (todas as sessões) e se perdem ao reiniciar o servidor.
+
+    Args:
+        db_manager: Instância do DatabaseManager
+    """
+    amostras = recent_samples(PERIODO_PAINEL)
+
+    if st.button("🔄 Atualizar", key="btn_atualizar_desempenho"):
+        st.rerun()
+
+    st.caption(
+        f"{len(amostras)} medições na última hora (buffer em memória do processo, "
+        "compartilhado por todas as sessões)"
+    )
+
+    st.subheader("⏱️ Latência por Etapa (última hora)")
+    percentis = build_stage_percentiles(amostras)
+    if percentis.empty:
+        st.info("ℹ️ Nenhuma medição registrada na última hora.")
+    else:
+        st.dataframe(percentis, width='stretch', hide_index=True)
+
+    st.divider()
+
+    st.subheader("🐢 Consultas Mais Lentas (última hora)")
+    lentas = build_slowest_queries(amostras)
+    if lentas.empty:
+        st.info("ℹ️ Nenhuma chamada ao banco registrada na última hora.")
+    else:
+        st.dataframe(lentas, width='stretch', hide_index=True)
+
+    st.divider()
+
+    st.subheader("🔁 Reruns por Sessão")
+    reruns = build_rerun_table(session_rerun_counts(), amostras)
+    if reruns.empty:
+        st.info("ℹ️ Nenhum rerun registrado.")
+    else:
+        st.dataframe(reruns, width='stretch', hide_index=True)
+
+    st.divider()
+
+    st.subheader("🗃️ Caches")
+    caches = pd.DataFrame([cache.stats() for cache in CACHES.values()])
+    if caches.empty:
+        st.info("ℹ️ Nenhum cache registrado.")
+    else:
+        caches = caches.rename(columns={
+            "nome": "Cache", "hits": "Acertos", "misses": "Erros",
+            "hit_rate": "Taxa de acerto (%)", "entradas": "Entradas"
+        })
+        st.dataframe(caches.round({"Taxa de acerto (%)": 1}), width='stretch', hide_index=True)
+
+    st.divider()
+
+    st.subheader("💾 Banco de Dados")
+    try:
+        banco = db_manager.get_database_stats()
+    except Exception as e:
+        st.error(f"❌ Erro ao ler informações do banco: {e}")
+    else:
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Arquivo", _format_bytes(banco["arquivo_bytes"]))
+        col2.metric("WAL", _format_bytes(banco["wal_bytes"]))
+        col3.metric(
+            "Páginas livres",
+            f"{banco['paginas_livres']} / {banco['paginas']}",
+            help=f"Páginas de {banco['pagina_bytes']} bytes"
+        )
+        if not banco["fts_disponivel"]:
+            st.warning("⚠️ FTS5 indisponível neste SQLite: a busca textual usa LIKE (mais lenta).")
+        st.dataframe(
+            pd.DataFrame(list(banco["linhas"].items()), columns=["Tabela", "Linhas"]),
+            width='stretch', hide_index=True
+        )
+
+    with st.expander("📈 Histogramas (desde o início do processo)"):
+        histogramas = [HISTOGRAMAS[etapa].stats() for etapa in sorted(HISTOGRAMAS)]
+        if not histogramas:
+            st.info("ℹ️ Nenhuma medição registrada.")
+        else:
+            st.dataframe(pd.DataFrame([{
+                "Etapa": h["etapa"], "Chamadas": h["total"], "Média (ms)": h["media_ms"],
+                "Máx (ms)": h["max_ms"], **h["faixas"]
+            } for h in histogramas]), width='stretch', hide_index=True)
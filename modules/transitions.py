@@ -0,0 +1,397 @@
+"""
+Módulo do motor de transições de status (sem dependência do Streamlit)
+
+Regras usadas pelo editor de dados, pelos formulários de CRUD e pela API de escrita:
+máquina de estados, preenchimento automático dos horários reais, cálculo do atraso
+e Concluído -> Atrasado quando há atraso positivo. resolve_transition trata uma
+atividade; resolve_transitions_frame aplica as mesmas regras a várias linhas de uma
+vez. apply_status_transitions grava um lote inteiro em uma única transação.
+"""
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from config import DATE_FORMAT, STATUS_OPCOES
+from modules.calculations import calculate_delay, validate_datetime_string, parse_datetime_string
+
+
+# Status finais só podem ser alcançados a partir de "Em Execução" (ou de outro status final)
+STATUS_FINAIS = ["Concluído", "Atrasado", "Adiantado"]
+
+
+class TransitionError(ValueError):
+    """Erro de validação de uma transição de status"""
+
+
+class InvalidStatusError(TransitionError):
+    """Status fora de STATUS_OPCOES"""
+
+
+class InvalidTransitionError(TransitionError):
+    """Transição não permitida pela máquina de estados"""
+
+
+class InvalidDateError(TransitionError):
+    """Horário real fora do DATE_FORMAT"""
+
+
+class DateOrderError(TransitionError):
+    """Horário fim real anterior ao horário início real"""
+
+
+class ActivityNotFoundError(TransitionError):
+    """Atividade da transição não encontrada (ou ambígua)"""
+
+
+def _to_text(valor):
+    """Normaliza um valor opcional para texto sem espaços ("" para vazios)"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return ""
+    if hasattr(valor, "strftime"):
+        return valor.strftime(DATE_FORMAT)
+    return str(valor).strip()
+
+
+def _parse_planned(valor):
+    """Converte o fim planejado (DATE_FORMAT, ISO ou datetime) para datetime"""
+    if valor is None or (not isinstance(valor, str) and pd.isna(valor)):
+        return None
+    if hasattr(valor, "strftime"):
+        return valor
+    dt = parse_datetime_string(str(valor).strip())
+    if dt is None:
+        try:
+            dt = datetime.fromisoformat(str(valor).strip())
+        except ValueError:
+            return None
+    return dt
+
+
+def validate_real_times(inicio, fim):
+    """
+    Valida os horários reais (formato e fim >= início)
+
+    Args:
+        inicio: Horário início real (texto; "" se vazio)
+        fim: Horário fim real (texto; "" se vazio)
+
+    Raises:
+        InvalidDateError: Data fora do DATE_FORMAT
+        DateOrderError: Fim anterior ao início
+    """
+    for valor in (inicio, fim):
+        if valor and not validate_datetime_string(valor):
+            raise InvalidDateError(f"Data inválida: {valor}. Use o formato {DATE_FORMAT}")
+
+    if inicio and fim:
+        inicio_dt = parse_datetime_string(inicio)
+        fim_dt = parse_datetime_string(fim)
+        if inicio_dt and fim_dt and fim_dt < inicio_dt:
+            raise DateOrderError("Horário Fim Real deve ser maior ou igual ao Horário Início Real")
+
+
+def resolve_transition(old_status, new_status, old_inicio_real, old_fim_real, fim_planejado,
+                       new_inicio_real=None, new_fim_real=None, hora_atual=None, regras_status=True):
+    """
+    Calcula o resultado de uma transição de status de uma atividade
+
+    Horários não informados (None) mantêm os valores atuais, como os formulários.
+
+    Args:
+        old_status: Status atual
+        new_status: Status desejado
+        old_inicio_real: Horário início real atual
+        old_fim_real: Horário fim real atual
+        fim_planejado: Fim planejado (datetime, DATE_FORMAT ou ISO)
+        new_inicio_real: Horário início real informado (opcional)
+        new_fim_real: Horário fim real informado (opcional)
+        hora_atual: Horário usado no preenchimento automático (padrão: agora)
+        regras_status: Se False (edição administrativa), não aplica a máquina de estados,
+            o preenchimento automático nem Concluído -> Atrasado; apenas valida as datas
+            e calcula o atraso
+
+    Returns:
+        dict: status, horario_inicio_real, horario_fim_real (None se vazios) e atraso_minutos
+
+    Raises:
+        TransitionError: InvalidStatusError, InvalidTransitionError, InvalidDateError
+            ou DateOrderError
+    """
+    if new_status not in STATUS_OPCOES:
+        raise InvalidStatusError(f"Status inválido: '{new_status}'. Use um de: {', '.join(STATUS_OPCOES)}")
+
+    if regras_status and new_status in STATUS_FINAIS and old_status not in ["Em Execução"] + STATUS_FINAIS:
+        raise InvalidTransitionError(
+            f"Para alterar o status para '{new_status}', a atividade deve estar em 'Em Execução' primeiro."
+        )
+
+    hora_atual = hora_atual or datetime.now().strftime(DATE_FORMAT)
+    old_inicio_real = _to_text(old_inicio_real)
+    inicio = _to_text(old_inicio_real if new_inicio_real is None else new_inicio_real)
+    fim = _to_text(old_fim_real if new_fim_real is None else new_fim_real)
+
+    # Preencher automaticamente horários baseado na mudança de status
+    if regras_status and old_status != new_status:
+        if old_status == "Planejado" and new_status == "Em Execução":
+            inicio = inicio or hora_atual
+        elif old_status == "Em Execução" and new_status in STATUS_FINAIS:
+            fim = fim or hora_atual
+            inicio = old_inicio_real or inicio or hora_atual
+        else:
+            inicio = inicio or old_inicio_real or hora_atual
+
+    validate_real_times(inicio, fim)
+
+    atraso_minutos = 0
+    fim_planejado = _parse_planned(fim_planejado)
+    if fim and fim_planejado:
+        atraso_minutos = calculate_delay(fim_planejado, fim)
+
+    # Concluído com atraso positivo vira Atrasado (adiantado mantém Concluído)
+    if regras_status and new_status == "Concluído" and atraso_minutos > 0:
+        new_status = "Atrasado"
+
+    return {
+        "status": new_status,
+        "horario_inicio_real": inicio or None,
+        "horario_fim_real": fim or None,
+        "atraso_minutos": atraso_minutos
+    }
+
+
+def _to_text_series(serie, index):
+    """Versão vetorizada de _to_text (datas no DATE_FORMAT, vazios como "")"""
+    if serie is None:
+        return pd.Series("", index=index, dtype=object)
+    serie = pd.Series(serie, index=index) if not isinstance(serie, pd.Series) else serie
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie.dt.strftime(DATE_FORMAT).fillna("").astype(object)
+    texto = serie.astype(object)
+    datas = texto.map(lambda v: hasattr(v, "strftime"))
+    if datas.any():
+        texto[datas] = texto[datas].map(lambda v: v.strftime(DATE_FORMAT))
+    return texto.where(texto.notna(), "").astype(str).str.strip().astype(object)
+
+
+def _parse_planned_series(serie):
+    """Versão vetorizada de _parse_planned (DATE_FORMAT, depois ISO)"""
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        return serie
+    datas = pd.to_datetime(serie, format=DATE_FORMAT, errors='coerce')
+    faltantes = datas.isna() & serie.notna()
+    if faltantes.any():
+        datas[faltantes] = pd.to_datetime(serie[faltantes].astype(str), format="ISO8601", errors='coerce')
+    return datas
+
+
+def resolve_transitions_frame(atual, novo_status, novo_inicio_real=None, novo_fim_real=None, hora_atual=None):
+    """
+    Versão vetorizada de resolve_transition para várias atividades
+
+    Args:
+        atual: DataFrame com status, horario_inicio_real, horario_fim_real e fim (planejado)
+        novo_status: Status desejado (valor único ou Series alinhada a `atual`)
+        novo_inicio_real: Horários início real informados (Series; vazio/NaN mantém o atual)
+        novo_fim_real: Horários fim real informados (Series; vazio/NaN mantém o atual)
+        hora_atual: Horário usado no preenchimento automático (padrão: agora)
+
+    Returns:
+        pd.DataFrame: Mesmo índice de `atual`, com status, horario_inicio_real,
+            horario_fim_real, atraso_minutos, erro (mensagem ou None) e tipo_erro
+            (nome da classe de TransitionError ou None)
+    """
+    hora_atual = hora_atual or datetime.now().strftime(DATE_FORMAT)
+    index = atual.index
+
+    old_status = _to_text_series(atual["status"], index)
+    new_status = _to_text_series(
+        novo_status if isinstance(novo_status, pd.Series) else pd.Series(novo_status, index=index), index
+    )
+    old_inicio = _to_text_series(atual["horario_inicio_real"], index)
+    old_fim = _to_text_series(atual["horario_fim_real"], index)
+
+    inicio = old_inicio.copy()
+    fim = old_fim.copy()
+    if novo_inicio_real is not None:
+        informado = _to_text_series(novo_inicio_real, index)
+        inicio = informado.where(informado != "", old_inicio)
+    if novo_fim_real is not None:
+        informado = _to_text_series(novo_fim_real, index)
+        fim = informado.where(informado != "", old_fim)
+
+    # Preenchimento automático (mesmos casos de resolve_transition)
+    mudou = old_status != new_status
+    caso_inicio = mudou & (old_status == "Planejado") & (new_status == "Em Execução")
+    caso_fim = mudou & (old_status == "Em Execução") & new_status.isin(STATUS_FINAIS)
+    caso_outros = mudou & ~caso_inicio & ~caso_fim
+
+    inicio = inicio.where(~(caso_inicio & (inicio == "")), hora_atual)
+    fim = fim.where(~(caso_fim & (fim == "")), hora_atual)
+    inicio_fim = old_inicio.where(old_inicio != "", inicio.where(inicio != "", hora_atual))
+    inicio = inicio.where(~caso_fim, inicio_fim)
+    inicio_outros = old_inicio.where(old_inicio != "", hora_atual)
+    inicio = inicio.where(~(caso_outros & (inicio == "")), inicio_outros)
+
+    # Validações
+    inicio_dt = pd.to_datetime(inicio.where(inicio != ""), format=DATE_FORMAT, errors='coerce')
+    fim_dt = pd.to_datetime(fim.where(fim != ""), format=DATE_FORMAT, errors='coerce')
+
+    status_invalido = ~new_status.isin(STATUS_OPCOES)
+    transicao_invalida = new_status.isin(STATUS_FINAIS) & ~old_status.isin(["Em Execução"] + STATUS_FINAIS)
+    inicio_invalido = (inicio != "") & inicio_dt.isna()
+    fim_invalido = (fim != "") & fim_dt.isna()
+    ordem_invalida = (fim_dt < inicio_dt).fillna(False)
+
+    condicoes = [status_invalido, transicao_invalida, inicio_invalido, fim_invalido, ordem_invalida]
+    erro = np.select(condicoes, [
+        "Status inválido: '" + new_status + "'. Use um de: " + ", ".join(STATUS_OPCOES),
+        "Para alterar o status para '" + new_status + "', a atividade deve estar em 'Em Execução' primeiro.",
+        "Data inválida: " + inicio + f". Use o formato {DATE_FORMAT}",
+        "Data inválida: " + fim + f". Use o formato {DATE_FORMAT}",
+        pd.Series("Horário Fim Real deve ser maior ou igual ao Horário Início Real", index=index)
+    ], default=None)
+    tipo_erro = np.select(condicoes, [
+        InvalidStatusError.__name__, InvalidTransitionError.__name__,
+        InvalidDateError.__name__, InvalidDateError.__name__, DateOrderError.__name__
+    ], default=None)
+
+    # Atraso: minutos inteiros (truncados) entre o fim real e o fim planejado
+    fim_planejado = _parse_planned_series(atual["fim"])
+    atraso = ((fim_dt - fim_planejado).dt.total_seconds() / 60).fillna(0)
+    atraso_minutos = np.trunc(atraso).astype(int)
+
+    status_final = new_status.where(~((new_status == "Concluído") & (atraso_minutos > 0)), "Atrasado")
+
+    return pd.DataFrame({
+        "status": status_final,
+        "horario_inicio_real": inicio.where(inicio != "", None),
+        "horario_fim_real": fim.where(fim != "", None),
+        "atraso_minutos": atraso_minutos,
+        "erro": pd.Series(erro, index=index, dtype=object),
+        "tipo_erro": pd.Series(tipo_erro, index=index, dtype=object)
+    }, index=index)
+
+
+def _to_int(valor, campo):
+    """Converte um identificador numérico da transição"""
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ActivityNotFoundError(f"Campo '{campo}' inválido: {valor}")
+
+
+def _find_activity(transicao, por_id, por_seq):
+    """Localiza a atividade da transição por excel_data_id ou (crq, seq)"""
+    excel_data_id = transicao.get("excel_data_id")
+    if excel_data_id:
+        atividade = por_id.get(_to_int(excel_data_id, "excel_data_id"))
+        if atividade is None:
+            raise ActivityNotFoundError(f"Atividade com excel_data_id {excel_data_id} não encontrada")
+        return atividade
+
+    crq = str(transicao.get("crq") or transicao.get("sequencia") or "").strip().upper()
+    seq = transicao.get("seq")
+    if not crq or seq is None:
+        raise ActivityNotFoundError("Informe 'excel_data_id' ou 'crq' e 'seq'")
+
+    candidatas = por_seq.get((crq, _to_int(seq, "seq")), [])
+    if not candidatas:
+        raise ActivityNotFoundError(f"Atividade {crq} seq {seq} não encontrada")
+    if len(candidatas) > 1:
+        raise ActivityNotFoundError(f"Seq {seq} repetido na CRQ {crq}: informe 'excel_data_id'")
+    return candidatas[0]
+
+
+def apply_status_transitions(db_manager, transicoes, parcial=False, hora_atual=None):
+    """
+    Aplica um lote de transições de status na janela ativa do db_manager
+
+    Cada transição é um dict com a atividade (excel_data_id ou crq + seq), o novo
+    "status" e, opcionalmente, horario_inicio_real, horario_fim_real, observacoes e
+    versao_linha (versão vista pelo chamador: se a linha mudou depois, o lote inteiro
+    é rejeitado com ConflictError). O estado atual é lido em uma consulta e o lote é
+    gravado em uma única transação.
+
+    Args:
+        db_manager: Gerenciador de banco de dados
+        transicoes: Lista de dicts com as transições
+        parcial: Se False (padrão), qualquer erro rejeita o lote inteiro; se True,
+            grava as transições válidas e retorna os erros das demais
+        hora_atual: Horário usado no preenchimento automático (padrão: agora)
+
+    Returns:
+        dict: {"aplicadas": int, "resultados": list, "erros": list}
+            resultados: excel_data_id, crq, seq e o estado gravado de cada transição válida
+            erros: {"indice", "erro", "tipo"} de cada transição rejeitada
+
+    Raises:
+        ConflictError: Se alguma atividade com versao_linha informada foi alterada
+    """
+    hora_atual = hora_atual or datetime.now().strftime(DATE_FORMAT)
+
+    por_id = {}
+    por_seq = {}
+    for atividade in db_manager.get_activities_state():
+        por_id[atividade["excel_data_id"]] = atividade
+        por_seq.setdefault((atividade["sequencia"], int(atividade["seq"])), []).append(atividade)
+
+    registros = []
+    resultados = []
+    erros = []
+
+    # Transições encadeadas no mesmo lote (ex: Em Execução e depois Concluído) usam o estado resultante
+    estado_lote = {}
+
+    for indice, transicao in enumerate(transicoes):
+        try:
+            if not isinstance(transicao, dict):
+                raise TransitionError("Transição deve ser um objeto")
+            atividade = _find_activity(transicao, por_id, por_seq)
+            versao_linha = transicao.get("versao_linha")
+            versao_linha = None if versao_linha is None else _to_int(versao_linha, "versao_linha")
+            atual = estado_lote.get(atividade["excel_data_id"], atividade)
+
+            novo = resolve_transition(
+                old_status=atual["status"],
+                new_status=transicao.get("status"),
+                old_inicio_real=atual["horario_inicio_real"],
+                old_fim_real=atual["horario_fim_real"],
+                fim_planejado=atividade["fim"],
+                new_inicio_real=transicao.get("horario_inicio_real"),
+                new_fim_real=transicao.get("horario_fim_real"),
+                hora_atual=hora_atual
+            )
+        except TransitionError as e:
+            erros.append({"indice": indice, "erro": str(e), "tipo": type(e).__name__})
+            continue
+
+        observacoes = transicao.get("observacoes")
+        observacoes = _to_text(atual["observacoes"] if observacoes is None else observacoes) or None
+
+        registro = {
+            "seq": int(atividade["seq"]),
+            "sequencia": atividade["sequencia"],
+            "excel_data_id": atividade["excel_data_id"],
+            "observacoes": observacoes,
+            "is_milestone": bool(atividade["is_milestone"]),
+            "predecessoras": atividade["predecessoras"],
+            # Transições encadeadas mantêm a versão lida antes do lote
+            "versao_esperada": atual.get("versao_esperada", versao_linha),
+            **novo
+        }
+        estado_lote[atividade["excel_data_id"]] = registro
+        registros.append(registro)
+        resultados.append({
+            "excel_data_id": atividade["excel_data_id"],
+            "crq": atividade["sequencia"],
+            "seq": registro["seq"],
+            **novo
+        })
+
+    if erros and not parcial:
+        return {"aplicadas": 0, "resultados": [], "erros": erros}
+
+    # Uma linha por atividade (a última transição do lote prevalece)
+    finais = list({registro["excel_data_id"]: registro for registro in registros}.values())
+    db_manager.save_activity_controls(finais)
+
+    return {"aplicadas": len(resultados), "resultados": resultados, "erros": erros}
@@ -48,9 +48,9 @@ def render_sequence_status_card(sequencia, stats, total, milestones_count=0):
         total: Total de atividades (sem milestones)
         milestones_count: Número de milestones
     """
-    from config import SEQUENCIAS
+    from modules.crq_registry import get_crq_registry
     
-    sequencia_info = SEQUENCIAS.get(sequencia, {})
+    sequencia_info = get_crq_registry().get(sequencia, {})
     emoji = sequencia_info.get("emoji", "📊")
     nome = sequencia_info.get("nome", sequencia)
     
@@ -103,18 +103,17 @@ def format_dataframe_for_display(df, columns_to_show=None):
         available_cols = [col for col in columns_to_show if col in display_df.columns]
         display_df = display_df[available_cols]
     
-    # Formatar datas
+    from modules.display import format_datetime_series, format_delay_series
+    
+    # Formatar datas (vetorizado)
     date_columns = ["Inicio", "Fim", "Horario_Inicio_Real", "Horario_Fim_Real"]
     for col in date_columns:
         if col in display_df.columns:
-            display_df[col] = display_df[col].apply(
-                lambda x: x.strftime("%d/%m/%Y %H:%M:%S") if pd.notna(x) and hasattr(x, 'strftime') else ""
-            )
+            display_df[col] = format_datetime_series(display_df[col], "%d/%m/%Y %H:%M:%S")
     
     # Formatar atraso
     if "Atraso_Minutos" in display_df.columns:
-        from modules.calculations import format_delay
-        display_df["Atraso"] = display_df["Atraso_Minutos"].apply(format_delay)
+        display_df["Atraso"] = format_delay_series(display_df["Atraso_Minutos"])
         if "Atraso_Minutos" in display_df.columns and "Atraso" in display_df.columns:
             # Manter apenas a coluna formatada
             display_df = display_df.drop(columns=["Atraso_Minutos"])
@@ -0,0 +1,38 @@
+"""
+Configuração comum dos testes (pytest, executado na raiz do projeto)
+"""
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# Os módulos são importados como no app (modules.*, config)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.database import DatabaseManager
+
+
+@pytest.fixture
+def db_manager(tmp_path):
+    """Gerenciador sobre um banco novo (janela padrão ativa)"""
+    return DatabaseManager(str(tmp_path / "janela.db"))
+
+
+def make_sheet(linhas, sheet_name=None):
+    """
+    Aba no formato do load_excel_file
+
+    Args:
+        linhas: Lista de tuplas (Seq, Atividade, Grupo, Inicio, Fim, Tempo)
+        sheet_name: Nome da aba (opcional)
+
+    Returns:
+        dict: {"dataframe", "sheet_name"}
+    """
+    df = pd.DataFrame(linhas, columns=["Seq", "Atividade", "Grupo", "Inicio", "Fim", "Tempo"])
+    for col in ["Localidade", "Executor", "Telefone"]:
+        df[col] = ""
+    df["Inicio"] = pd.to_datetime(df["Inicio"])
+    df["Fim"] = pd.to_datetime(df["Fim"])
+    return {"dataframe": df, "sheet_name": sheet_name}
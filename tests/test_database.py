@@ -0,0 +1,183 @@
+"""
+Testes do DatabaseManager: importação incremental, backup em streaming e conflitos de versão
+"""
+import io
+import sqlite3
+
+import pytest
+
+from conftest import make_sheet
+from modules.database import ConflictError
+
+
+def _controles(db_manager):
+    """Linhas de activity_control da janela ativa, por excel_data_id"""
+    conn = sqlite3.connect(db_manager.db_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        "SELECT * FROM activity_control WHERE janela_id = ?", (db_manager.janela_id,)
+    ).fetchall()
+    conn.close()
+    return {row["excel_data_id"]: dict(row) for row in rows}
+
+
+def _atividades(db_manager):
+    """{(sequencia, seq, atividade): linha do excel_data} da janela ativa"""
+    conn = sqlite3.connect(db_manager.db_path)
+    conn.row_factory = sqlite3.Row
+    rows = conn.execute(
+        "SELECT * FROM excel_data WHERE janela_id = ? ORDER BY id", (db_manager.janela_id,)
+    ).fetchall()
+    conn.close()
+    return {(row["sequencia"], row["seq"], row["atividade"]): dict(row) for row in rows}
+
+
+PLANO = {
+    "REDE": make_sheet([
+        (1, "Backup", "G1", "2026-10-18 20:00", "2026-10-18 20:30", 30),
+        (2, "Migração", "G1", "2026-10-18 20:30", "2026-10-18 21:30", 60),
+        (3, "Validação", "G2", "2026-10-18 21:30", "2026-10-18 22:00", 30),
+    ], "REDE"),
+}
+
+
+class TestSyncExcelData:
+    def test_primeira_importacao_cria_linhas_e_controles(self, db_manager):
+        contagens = db_manager.sync_excel_data(PLANO)
+
+        assert contagens == {"inseridas": 3, "atualizadas": 0, "removidas": 0, "inalteradas": 0}
+        controles = _controles(db_manager)
+        assert len(controles) == 3
+        assert {c["status"] for c in controles.values()} == {"Planejado"}
+
+    def test_reimportacao_aplica_apenas_as_diferencas(self, db_manager):
+        db_manager.sync_excel_data(PLANO)
+        antes = _atividades(db_manager)
+        id_migracao = antes[("REDE", 2, "Migração")]["id"]
+        db_manager.save_activity_control(2, "REDE", status="Em Execução", excel_data_id=id_migracao)
+
+        revisado = {
+            "REDE": make_sheet([
+                (1, "Backup", "G1", "2026-10-18 20:00", "2026-10-18 20:30", 30),
+                (2, "Migração", "G1", "2026-10-18 20:30", "2026-10-18 22:00", 90),
+                (4, "Rollback", "G2", "2026-10-18 22:00", "2026-10-18 22:30", 30),
+            ], "REDE"),
+        }
+        contagens = db_manager.sync_excel_data(revisado, file_name="revisado.xlsx")
+
+        assert contagens == {"inseridas": 1, "atualizadas": 1, "removidas": 1, "inalteradas": 1}
+        depois = _atividades(db_manager)
+        assert ("REDE", 3, "Validação") not in depois
+        # A linha alterada mantém o id e, portanto, o controle
+        assert depois[("REDE", 2, "Migração")]["id"] == id_migracao
+        assert depois[("REDE", 2, "Migração")]["tempo"] == "90"
+        controles = _controles(db_manager)
+        assert controles[id_migracao]["status"] == "Em Execução"
+        # Controles das linhas removidas saem junto; a nova recebe "Planejado"
+        assert antes[("REDE", 3, "Validação")]["id"] not in controles
+        assert controles[depois[("REDE", 4, "Rollback")]["id"]]["status"] == "Planejado"
+
+    def test_reimportacao_identica_nao_altera_nada(self, db_manager):
+        db_manager.sync_excel_data(PLANO)
+        versao = db_manager.get_data_version()
+
+        contagens = db_manager.sync_excel_data(PLANO)
+
+        assert contagens == {"inseridas": 0, "atualizadas": 0, "removidas": 0, "inalteradas": 3}
+        assert db_manager.get_data_version() == versao
+
+
+class TestBackupStream:
+    def test_ida_e_volta_religa_controles_com_seq_repetido(self, db_manager, tmp_path):
+        plano = {
+            "REDE": make_sheet([
+                (1, "Backup", "G1", "2026-10-18 20:00", "2026-10-18 20:30", 30),
+                (1, "Backup (réplica)", "G1", "2026-10-18 20:00", "2026-10-18 20:30", 30),
+                (2, "Migração", "", "2026-10-18 20:30", "2026-10-18 21:30", 60),
+            ], "REDE"),
+        }
+        db_manager.sync_excel_data(plano)
+        ids = {chave[2]: linha["id"] for chave, linha in _atividades(db_manager).items()}
+        db_manager.save_activity_control(
+            1, "REDE", status="Em Execução", horario_inicio_real="18/10/2026 20:05:00",
+            observacoes="réplica", excel_data_id=ids["Backup (réplica)"]
+        )
+
+        arquivo = io.BytesIO()
+        assert db_manager.export_backup_stream(arquivo, lote=2) == (3, 3)
+
+        # Outra importação no meio: os ids antigos deixam de existir
+        db_manager.sync_excel_data({})
+        arquivo.seek(0)
+        assert db_manager.import_backup_stream(arquivo, lote=2) == (3, 3)
+
+        atividades = _atividades(db_manager)
+        novos_ids = {chave[2]: linha["id"] for chave, linha in atividades.items()}
+        assert set(novos_ids.values()).isdisjoint(ids.values())
+        controles = _controles(db_manager)
+        assert set(controles) == set(novos_ids.values())
+        replica = controles[novos_ids["Backup (réplica)"]]
+        assert (replica["status"], replica["observacoes"]) == ("Em Execução", "réplica")
+        assert controles[novos_ids["Backup"]]["status"] == "Planejado"
+        assert controles[novos_ids["Migração"]]["is_milestone"] == 1
+
+    def test_backup_truncado_nao_grava_nada(self, db_manager):
+        db_manager.sync_excel_data(PLANO)
+        arquivo = io.BytesIO()
+        db_manager.export_backup_stream(arquivo)
+        antes = _atividades(db_manager)
+
+        with pytest.raises(ValueError):
+            db_manager.import_backup_stream(io.BytesIO(arquivo.getvalue()[:-20]))
+
+        assert _atividades(db_manager) == antes
+
+
+class TestSaveActivityControlsConflict:
+    def _registro(self, linha, versao_esperada, status="Em Execução"):
+        return {
+            "seq": linha["seq"], "sequencia": linha["sequencia"], "excel_data_id": linha["id"],
+            "status": status, "versao_esperada": versao_esperada
+        }
+
+    def test_versao_desatualizada_rejeita_o_lote_inteiro(self, db_manager):
+        db_manager.sync_excel_data(PLANO)
+        atividades = list(_atividades(db_manager).values())
+        versoes = {id_: c["versao_linha"] or 0 for id_, c in _controles(db_manager).items()}
+
+        # Outra sessão grava a primeira atividade depois da leitura
+        db_manager.save_activity_controls([self._registro(atividades[0], versoes[atividades[0]["id"]])])
+        antes = _controles(db_manager)
+
+        lote = [self._registro(linha, versoes[linha["id"]], "Concluído") for linha in atividades[:2]]
+        with pytest.raises(ConflictError) as erro:
+            db_manager.save_activity_controls(lote)
+
+        assert [c["excel_data_id"] for c in erro.value.conflitos] == [atividades[0]["id"]]
+        assert erro.value.conflitos[0]["versao_atual"] == versoes[atividades[0]["id"]] + 1
+        assert _controles(db_manager) == antes
+
+    def test_versao_zero_insere_linha_nova_uma_unica_vez(self, db_manager):
+        db_manager.save_excel_data(PLANO)
+        linha = next(iter(_atividades(db_manager).values()))
+        assert _controles(db_manager) == {}
+
+        assert db_manager.save_activity_controls([self._registro(linha, 0)]) == 1
+        assert _controles(db_manager)[linha["id"]]["versao_linha"] == 1
+
+        # Segunda criação com a mesma leitura (versão 0): conflito
+        with pytest.raises(ConflictError):
+            db_manager.save_activity_controls([self._registro(linha, 0, "Concluído")])
+        assert _controles(db_manager)[linha["id"]]["status"] == "Em Execução"
+
+    def test_save_activity_control_acusa_conflito(self, db_manager):
+        db_manager.save_excel_data(PLANO)
+        linha = next(iter(_atividades(db_manager).values()))
+
+        assert db_manager.save_activity_control(
+            linha["seq"], linha["sequencia"], status="Em Execução", excel_data_id=linha["id"], versao_esperada=0
+        ) == 1
+        with pytest.raises(ConflictError):
+            db_manager.save_activity_control(
+                linha["seq"], linha["sequencia"], status="Concluído", excel_data_id=linha["id"], versao_esperada=0
+            )
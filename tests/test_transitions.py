@@ -0,0 +1,90 @@
+"""
+Testes do motor de transições: a versão vetorizada deve coincidir com resolve_transition
+"""
+import itertools
+
+import pandas as pd
+import pytest
+
+from config import STATUS_OPCOES
+from modules.transitions import TransitionError, resolve_transition, resolve_transitions_frame
+
+
+HORA_ATUAL = "18/10/2026 21:00:00"
+FIM_PLANEJADO = "2026-10-18T21:30:00"
+
+# (início real, fim real) atuais e informados
+HORARIOS_ATUAIS = [
+    (None, None),
+    ("18/10/2026 20:00:00", None),
+    ("18/10/2026 20:00:00", "18/10/2026 21:45:00"),
+]
+HORARIOS_INFORMADOS = [
+    (None, None),
+    ("18/10/2026 20:10:00", "18/10/2026 21:10:00"),
+    (None, "18/10/2026 22:00:00"),
+    ("18/10/2026 22:00:00", "18/10/2026 21:00:00"),
+    ("31/02/2026 25:00:00", None),
+]
+
+
+def _casos():
+    """Todas as combinações de status e horários (inclui status inválido)"""
+    status = STATUS_OPCOES + ["Pausado"]
+    for antigo, novo, atuais, informados in itertools.product(
+        STATUS_OPCOES, status, HORARIOS_ATUAIS, HORARIOS_INFORMADOS
+    ):
+        yield {
+            "status": antigo, "novo_status": novo,
+            "horario_inicio_real": atuais[0], "horario_fim_real": atuais[1],
+            "novo_inicio": informados[0], "novo_fim": informados[1],
+            "fim": FIM_PLANEJADO,
+        }
+
+
+def _esperado(caso):
+    """Resultado de resolve_transition no formato de resolve_transitions_frame"""
+    # No DataFrame os vazios viram NaN; resolve_transition usa None para "manter o atual"
+    caso = {campo: None if pd.isna(valor) else valor for campo, valor in caso.items()}
+    try:
+        resultado = resolve_transition(
+            caso["status"], caso["novo_status"], caso["horario_inicio_real"], caso["horario_fim_real"],
+            caso["fim"], caso["novo_inicio"], caso["novo_fim"], hora_atual=HORA_ATUAL
+        )
+    except TransitionError as e:
+        return {"erro": str(e), "tipo_erro": type(e).__name__}
+    return {**resultado, "erro": None, "tipo_erro": None}
+
+
+def test_frame_equivale_a_resolve_transition():
+    casos = pd.DataFrame(list(_casos()))
+
+    resultado = resolve_transitions_frame(
+        casos[["status", "horario_inicio_real", "horario_fim_real", "fim"]],
+        casos["novo_status"], casos["novo_inicio"], casos["novo_fim"], hora_atual=HORA_ATUAL
+    )
+
+    assert len(resultado) == len(casos)
+    for posicao, caso in casos.iterrows():
+        esperado = _esperado(caso)
+        obtido = resultado.loc[posicao]
+        assert (obtido["tipo_erro"], obtido["erro"]) == (esperado["tipo_erro"], esperado["erro"]), caso.to_dict()
+        if esperado["erro"] is None:
+            for campo in ["status", "horario_inicio_real", "horario_fim_real", "atraso_minutos"]:
+                assert obtido[campo] == esperado[campo], (campo, caso.to_dict())
+
+
+@pytest.mark.parametrize("fim_real, status, atraso", [
+    ("18/10/2026 21:45:00", "Atrasado", 15),
+    ("18/10/2026 21:15:00", "Concluído", -15),
+])
+def test_concluido_com_atraso_vira_atrasado(fim_real, status, atraso):
+    atual = pd.DataFrame([{
+        "status": "Em Execução", "horario_inicio_real": "18/10/2026 20:00:00",
+        "horario_fim_real": None, "fim": FIM_PLANEJADO,
+    }])
+
+    resultado = resolve_transitions_frame(atual, "Concluído", novo_fim_real=pd.Series([fim_real]))
+
+    assert resultado.loc[0, "status"] == status
+    assert resultado.loc[0, "atraso_minutos"] == atraso